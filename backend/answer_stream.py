@@ -0,0 +1,42 @@
+"""
+Utilidades para responder ``/ask`` en streaming (Server-Sent Events).
+
+``SentenceBuffer`` acumula el texto que llega de OpenAI token a token y lo
+entrega en partes que terminan en un límite de frase (``.``, ``!``, ``?`` o
+salto de línea), para poder formatear y enviar cada parte sin esperar a la
+respuesta completa. ``sse_event`` serializa un evento para el cliente.
+"""
+import json
+import re
+
+# Fin de frase seguido de espacio; no corta tras un número ("1." de una lista numerada)
+SENTENCE_END = re.compile(r'(?<!\d)[.!?…]+["»)]*(?=\s)|\n')
+
+
+class SentenceBuffer:
+    """Agrupa frases completas en partes de al menos ``min_chars`` caracteres."""
+
+    def __init__(self, min_chars=60):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Añade texto; devuelve una parte lista para enviar o None."""
+        self._buffer += text
+        end = None
+        for match in SENTENCE_END.finditer(self._buffer):
+            end = match.end()
+        if end is None or len(self._buffer[:end].strip()) < self.min_chars:
+            return None
+        part, self._buffer = self._buffer[:end], self._buffer[end:]
+        return part
+
+    def finish(self):
+        """Devuelve lo que quede pendiente (puede ser una cadena vacía)."""
+        part, self._buffer = self._buffer, ""
+        return part
+
+
+def sse_event(event, data):
+    """Evento SSE con ``data`` en JSON (una sola línea)."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,228 @@
+"""
+Modo asíncrono (ASGI) de la API del chatbot, con Quart.
+
+Expone las mismas rutas y respuestas que ``app_openai_api.py`` (``/ask``,
+``/ask/stream``, ``/history/<sender_id>``, ``/counts``, ``/metrics``, ``/ready`` y las rutas internas) y reutiliza su lógica,
+pero una petición no ocupa un hilo mientras espera a sus dependencias:
+
+- OpenAI con ``AsyncOpenAI`` a través de ``AsyncLLMGateway`` (mismos límites que
+  la API síncrona). Las solicitudes de llamada van a la misma bandeja de salida
+  (``call_outbox``) que en la API síncrona.
+- Consultas a SQL Server y al almacén de sesiones en un pool de hilos de
+  ``ASYNC_DB_THREADS`` hilos (``asyncio.to_thread``).
+- Búsqueda FAISS en un ejecutor aparte de ``ASYNC_CPU_THREADS`` hilos, para que
+  no compita con las consultas a la DB. La incrustación de la pregunta se espera
+  en el lote compartido de ``embedding_batcher`` sin ocupar un hilo.
+
+Se ejecuta con un servidor ASGI, por ejemplo:
+
+    hypercorn app_async:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import AsyncOpenAI
+from quart import Quart, Response, jsonify, request
+
+import app_openai_api as core
+from answer_stream import sse_event
+from llm_gateway import AsyncLLMGateway
+from metrics import PrometheusText
+
+app = Quart(__name__)
+
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", 32))
+ASYNC_CPU_THREADS = int(os.getenv("ASYNC_CPU_THREADS", 2))
+
+cpu_executor = ThreadPoolExecutor(ASYNC_CPU_THREADS, thread_name_prefix="rag-cpu")
+async_client = None
+llm_gateway = None
+
+
+@app.before_serving
+async def startup():
+    global async_client, llm_gateway
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(ASYNC_DB_THREADS, thread_name_prefix="db")
+    )
+    async_client = AsyncOpenAI(api_key=core.OPENAI_API_KEY, max_retries=0, timeout=core.OPENAI_TIMEOUT_SECONDS)
+    llm_gateway = AsyncLLMGateway(async_client.chat.completions.create, **core.LLM_GATEWAY_CONFIG)
+
+
+@app.after_serving
+async def shutdown():
+    await async_client.close()
+
+
+async def run_cpu(func, *args):
+    """Ejecuta trabajo de CPU (incrustación, FAISS) en el ejecutor dedicado."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, func, *args)
+
+
+async def embed_question(q):
+    """
+    Calcula la incrustación de la pregunta y la deja en la caché de incrustaciones,
+    donde la leen ``classify_question`` y ``prepare_rag``. Espera su lote sin ocupar
+    un hilo del ejecutor de CPU, así que el tamaño de los lotes no queda limitado a
+    ``ASYNC_CPU_THREADS``.
+    """
+    if core.embedding_batcher is None:
+        return await run_cpu(core.embed_question, q)
+    embedding = core.embedding_cache.get(q)
+    if embedding is None:
+        with core.tracer.span("embedding"):
+            embedding = await asyncio.wrap_future(core.embedding_batcher.submit(q))
+        core.embedding_cache.put(q, embedding)
+    return embedding
+
+
+async def answer_question(sender_id, q):
+    """Como ``core.answer_question``, sin ocupar el bucle de eventos con E/S bloqueante."""
+    session_data = await asyncio.to_thread(core.get_session, sender_id)
+    employee_id = session_data.get('employee_id')
+    lower_q = q.lower().strip()
+
+    # --- Flujo de Verificación de Identidad ---
+    if not session_data.get('verified', False):
+        response_text, category, employee_id = await asyncio.to_thread(
+            core.handle_identity_flow, sender_id, lower_q, session_data
+        )
+        return response_text, category, employee_id, None
+
+    # --- Si la identidad está verificada, proceder con otras solicitudes ---
+    # Algunas respuestas predefinidas consultan RRHH (fecha de ingreso), por eso va en un hilo
+    response_text, category = await asyncio.to_thread(core.route_verified_question, lower_q, employee_id)
+    if category == core.ACTION_RAG:
+        await embed_question(q)
+        match = await run_cpu(core.classify_question, q)
+        if match:
+            response_text, category = await asyncio.to_thread(core.render_intent, match, employee_id)
+    if category == core.ACTION_SCHEDULE_CALL:
+        response_text, category = await asyncio.to_thread(core.schedule_call, sender_id, employee_id)
+    elif category == core.ACTION_RAG:
+        cache_key, cached, prompt = await run_cpu(core.prepare_rag, q)
+        if not cached:
+            return None, None, employee_id, (cache_key, prompt)
+        response_text, category = cached
+    return response_text, category, employee_id, None
+
+
+@app.route("/ask", methods=["POST"])
+async def ask():
+    data = await request.get_json()
+    q = data.get("question", "")
+    sender_id = data.get("sender", "unknown_sender")
+
+    if not q:
+        return jsonify({"answer": "Por favor, haz una pregunta."}), 400
+
+    start = time.perf_counter()
+    response_text, category, employee_id, rag = await answer_question(sender_id, q)
+    if rag:
+        cache_key, prompt = rag
+        try:
+            with core.tracer.span("openai"):
+                chat_completion = await llm_gateway.complete(core.openai_completion_params(prompt), key=cache_key)
+            response_text, category = await run_cpu(
+                core.finish_rag, q, cache_key, chat_completion.choices[0].message.content
+            )
+        except Exception as e:
+            response_text, category = core.openai_failure_response(e)
+
+    # log_request solo encola la entrada; no toca el disco
+    core.log_request(sender_id, q, response_text, category, employee_id)
+    core.tracer.observe_request("/ask", category, time.perf_counter() - start)
+    return jsonify({"answer": response_text})
+
+
+@app.route("/ask/stream", methods=["POST"])
+async def ask_stream():
+    """Como ``/ask/stream`` de la API síncrona (eventos ``part`` y ``done``)."""
+    data = await request.get_json()
+    q = data.get("question", "")
+    sender_id = data.get("sender", "unknown_sender")
+
+    if not q:
+        return jsonify({"answer": "Por favor, haz una pregunta."}), 400
+
+    async def events():
+        start = time.perf_counter()
+        timings = {}
+        response_text, category, employee_id, rag = await answer_question(sender_id, q)
+        if rag:
+            cache_key, prompt = rag
+            answer_stream = core.RagAnswerStream(q, cache_key)
+            try:
+                with core.tracer.span("openai_stream"):
+                    async for chunk in llm_gateway.stream(core.openai_completion_params(prompt)):
+                        delta = core.completion_delta(chunk)
+                        if delta and "ttft_ms" not in timings:
+                            timings["ttft_ms"] = (time.perf_counter() - start) * 1000
+                        for part in answer_stream.feed(delta):
+                            timings.setdefault("first_part_ms", (time.perf_counter() - start) * 1000)
+                            yield sse_event("part", {"text": part})
+                # finish guarda en las cachés (incrusta la pregunta para la caché semántica)
+                pending, response_text, category = await run_cpu(answer_stream.finish)
+            except Exception as e:
+                response_text, category = core.openai_failure_response(e)
+                pending = [response_text]
+        else:
+            pending = [response_text]
+        for part in pending:
+            timings.setdefault("first_part_ms", (time.perf_counter() - start) * 1000)
+            yield sse_event("part", {"text": part})
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        if rag:
+            core.observe_stream_timings(timings)
+        core.log_request(sender_id, q, response_text, category, employee_id)
+        core.tracer.observe_request("/ask/stream", category, timings["total_ms"] / 1000)
+        yield sse_event("done", {"answer": response_text, **{k: round(v, 1) for k, v in timings.items()}})
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/history/<sender_id>", methods=["GET"])
+async def get_history(sender_id):
+    history = await asyncio.to_thread(core.get_request_history, sender_id)
+    return jsonify({"history": history})
+
+
+@app.route("/counts", methods=["GET"])
+async def get_counts():
+    counts = await asyncio.to_thread(core.count_requests_by_category)
+    return jsonify({"category_counts": counts})
+
+
+@app.route("/internal/stats", methods=["GET"])
+async def get_internal_stats():
+    # Consulta la bandeja de llamadas en SQLite: fuera del bucle de eventos, como /metrics
+    stats = await asyncio.to_thread(core.internal_stats)
+    stats["llm_gateway"] = llm_gateway.as_dict()
+    return jsonify(stats)
+
+
+@app.route("/metrics", methods=["GET"])
+async def get_metrics():
+    # Lee el estado de la bandeja de llamadas en SQLite: fuera del bucle de eventos
+    text = await asyncio.to_thread(core.prometheus_metrics, llm_gateway)
+    return Response(text, content_type=PrometheusText.CONTENT_TYPE)
+
+
+@app.route("/ready", methods=["GET"])
+async def ready():
+    """Como ``/ready`` de la API síncrona: 503 hasta que el modelo y el índice están cargados."""
+    is_ready = core.model_service.ready and core.index_service.ready
+    return jsonify({"ready": is_ready, **core.service_states()}), 200 if is_ready else 503
+
+
+@app.route("/internal/employees/<employee_id>/invalidate", methods=["POST"])
+async def invalidate_employee_profile(employee_id):
+    core.profile_cache.invalidate(employee_id)
+    return jsonify({"status": "ok"})
+
+
+if __name__ == "__main__":
+    app.run(port=5000)
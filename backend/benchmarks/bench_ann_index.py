@@ -0,0 +1,88 @@
+"""
+Benchmark de recall@k frente a latencia de los tipos de índice de ``index_factory``.
+
+Genera un corpus sintético (vectores agrupados en clústeres, similar a las
+incrustaciones de MiniLM), usa ``flat`` como referencia exacta y mide, para cada
+tipo y valor de ``nprobe``/``ef_search``, el tiempo de construcción, la latencia
+media por consulta y el recall@k.
+
+    cd backend
+    python benchmarks/bench_ann_index.py --vectors 200000 --queries 1000 --k 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_factory import build_index, set_search_params  # noqa: E402
+
+
+def synthetic_corpus(n_vectors, n_queries, dimension, n_clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype('float32')
+    assignments = rng.integers(0, n_clusters, n_vectors + n_queries)
+    data = centers[assignments] + 0.35 * rng.standard_normal((n_vectors + n_queries, dimension)).astype('float32')
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:n_vectors], data[n_vectors:]
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        # Una consulta a la vez, como en search_similar_chunks
+        index.search(query.reshape(1, -1), k)
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    _, found = index.search(queries, k)
+    return per_query_ms, found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--pq-m", type=int, default=48)
+    args = parser.parse_args(argv)
+
+    vectors, queries = synthetic_corpus(args.vectors, args.queries, args.dimension, args.clusters)
+    ids = np.arange(len(vectors))
+    print(f"Corpus: {len(vectors)} vectores de dimensión {args.dimension}, {len(queries)} consultas, k={args.k}\n")
+    print(f"{'tipo':<10} {'parámetro':<14} {'build (s)':>10} {'ms/consulta':>12} {'recall@k':>9}")
+
+    start = time.perf_counter()
+    flat = build_index("flat", vectors, ids)
+    build_s = time.perf_counter() - start
+    flat_ms, truth = timed_search(flat, queries, args.k)
+    print(f"{'flat':<10} {'-':<14} {build_s:>10.2f} {flat_ms:>12.3f} {1.0:>9.3f}")
+
+    sweeps = [
+        ("ivf_flat", "nprobe", args.nprobe, {}),
+        ("ivf_pq", "nprobe", args.nprobe, {"pq_m": args.pq_m}),
+        ("hnsw", "ef_search", args.ef_search, {}),
+    ]
+    for index_type, knob, values, extra in sweeps:
+        start = time.perf_counter()
+        index = build_index(index_type, vectors, ids, extra)
+        build_s = time.perf_counter() - start
+        for value in values:
+            set_search_params(index, {**extra, knob: value})
+            ms, found = timed_search(index, queries, args.k)
+            print(f"{index_type:<10} {f'{knob}={value}':<14} {build_s:>10.2f} {ms:>12.3f} "
+                  f"{recall_at_k(found, truth):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
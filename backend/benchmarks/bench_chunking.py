@@ -0,0 +1,95 @@
+"""
+Benchmark de los fragmentadores de ``chunking.py`` sobre un conjunto de PDFs.
+
+Para cada fragmentador reporta el número de fragmentos, su tamaño medio, el
+tiempo de fragmentación y el de construcción del índice (incrustación + FAISS).
+Si se pasa un archivo de consultas, mide también la calidad de recuperación:
+hit@k (algún fragmento recuperado contiene la respuesta esperada) y MRR.
+
+El archivo de consultas es una lista JSON de objetos:
+
+    [{"question": "¿Cuántos días de permiso por matrimonio?", "answer_contains": "cinco días"}]
+
+    cd backend
+    python benchmarks/bench_chunking.py --docs docs/ --queries consultas.json --k 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import count_tokens, get_chunker, normalize_for_hash  # noqa: E402
+
+
+def evaluate(chunks, embeddings, model, queries, k):
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    question_embeddings = np.asarray(model.encode([q["question"] for q in queries]), dtype='float32')
+    _, results = index.search(question_embeddings, k)
+    hits, reciprocal_ranks = 0, 0.0
+    for query, ids in zip(queries, results):
+        expected = normalize_for_hash(query["answer_contains"])
+        for rank, chunk_id in enumerate(ids, start=1):
+            if chunk_id >= 0 and expected in normalize_for_hash(chunks[chunk_id]["text"]):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+    return hits / len(queries), reciprocal_ranks / len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", default="docs/")
+    parser.add_argument("--queries", default=None)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--chunkers", nargs="+", default=["line", "semantic"])
+    args = parser.parse_args(argv)
+
+    pdf_files = sorted(os.path.join(args.docs, f) for f in os.listdir(args.docs) if f.endswith(".pdf"))
+    if not pdf_files:
+        parser.error(f"No hay PDFs en '{args.docs}'.")
+    queries = None
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = json.load(f)
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+
+    print(f"{len(pdf_files)} PDFs en '{args.docs}'" + (f", {len(queries)} consultas" if queries else "") + "\n")
+    header = f"{'fragmentador':<12} {'fragmentos':>10} {'tokens/frag':>11} {'chunk (s)':>10} {'índice (s)':>10}"
+    if queries:
+        header += f" {f'hit@{args.k}':>8} {'MRR':>6}"
+    print(header)
+
+    for name in args.chunkers:
+        chunker = get_chunker(name)
+        start = time.perf_counter()
+        chunks = [chunk for path in pdf_files for chunk in chunker.chunk_pdf(path)]
+        chunk_s = time.perf_counter() - start
+        if not chunks:
+            print(f"{name:<12} {0:>10}")
+            continue
+
+        start = time.perf_counter()
+        embeddings = np.asarray(model.encode([c["text"] for c in chunks]), dtype='float32')
+        faiss.IndexFlatL2(embeddings.shape[1]).add(embeddings)
+        index_s = time.perf_counter() - start
+
+        avg_tokens = sum(count_tokens(c["text"]) for c in chunks) / len(chunks)
+        row = f"{name:<12} {len(chunks):>10} {avg_tokens:>11.1f} {chunk_s:>10.2f} {index_s:>10.2f}"
+        if queries:
+            hit_rate, mrr = evaluate(chunks, embeddings, model, queries, args.k)
+            row += f" {hit_rate:>8.3f} {mrr:>6.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Banco de pruebas de ``db_pool.ConnectionPool`` con SQLite como sustituto de SQL Server.
+
+Crea una base temporal con una tabla ``employees`` y lanza hilos que ejecutan las
+mismas consultas que la API (verificación, fecha de ingreso, nombre), primero
+abriendo una conexión por llamada y luego con el pool. ``--connect-latency-ms``
+simula el coste de abrir una conexión a SQL Server (TCP + TLS + login).
+
+Además comprueba los casos límite del pool: conexiones rotas descartadas por el
+chequeo de salud, reciclado de inactivas y ``PoolTimeout`` al agotarse.
+
+    cd backend
+    python benchmarks/bench_db_pool.py --threads 16 --calls 200 --connect-latency-ms 20
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import ConnectionPool, PoolTimeout  # noqa: E402
+
+N_EMPLOYEES = 1000
+
+
+def create_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE employees (employee_id INTEGER PRIMARY KEY, cedula TEXT, "
+                 "first_name TEXT, last_name TEXT, hire_date TEXT)")
+    conn.executemany(
+        "INSERT INTO employees VALUES (?, ?, ?, ?, ?)",
+        [(i, f"001-{i:07d}-1", f"Nombre{i}", f"Apellido{i}", "2020-01-15") for i in range(1, N_EMPLOYEES + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def make_connect(path, latency_ms):
+    def connect():
+        time.sleep(latency_ms / 1000)
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+
+def employee_lookups(get_connection, employee_id):
+    """Las tres consultas de un flujo de verificación, cada una con su propia conexión como en la API."""
+    results = []
+    for query, params in (
+        ("SELECT employee_id FROM employees WHERE cedula = ? AND employee_id = ?",
+         (f"001-{employee_id:07d}-1", employee_id)),
+        ("SELECT hire_date FROM employees WHERE employee_id = ?", (employee_id,)),
+        ("SELECT first_name || ' ' || last_name FROM employees WHERE employee_id = ?", (employee_id,)),
+    ):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            results.append(cursor.fetchone()[0])
+        finally:
+            conn.close()
+    return results
+
+
+def run_load(get_connection, threads, calls):
+    errors = []
+
+    def worker(offset):
+        for i in range(calls):
+            employee_id = (offset * calls + i) % N_EMPLOYEES + 1
+            try:
+                result = employee_lookups(get_connection, employee_id)
+                if result[0] != employee_id or result[2] != f"Nombre{employee_id} Apellido{employee_id}":
+                    errors.append(f"resultado incorrecto para {employee_id}: {result}")
+            except Exception as e:
+                errors.append(repr(e))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, errors
+
+
+def check_edge_cases(connect):
+    # Una conexión que se rompe mientras está libre (p. ej. el servidor la cerró) se descarta al prestarse
+    pool = ConnectionPool(connect, min_size=1, max_size=1, health_check_interval=0)
+    conn = pool.acquire()
+    conn.close()
+    conn._raw.close()
+    conn = pool.acquire()
+    conn.cursor().execute("SELECT 1")
+    conn.close()
+    assert pool.stats.health_check_failures == 1, pool.as_dict()
+
+    # Tiempo de espera agotado con todas las conexiones en uso
+    held = pool.acquire()
+    try:
+        pool.acquire(timeout=0.05)
+        raise AssertionError("se esperaba PoolTimeout")
+    except PoolTimeout:
+        pass
+    held.close()
+    assert pool.stats.timeouts == 1
+
+    # Reciclado de conexiones inactivas
+    pool.max_idle_seconds = 0.01
+    time.sleep(0.02)
+    pool.prune()
+    assert pool.stats.recycled >= 1 and pool.as_dict()["idle"] == pool.min_size, pool.as_dict()
+    pool.close()
+    print("Casos límite: chequeo de salud, timeout y reciclado OK")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--connect-latency-ms", type=float, default=20)
+    parser.add_argument("--max-size", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rrhh.db")
+        create_database(path)
+        connect = make_connect(path, args.connect_latency_ms)
+        check_edge_cases(connect)
+
+        total_calls = args.threads * args.calls * 3
+        print(f"\n{args.threads} hilos x {args.calls} flujos (3 consultas cada uno), "
+              f"apertura de conexión {args.connect_latency_ms} ms\n")
+        print(f"{'modo':<22} {'total (s)':>10} {'consultas/s':>12} {'errores':>8}")
+
+        elapsed, errors = run_load(connect, args.threads, args.calls)
+        print(f"{'conexión por llamada':<22} {elapsed:>10.2f} {total_calls / elapsed:>12.0f} {len(errors):>8}")
+
+        pool = ConnectionPool(connect, min_size=2, max_size=args.max_size)
+        elapsed, errors = run_load(pool.acquire, args.threads, args.calls)
+        print(f"{'pool':<22} {elapsed:>10.2f} {total_calls / elapsed:>12.0f} {len(errors):>8}")
+        for error in errors[:5]:
+            print(f"  {error}")
+        print(f"\nMétricas del pool: {pool.as_dict()}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de rendimiento de las incrustaciones de preguntas: una pasada del
+modelo por pregunta (``model.encode([pregunta])`` en cada hilo, como antes)
+frente a los micro-lotes de ``EmbeddingBatcher``.
+
+Para cada nivel de concurrencia, ``--concurrency`` hilos piden incrustaciones de
+preguntas distintas (sin caché) hasta completar ``--requests`` y se miden las
+preguntas por segundo, la latencia p50/p95 y, con lotes, el tamaño medio del lote.
+
+Usa el modelo de la API (``--model``). Con ``--synthetic`` no hace falta
+sentence-transformers: un modelo sintético de capas densas con numpy, con un
+coste fijo por pasada y otro por pregunta, sirve para probar el mecanismo pero
+no para sacar conclusiones sobre MiniLM.
+
+    cd backend
+    python benchmarks/bench_embedding_batcher.py --concurrency 1 4 16 64 --requests 2000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+TOPICS = ("vacaciones", "préstamos", "certificado de empleo", "permiso por matrimonio", "descuentos de nómina",
+          "fecha de pago", "horas faltantes", "beneficios de descanso", "sistema interno", "prestaciones")
+
+
+class SyntheticModel:
+    """Capas densas sobre ``tokens`` vectores por pregunta; numpy libera el GIL en las multiplicaciones."""
+
+    def __init__(self, dimension=384, hidden=1536, layers=6, tokens=24, seed=0):
+        rng = np.random.default_rng(seed)
+        self.tokens = tokens
+        self._weights = [(rng.standard_normal((dimension, hidden)).astype('float32') / np.sqrt(dimension),
+                          rng.standard_normal((hidden, dimension)).astype('float32') / np.sqrt(hidden))
+                         for _ in range(layers)]
+
+    def encode(self, texts, batch_size=32):
+        hidden = np.stack([np.resize(np.frombuffer(text.encode('utf-8'), dtype='uint8'), (self.tokens, 384))
+                           for text in texts]).astype('float32') / 255
+        flat = hidden.reshape(-1, hidden.shape[-1])
+        for up, down in self._weights:
+            flat = flat + np.maximum(flat @ up, 0) @ down
+        return flat.reshape(len(texts), self.tokens, -1).mean(axis=1)
+
+
+def questions(n):
+    return [f"¿{i}: qué dice el manual sobre {TOPICS[i % len(TOPICS)]} en el caso {i * 7919 % 1000}?"
+            for i in range(n)]
+
+
+def run(encode_one, concurrency, texts):
+    latencies = []
+    lock = threading.Lock()
+    position = iter(range(len(texts)))
+
+    def client():
+        local = []
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            encode_one(texts[i])
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(texts) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--synthetic", action="store_true", help="Modelo sintético con numpy en lugar de --model")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--max-batch-size", type=int, default=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32)))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 1)))
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        model = SyntheticModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+    texts = questions(args.requests)
+    model.encode(texts[:8])
+
+    print(f"{args.requests} preguntas por nivel; lotes de hasta {args.max_batch_size} con espera máxima "
+          f"de {args.max_wait_ms} ms\n")
+    print(f"{'concurrencia':>12} {'modo':<8} {'preg/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'lote medio':>11}")
+    for concurrency in args.concurrency:
+        direct = run(lambda text: model.encode([text]), concurrency, texts)
+        batcher = EmbeddingBatcher(lambda batch: model.encode(batch, batch_size=len(batch)),
+                                   max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        batched = run(batcher.encode, concurrency, texts)
+        average = batcher.as_dict()["batch_size"]["avg"]
+        for name, (per_second, p50, p95), batch in (("directo", direct, "-"), ("lotes", batched, f"{average:.1f}")):
+            print(f"{concurrency:>12} {name:<8} {per_second:>9.1f} {p50:>8.2f} {p95:>8.2f} {batch:>11}")
+        print(f"{'':>12} {'':<8} {batched[0] / direct[0]:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Regresión y micro-benchmark del enrutador de intenciones (``intent_router.py``).
+
+Regresión: ``intent_cases.json`` guarda preguntas con la decisión que tomaba la
+cadena de ``if/elif`` de ``route_verified_question`` (copiada abajo tal cual,
+``legacy_route``). Para cada una se comprueba que la cadena sigue decidiendo
+eso y que el enrutador compilado con ``intents.json`` devuelve la misma
+categoría y el mismo texto. Los casos de ``normalization`` son las diferencias
+buscadas: acentos, puntuación o espacios que la cadena no reconocía.
+
+Micro-benchmark: microsegundos por mensaje de la cadena y del enrutador con las
+intenciones actuales y con ``--extra-intents`` intenciones sintéticas más, para
+ver cómo crece cada uno (la cadena se modela entonces como un bucle de ``in``).
+
+    cd backend
+    python benchmarks/bench_intent_router.py --rounds 2000 --extra-intents 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import IntentRouter  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_cases.json")
+HIRE_DATE_INFO = " el día 15 de March de 2025"
+
+
+def legacy_route(lower_q, hire_date_info=HIRE_DATE_INFO):
+    """La cadena de if/elif anterior a intents.json, sin la consulta de la fecha de ingreso."""
+    if "hola" in lower_q or "saludos" in lower_q:
+        response_text = "👋 ¡Hola! Soy tu Asistente virtual Banco.\n\nEstamos por esta vía para apoyarte. ¿En qué puedo ayudarte hoy?"
+        category = "Welcome"
+    elif "certificado de empleo" in lower_q or "carta de trabajo" in lower_q:
+        response_text = "📄 Solicitud de Certificado de Empleo\n\nPuedes hacerlo directamente desde el Sistema Interno.\n\nPasos:\n1. Ingresa con tu usuario y contraseña.\n2. Selecciona la opción Recursos Humanos.\n3. Elige Certificado de Empleo y completa la información solicitada.\n\n¡Listo! 😊"
+        category = "Certificado de Empleo"
+    elif "tiempo libre" in lower_q or "vacaciones" in lower_q:
+        if "pago" in lower_q or "no me han pagado" in lower_q:
+            response_text = "💰 Pago de Beneficios de Descanso\n\nEl pago se realiza cada año según fecha de ingreso.\nPuedes revisar en Sistema Interno > Mis Pagos.\nSi no aparece, responde 'RECLAMO BENEFICIOS'."
+            category = "Beneficios - Pago"
+        else:
+            response_text = f"🏖️ Beneficios de Descanso\n\nCumples beneficios{hire_date_info}.\nTienes 14 días para disfrutar y pagar cada año.\nCon 5 años en adelante son 18 días pagados + 14 días de disfrute.\n\nPara solicitar:\n1. Ve al Sistema Interno.\n2. Ingresa con tu usuario y contraseña.\n3. Selecciona Solicitud de Beneficios.\n4. Completa la información.\n\nSi necesitas ayuda con el Sistema Interno, responde 'AYUDA SISTEMA'.\nDebe estar aprobado por tu supervisor.\nSe genera automáticamente tras aprobación."
+            category = "Beneficios de Descanso"
+    elif "permiso" in lower_q or "licencia" in lower_q:
+        if "nacimiento" in lower_q:
+            response_text = "👶 Permiso por Nacimiento\n\n2 días laborables pagados.\nTraer el Acta de nacimiento del bebé.\nRecuerda compartir la justificación con el supervisor."
+            category = "Permisos - Nacimiento"
+        elif "fallecimiento" in lower_q:
+            response_text = "🙏 Permiso por Fallecimiento\n\n3 días laborables pagados por la empresa.\nPor fallecimiento de madre, padre, hijos, abuelos o cónyuge.\nTraer el Acta de defunción.\nRecuerda compartir la justificación con el supervisor."
+            category = "Permisos - Fallecimiento"
+        elif "matrimonio" in lower_q:
+            response_text = "💍 Permiso por Matrimonio\n\n5 días laborables pagados.\nTraer el Acta de matrimonio.\nRecuerda compartir la justificación con el supervisor."
+            category = "Permisos - Matrimonio"
+        else:
+            response_text = "📋 Tipos de Permisos\n\nSegún el Código Laboral de la República Dominicana:\n- Nacimiento de hijo: 2 días\n- Fallecimiento (madre, padre, hijos, abuelos, cónyuge): 3 días\n- Matrimonio: 5 días\n\nRecuerda compartir la justificación con el supervisor."
+            category = "Permisos - General"
+    elif "faltan horas" in lower_q or "salario" in lower_q or "falta de horas" in lower_q:
+        response_text = "⏰ Horas Faltantes en Salario\n\nPor favor indícanos:\n- Puesto de Servicio y turno\n- Día pendiente\n- Cantidad de Horas faltantes\n\nEl equipo revisará el caso y te contactará en un máximo de 48 horas."
+        category = "Salario - Horas Faltantes"
+    elif "descuento no reconocido" in lower_q:
+        response_text = "💸 Descuento No Reconocido\n\nPuedes ver tus descuentos en Sistema Interno > Mis Pagos.\nSi crees que hay un error, responde con 'RECLAMO DESCUENTO'.\nNuestro equipo validará la información pronto."
+        category = "Salario - Descuento"
+    elif "fecha de pago" in lower_q or "cuando pagan" in lower_q:
+        response_text = "📅 Fechas de Pago de Salario\n\n- Horas del 29 al 13: pagan el día 21 del mismo mes.\n- Horas del 14 al 28: pagan el día 6 del siguiente mes."
+        category = "Fecha de Pago"
+    elif "préstamos" in lower_q or "prestamos" in lower_q:
+        response_text = "💳 Préstamos\n\nEstamos trabajando para mejorar y aperturar este servicio.\nEste canal está disponible 24 horas con tu Asistente Virtual Banco.\n¡Gracias por contactarte!"
+        category = "Préstamos"
+    elif any(phrase in lower_q for phrase in ["agendar", "llamada", "hablar con alguien", "contactar representante", "necesito ayuda", "quiero hablar", "llamenme", "comunicarme"]):
+        return None, "schedule_call"
+    elif "ayuda sistema" in lower_q or "ayuda rrhh" in lower_q:
+        response_text = "🖥️ Ayuda con Sistema Interno\n\nPuedes consultar los instructivos o enlaces proporcionados.\nSi aún necesitas asistencia, podemos agendar una llamada."
+        category = "Sistema Interno Help"
+    elif "comprobante de pagos" in lower_q:
+        response_text = "📄 Comprobante de Pagos\n\nPuedes ver tus comprobantes en Sistema Interno > Mis Pagos."
+        category = "Comprobante de Pagos"
+    elif "prestaciones" in lower_q:
+        response_text = "🎁 Prestaciones\n\nPara información, completa el formulario con:\n- Nombre\n- Cédula\n- Teléfono\n- Código RRHH\n\nEsto nos ayudará a asistirte adecuadamente."
+        category = "Prestaciones"
+    else:
+        return None, "rag"
+    return response_text, category
+
+
+def router_route(router, lower_q, hire_date_info=HIRE_DATE_INFO):
+    """Lo mismo que route_verified_question en app_openai_api.py, con el campo fijo."""
+    match = router.route(lower_q)
+    if match is None:
+        return None, "rag"
+    if match.action:
+        return None, match.action
+    response_text = match.response
+    if match.fields:
+        response_text = response_text.format(hire_date_info=hire_date_info)
+    return response_text, match.category
+
+
+def check_regression(router, cases):
+    failures = []
+    for case in cases["cases"]:
+        lower_q = case["question"].lower().strip()
+        legacy, routed = legacy_route(lower_q), router_route(router, lower_q)
+        if legacy[1] != case["expected"]:
+            failures.append(f"la cadena ya no decide {case['expected']!r}: {case['question']!r} -> {legacy[1]!r}")
+        elif routed != legacy:
+            failures.append(f"{case['question']!r}: cadena {legacy[1]!r}, enrutador {routed[1]!r}")
+    for case in cases["normalization"]:
+        lower_q = case["question"].lower().strip()
+        legacy, routed = legacy_route(lower_q), router_route(router, lower_q)
+        if legacy[1] != case["legacy"] or routed[1] != case["expected"]:
+            failures.append(f"{case['question']!r}: cadena {legacy[1]!r} (se esperaba {case['legacy']!r}), "
+                            f"enrutador {routed[1]!r} (se esperaba {case['expected']!r})")
+    for failure in failures:
+        print(f"  FALLO {failure}")
+    print(f"Regresión: {len(cases['cases'])} casos iguales a la cadena y {len(cases['normalization'])} "
+          f"de normalización, {len(failures)} fallos")
+    return not failures
+
+
+def synthetic_intents(count, seed=7):
+    """Intenciones de relleno con prioridad mínima y tres frases de dos palabras inventadas."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def word():
+        return "".join(rng.choice(letters) for _ in range(rng.randint(5, 9)))
+    return [{"name": f"sintetica_{i}", "priority": -1 - i, "category": f"Sintética {i}", "response": "-",
+             "phrases": [f"{word()} {word()}" for _ in range(3)]} for i in range(count)]
+
+
+def linear_chain(intents):
+    """La cadena de if/elif como bucle: frases de cada intención en orden de prioridad."""
+    ordered = sorted(intents, key=lambda intent: -intent.get("priority", 0))
+    chain = [(intent["phrases"], intent.get("category") or intent.get("action")) for intent in ordered]
+
+    def route(lower_q):
+        for phrases, result in chain:
+            if any(phrase in lower_q for phrase in phrases):
+                return result
+        return "rag"
+    return route
+
+
+def per_message_us(route, questions, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for question in questions:
+            route(question)
+    return (time.perf_counter() - start) * 1e6 / (rounds * len(questions))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intents", default=os.path.join(BACKEND_DIR, "intents.json"))
+    parser.add_argument("--rounds", type=int, default=2000, help="pasadas por todas las preguntas de la regresión")
+    parser.add_argument("--extra-intents", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with open(args.intents, encoding="utf-8") as f:
+        intents = json.load(f)["intents"]
+    with open(CASES_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    router = IntentRouter(intents)
+    ok = check_regression(router, cases)
+
+    questions = [case["question"].lower().strip() for case in cases["cases"] + cases["normalization"]]
+    print(f"\n{len(questions)} preguntas x {args.rounds} pasadas\n")
+    print(f"{'intenciones':<14} {'cadena (µs)':>12} {'enrutador (µs)':>15}")
+    print(f"{len(intents):<14} {per_message_us(legacy_route, questions, args.rounds):>12.2f} "
+          f"{per_message_us(router.route, questions, args.rounds):>15.2f}")
+    if args.extra_intents:
+        extended = intents + synthetic_intents(args.extra_intents)
+        print(f"{len(extended):<14} {per_message_us(linear_chain(extended), questions, args.rounds):>12.2f} "
+              f"{per_message_us(IntentRouter(extended).route, questions, args.rounds):>15.2f}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
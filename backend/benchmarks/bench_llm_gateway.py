@@ -0,0 +1,222 @@
+"""
+Banco de pruebas de ``llm_gateway`` contra un OpenAI simulado.
+
+Levanta ``fake_upstreams.py`` en otro proceso con ``--max-concurrent`` llamadas
+simultáneas como máximo (responde 429 al superarlas, como el límite de OpenAI)
+y lanza de golpe ``--requests`` peticiones repartidas entre ``--unique``
+prompts distintos:
+
+- ``directo``: cada petición llama al cliente de OpenAI, como antes de la pasarela.
+- ``pasarela``: ``LLMGateway`` agrupa los prompts repetidos y limita la concurrencia.
+- ``pasarela sin repetidos``: todos los prompts distintos; solo actúa el limitador.
+- ``pasarela async``: ``AsyncLLMGateway`` con ``AsyncOpenAI``.
+
+Antes comprueba sin red los casos límite: agrupación, plazo de la cola,
+reintentos de 429 y presupuesto de tokens.
+
+    cd backend
+    python benchmarks/bench_llm_gateway.py --requests 200 --unique 20 --max-concurrent 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import free_port, start_fake_upstreams_process, upstream_stats  # noqa: E402
+from llm_gateway import AsyncLLMGateway, LLMGateway, QueueTimeout, TokenBudget  # noqa: E402
+
+
+def params_for(n):
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": f"Manual... Pregunta: ¿Cuál es la política número {n}?"}],
+        "temperature": 0.5,
+    }
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "http://openai.invalid/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def check_edge_cases():
+    # Agrupación: 10 peticiones iguales simultáneas, una sola llamada
+    calls = []
+
+    def slow_call(**params):
+        calls.append(params)
+        time.sleep(0.1)
+        return "respuesta"
+
+    gateway = LLMGateway(slow_call, max_concurrency=4)
+    with ThreadPoolExecutor(10) as executor:
+        results = list(executor.map(lambda _: gateway.complete(params_for(1)), range(10)))
+    assert results == ["respuesta"] * 10 and len(calls) == 1, gateway.as_dict()
+    assert gateway.coalesced == 9
+
+    # Plazo de la cola: con la única plaza ocupada, la siguiente petición distinta no espera más de queue_timeout
+    gateway = LLMGateway(slow_call, max_concurrency=1, queue_timeout=0.02)
+    thread = threading.Thread(target=gateway.complete, args=(params_for(1),))
+    thread.start()
+    time.sleep(0.01)
+    try:
+        gateway.complete(params_for(2))
+        raise AssertionError("se esperaba QueueTimeout")
+    except QueueTimeout:
+        pass
+    thread.join()
+    assert gateway.queue_timeouts == 1, gateway.as_dict()
+
+    # Reintentos: dos 429 y luego éxito; un error no transitorio no se reintenta
+    attempts = []
+
+    def flaky_call(**params):
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise rate_limit_error()
+        return "respuesta"
+
+    gateway = LLMGateway(flaky_call, backoff_base=0.01)
+    assert gateway.complete(params_for(1)) == "respuesta"
+    assert gateway.retries == 2 and gateway.rate_limited == 2 and gateway.upstream_calls == 3, gateway.as_dict()
+
+    def bad_request(**params):
+        raise ValueError("petición inválida")
+
+    gateway = LLMGateway(bad_request)
+    try:
+        gateway.complete(params_for(1))
+        raise AssertionError("se esperaba ValueError")
+    except ValueError:
+        pass
+    assert gateway.retries == 0 and gateway.failures == 1, gateway.as_dict()
+
+    # Presupuesto de tokens: la segunda reserva espera a que se rellene la cubeta,
+    # y si la espera supera el plazo de la cola se rechaza sin consumir tokens
+    budget = TokenBudget(600)
+    assert budget.reserve(600) == 0.0
+    assert 2.9 < budget.reserve(30) <= 3.0
+    gateway = LLMGateway(slow_call, tokens_per_minute=600, queue_timeout=1)
+    gateway.complete(params_for(1))
+    try:
+        gateway.complete(params_for(2))
+        raise AssertionError("se esperaba QueueTimeout")
+    except QueueTimeout:
+        pass
+    assert gateway.queue_timeouts == 1, gateway.as_dict()
+    print("Casos límite: agrupación, plazo de la cola, reintentos y presupuesto de tokens OK")
+
+
+def run_threads(complete, requests, concurrency, unique):
+    """Lanza las peticiones con hilos; devuelve (latencias, errores, segundos)."""
+    latencies, errors = [], []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            complete(params_for(i % unique))
+        except Exception as e:
+            errors.append(e)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_async(base_url, requests, unique, gateway_kwargs):
+    async def main():
+        client = AsyncOpenAI(api_key="sk-fake", base_url=base_url, max_retries=0)
+        gateway = AsyncLLMGateway(client.chat.completions.create, **gateway_kwargs)
+        latencies, errors = [], []
+
+        async def one(i):
+            start = time.perf_counter()
+            try:
+                await gateway.complete(params_for(i % unique))
+            except Exception as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        await client.close()
+        return (latencies, errors, elapsed), gateway
+    return asyncio.run(main())
+
+
+def report(name, result, before, after, gateway=None):
+    latencies, errors, elapsed = result
+    latencies.sort()
+    upstream = after["chat_completions"] - before["chat_completions"]
+    rejected = after["rate_limited"] - before["rate_limited"]
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{name:<24} {len(latencies) - len(errors):>5} {len(errors):>7} {upstream:>9} {rejected:>6} "
+          f"{p50:>9.0f} {p95:>9.0f} {elapsed:>8.2f}")
+    if gateway is not None:
+        stats = gateway.as_dict()
+        print(f"{'':<24} agrupadas={stats['coalesced']} reintentos={stats['retries']} "
+              f"cola máx.={stats['max_queue_depth']} espera p95={stats['queue_wait']['p95_ms']} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--unique", type=int, default=20, help="prompts distintos en la ráfaga")
+    parser.add_argument("--concurrency", type=int, default=100, help="hilos que lanzan las peticiones")
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--max-concurrent", type=int, default=8, help="límite del OpenAI simulado")
+    parser.add_argument("--gateway-concurrency", type=int, default=None,
+                        help="max_concurrency de la pasarela (por defecto, --max-concurrent)")
+    parser.add_argument("--queue-timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    check_edge_cases()
+
+    port = free_port()
+    upstreams = start_fake_upstreams_process(port, args.latency_ms, max_concurrent=args.max_concurrent)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    gateway_kwargs = {"max_concurrency": args.gateway_concurrency or args.max_concurrent,
+                      "queue_timeout": args.queue_timeout}
+    try:
+        client = OpenAI(api_key="sk-fake", base_url=base_url, max_retries=0)
+        print(f"\n{args.requests} peticiones a la vez ({args.unique} prompts distintos), OpenAI simulado con "
+              f"{args.latency_ms} ms y {args.max_concurrent} llamadas simultáneas como máximo\n")
+        print(f"{'modo':<24} {'ok':>5} {'errores':>7} {'llamadas':>9} {'429':>6} "
+              f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'total (s)':>8}")
+
+        before = upstream_stats(port)
+        result = run_threads(lambda params: client.chat.completions.create(**params),
+                             args.requests, args.concurrency, args.unique)
+        report("directo", result, before, upstream_stats(port))
+
+        for name, unique in (("pasarela", args.unique), ("pasarela sin repetidos", args.requests)):
+            gateway = LLMGateway(client.chat.completions.create, **gateway_kwargs)
+            before = upstream_stats(port)
+            result = run_threads(gateway.complete, args.requests, args.concurrency, unique)
+            report(name, result, before, upstream_stats(port), gateway)
+
+        before = upstream_stats(port)
+        result, gateway = run_async(base_url, args.requests, args.unique, gateway_kwargs)
+        report("pasarela async", result, before, upstream_stats(port), gateway)
+        print(f"\nMáxima concurrencia vista por el OpenAI simulado: {upstream_stats(port)['max_concurrent_seen']}")
+    finally:
+        upstreams.terminate()
+
+
+if __name__ == "__main__":
+    main()
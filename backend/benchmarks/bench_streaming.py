@@ -0,0 +1,116 @@
+"""
+Tiempo hasta la primera parte de la respuesta: ``/ask`` frente a ``/ask/stream``.
+
+Levanta la API como ``load_test_ask.py`` (sesiones en memoria, perfiles en
+caché, OpenAI simulado en otro proceso) con un OpenAI que tarda
+``--latency-ms`` en dar el primer token y ``--token-delay-ms`` por palabra
+después. Envía ``--questions`` preguntas distintas a cada ruta, una tras otra, y
+compara lo que espera el usuario de WhatsApp: la respuesta completa en
+``/ask`` y la primera parte en ``/ask/stream``.
+
+    cd backend
+    python benchmarks/bench_streaming.py --questions 30 --latency-ms 400 --token-delay-ms 30
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import free_port, start_fake_upstreams_process  # noqa: E402
+from load_test_ask import configure_environment, seed_state, sender_for, serve_flask, serve_quart  # noqa: E402
+
+
+def question_payload(i):
+    return {"sender": sender_for(i), "question": f"¿Cuál es la política de vestimenta para el área {i}?"}
+
+
+def ask(client, i):
+    start = time.perf_counter()
+    response = client.post("/ask", json=question_payload(i))
+    response.raise_for_status()
+    return {"first_part_ms": (time.perf_counter() - start) * 1000, "total_ms": (time.perf_counter() - start) * 1000}
+
+
+def ask_stream(client, i):
+    """Lee los eventos SSE; devuelve las latencias medidas en el cliente y las del evento ``done``."""
+    start = time.perf_counter()
+    result, event = {"parts": 0}, None
+    with client.stream("POST", "/ask/stream", json=question_payload(i)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "part":
+                    result["parts"] += 1
+                    result.setdefault("first_part_ms", (time.perf_counter() - start) * 1000)
+                elif event == "done":
+                    result["server_ttft_ms"] = data.get("ttft_ms")
+    result["total_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=400, help="hasta el primer token")
+    parser.add_argument("--token-delay-ms", type=float, default=30, help="por palabra generada")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    args = parser.parse_args(argv)
+
+    upstream_port = free_port()
+    upstreams = start_fake_upstreams_process(upstream_port, args.latency_ms, token_delay_ms=args.token_delay_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(upstream_port, tmp, llm_concurrency=8)
+        import app_openai_api as core
+        import app_async
+        seed_state(core)
+        ports = {}
+        if "sync" in args.modes:
+            ports["sync"] = serve_flask(core.app, 4)
+        if "async" in args.modes:
+            ports["async"] = serve_quart(app_async.app)
+
+        print(f"\nOpenAI simulado: primer token a {args.latency_ms} ms, {args.token_delay_ms} ms por palabra; "
+              f"{args.questions} preguntas por ruta\n")
+        print(f"{'modo':<6} {'ruta':<12} {'1ª parte p50':>13} {'1ª parte p95':>13} {'total p50':>10} "
+              f"{'TTFT p50':>9} {'partes':>7}")
+        offset = 0
+        for mode, port in ports.items():
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                for _ in range(50):
+                    try:
+                        client.get("/counts")
+                        break
+                    except httpx.HTTPError:
+                        time.sleep(0.1)
+                for route, run in (("/ask", ask), ("/ask/stream", ask_stream)):
+                    # Preguntas nuevas en cada ruta para que no respondan las cachés
+                    results = [run(client, offset + i) for i in range(args.questions)]
+                    offset += args.questions
+                    first = [r["first_part_ms"] for r in results]
+                    total = [r["total_ms"] for r in results]
+                    ttft = [r["server_ttft_ms"] for r in results if r.get("server_ttft_ms") is not None]
+                    parts = sum(r.get("parts", 1) for r in results) / len(results)
+                    print(f"{mode:<6} {route:<12} {percentile(first, 0.5):>10.0f} ms {percentile(first, 0.95):>10.0f} ms "
+                          f"{percentile(total, 0.5):>7.0f} ms "
+                          f"{(f'{percentile(ttft, 0.5):.0f} ms') if ttft else '-':>9} {parts:>7.1f}")
+        upstreams.terminate()
+        core.log_writer.close()
+
+
+if __name__ == "__main__":
+    main()
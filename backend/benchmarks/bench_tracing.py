@@ -0,0 +1,117 @@
+"""
+Micro-benchmark del coste de las trazas por etapa (``tracing.py``).
+
+Mide los nanosegundos por llamada de una función vacía sin decorar, con
+``@tracer.traced`` (activado y con ``TRACING_ENABLED=0``) y con un bloque
+``with tracer.span(...)``, primero en un hilo y luego con ``--threads`` hilos a
+la vez sobre la misma etapa (compiten por el lock de su histograma). También
+mide cuánto tarda en generarse el texto de ``/metrics`` con ``--stages`` etapas
+y ``--categories`` categorías por ruta.
+
+Una pregunta a ``/ask`` pasa por unas diez etapas: el coste añadido por
+pregunta es unas diez veces el de una etapa, frente a los milisegundos de
+``model.encode``, FAISS u OpenAI.
+
+    cd backend
+    python benchmarks/bench_tracing.py --calls 200000 --threads 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import PrometheusText  # noqa: E402
+from tracing import Tracer  # noqa: E402
+
+
+def noop():
+    return None
+
+
+def ns_per_call(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def span_loop(tracer, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with tracer.span("etapa"):
+            pass
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def concurrent_ns_per_call(func, calls, threads):
+    """Nanosegundos por llamada (tiempo total / llamadas) con ``threads`` hilos a la vez."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(calls):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return (time.perf_counter() - start) * 1e9 / (calls * threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--stages", type=int, default=12)
+    parser.add_argument("--categories", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    enabled = Tracer(enabled=True)
+    disabled = Tracer(enabled=False)
+    traced = enabled.traced("etapa")(noop)
+    traced_disabled = disabled.traced("etapa")(noop)
+
+    baseline = ns_per_call(noop, args.calls)
+    print(f"{args.calls} llamadas por caso\n")
+    print(f"{'caso':<34}{'ns/llamada':>12}{'añadido':>12}")
+    for name, ns in (
+        ("función sin decorar", baseline),
+        ("@traced (TRACING_ENABLED=0)", ns_per_call(traced_disabled, args.calls)),
+        ("@traced", ns_per_call(traced, args.calls)),
+        ("with tracer.span()", span_loop(enabled, args.calls)),
+    ):
+        print(f"{name:<34}{ns:>12.0f}{ns - baseline:>12.0f}")
+
+    calls = max(1, args.calls // args.threads)
+    concurrent_baseline = concurrent_ns_per_call(noop, calls, args.threads)
+    concurrent = concurrent_ns_per_call(traced, calls, args.threads)
+    print(f"\n{args.threads} hilos sobre la misma etapa: {concurrent:.0f} ns/llamada "
+          f"(sin decorar {concurrent_baseline:.0f})")
+
+    tracer = Tracer(enabled=True)
+    for stage in range(args.stages):
+        tracer.span(f"etapa_{stage}").__enter__().__exit__(None, None, None)
+    for route in ("/ask", "/ask/stream"):
+        for category in range(args.categories):
+            tracer.observe_request(route, f"categoria_{category}", 0.25)
+    tracer.count("upstream_errors", upstream="openai", reason="error")
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        text = PrometheusText(prefix="bankbot_")
+        tracer.write_prometheus(text)
+        body = text.render()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / rounds
+    print(f"\n/metrics con {args.stages} etapas y {2 * args.categories} series de preguntas: "
+          f"{elapsed_ms:.2f} ms, {len(body.splitlines())} líneas, {len(body) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark de arranque y memoria con 1 y N workers: índice cargado entero en
+cada proceso frente a índice mapeado en memoria (``DOC_INDEX_MMAP``).
+
+Construye un índice sintético de ``--chunks`` fragmentos (vectores aleatorios y
+textos de ``--text-chars`` caracteres) y, para cada modo y cada número de
+workers, arranca los procesos a la vez. Cada worker carga el índice, hace
+``--queries`` búsquedas (el índice plano recorre todos los vectores, como en
+producción) y, con todos los workers vivos, lee su RSS y su PSS de
+``/proc/self/smaps_rollup``. El PSS reparte las páginas compartidas entre los
+procesos que las usan, así que la suma de PSS es la memoria real del grupo.
+
+Modos:
+
+- ``copia``: ``DOC_INDEX_MMAP=0``, cada worker lee el índice y ``chunks.json`` en su memoria.
+- ``mmap``: ``DOC_INDEX_MMAP=1``, índice y textos compartidos desde la caché del sistema operativo.
+- ``mmap+preload`` (solo con ``--model``): además el modelo se carga una vez en el
+  proceso padre y los workers se crean con fork, como ``gunicorn --preload`` con
+  ``MODEL_PRELOAD=eager``; en los otros modos cada worker carga su modelo.
+
+Solo Linux (``/proc``).
+
+    cd backend
+    python benchmarks/bench_workers.py --chunks 100000 --workers 1 4
+    python benchmarks/bench_workers.py --chunks 20000 --workers 4 --model all-MiniLM-L6-v2
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doc_index import DocumentIndex  # noqa: E402
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+WORDS = ("vacaciones", "préstamo", "nómina", "permiso", "certificado", "beneficio", "horario", "descuento")
+
+
+def build_synthetic_index(index_dir, n_chunks, dimension, text_chars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = DocumentIndex(index_dir, dimension)
+    per_file = 10000
+    for start in range(0, n_chunks, per_file):
+        path = f"manual_{start // per_file}.pdf"
+        count = min(per_file, n_chunks - start)
+        vectors = rng.standard_normal((count, dimension)).astype('float32')
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        words = rng.integers(0, len(WORDS), (count, text_chars // 10))
+        batch = [(path, {"text": " ".join(WORDS[w] for w in row)[:text_chars]}) for row in words]
+        index.manifest["files"][path] = {"mtime": 0, "sha256": path, "ids": []}
+        index._add_batch(batch, vectors)
+    index.refresh_search_index()
+    index.save()
+    return index
+
+
+def memory_kb():
+    """(RSS, PSS) del proceso en KB."""
+    values = {}
+    with open(SMAPS_ROLLUP) as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def worker(index_dir, dimension, mmap, model_name, preloaded, queries, started, barrier, results):
+    model = preloaded
+    if model_name and model is None:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+    index = DocumentIndex.load(index_dir, dimension, mmap=mmap)
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(queries):
+        index.search(rng.standard_normal((1, dimension)).astype('float32'), k=4)
+    if model is not None:
+        model.encode(["¿Cuántos días de vacaciones tengo?"])
+    ready_seconds = time.time() - started
+    barrier.wait()
+    rss, pss = memory_kb()
+    results.put((ready_seconds, rss, pss))
+    # Los demás workers siguen vivos hasta que todos han medido
+    barrier.wait()
+
+
+def run(mode, n_workers, args, index_dir):
+    mmap = mode != "copia"
+    preload = mode == "mmap+preload"
+    context = multiprocessing.get_context("fork" if preload else "spawn")
+    preloaded = None
+    started = time.time()
+    if preload:
+        from sentence_transformers import SentenceTransformer
+        preloaded = SentenceTransformer(args.model)
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(index_dir, args.dimension, mmap, args.model, preloaded,
+                                             args.queries, started, barrier, results))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    ready = max(seconds for seconds, _, _ in measured)
+    rss = sum(r for _, r, _ in measured) / 1024
+    pss = sum(p for _, _, p in measured) / 1024
+    print(f"{mode:<13} {n_workers:>7} {ready:>10.2f} {rss / n_workers:>14.0f} {pss / n_workers:>14.0f} "
+          f"{rss:>10.0f} {pss:>10.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--text-chars", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--model", default=None, help="Modelo de sentence-transformers que carga cada worker")
+    parser.add_argument("--index-dir", default=None, help="Directorio del índice (por defecto, uno temporal)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(SMAPS_ROLLUP):
+        parser.error(f"{SMAPS_ROLLUP} no existe: este benchmark necesita Linux")
+    index_dir = args.index_dir or tempfile.mkdtemp(prefix="bench_workers_")
+    try:
+        start = time.perf_counter()
+        build_synthetic_index(index_dir, args.chunks, args.dimension, args.text_chars)
+        size_mb = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)) / 2 ** 20
+        print(f"Índice: {args.chunks} fragmentos de dimensión {args.dimension}, {size_mb:.0f} MB en disco "
+              f"(construido en {time.perf_counter() - start:.1f} s)\n")
+        print(f"{'modo':<13} {'workers':>7} {'listo (s)':>10} {'RSS/worker MB':>14} {'PSS/worker MB':>14} "
+              f"{'RSS MB':>10} {'PSS MB':>10}")
+        modes = ["copia", "mmap"] + (["mmap+preload"] if args.model else [])
+        for mode in modes:
+            for n_workers in args.workers:
+                run(mode, n_workers, args, index_dir)
+    finally:
+        if args.index_dir is None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Evaluación del clasificador de intenciones (``intent_classifier.py``) y de las
+llamadas a OpenAI que ahorra.
+
+1. Datos etiquetados (``intent_labeled.json``): preguntas que no están entre los
+   ``examples`` de ``intents.json``, cada una con la categoría que debería
+   recibir, ``schedule_call`` o ``rag`` si debe llegar a los manuales y al LLM.
+   Primero deciden las palabras clave (``intent_router``) y lo que llega a RAG
+   pasa por el clasificador. Para cada umbral se muestran:
+
+   - ``aciertos``: preguntas de intención con la respuesta correcta (palabras clave + clasificador).
+   - ``erróneas``: preguntas de intención que el clasificador manda a otra intención.
+   - ``falsas``: preguntas ``rag`` que reciben una respuesta predefinida en lugar de la del manual.
+   - ``LLM evitadas``: de las preguntas que las palabras clave mandaban a OpenAI,
+     las que ahora responde el clasificador.
+
+2. Historial: preguntas del log de peticiones (segmentos de ``--log-dir`` y el
+   antiguo ``--source`` request_log.json) que acabaron en OpenAI (categorías
+   ``OpenAI - ...``). Cuenta cuántas responderían ahora las palabras clave y
+   cuántas el clasificador con ``--threshold`` y ``--margin``. Las respuestas
+   servidas por la caché también se registran como ``OpenAI - ...``, así que la
+   reducción es sobre las llamadas como máximo.
+
+Usa el mismo modelo que la API (``--model``).
+
+    cd backend
+    python benchmarks/eval_intent_classifier.py --threshold 0.7 --margin 0.05 --log-dir request_log
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import IntentClassifier  # noqa: E402
+from intent_router import IntentRouter  # noqa: E402
+from rag_cache import normalize_question  # noqa: E402
+from request_log import iter_log_entries  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABELED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_labeled.json")
+
+
+def label_of(match):
+    return match.category or match.action
+
+
+def score_questions(router, classifier, model, questions):
+    """Para cada pregunta: (etiqueta por palabras clave o None, IntentMatch del clasificador, similitud, margen)."""
+    pending = [q for q in questions if router.route(q.lower().strip()) is None]
+    embeddings = model.encode(pending) if pending else []
+    ranked = {q: classifier.rank(embedding) for q, embedding in zip(pending, embeddings)}
+    results = []
+    for q in questions:
+        match = router.route(q.lower().strip())
+        if match is not None:
+            results.append((label_of(match), None, 0.0, 0.0))
+        else:
+            best, score, runner_up = ranked[q]
+            results.append((None, best, score, score - runner_up))
+    return results
+
+
+def decide(result, threshold, margin):
+    """Etiqueta final y el paso que la decidió ('palabras', 'clasificador' o 'rag')."""
+    keyword, best, score, gap = result
+    if keyword is not None:
+        return keyword, "palabras"
+    if best is not None and score >= threshold and gap >= margin:
+        return label_of(best), "clasificador"
+    return "rag", "rag"
+
+
+def evaluate_labeled(router, classifier, model, thresholds, margin, chosen):
+    with open(LABELED_PATH, encoding="utf-8") as f:
+        labeled = json.load(f)["questions"]
+    results = score_questions(router, classifier, model, [item["question"] for item in labeled])
+    intent_total = sum(item["label"] != "rag" for item in labeled)
+    rag_total = len(labeled) - intent_total
+    keyword_misses = sum(result[0] is None for result in results)
+    keyword_right = sum(result[0] == item["label"] for item, result in zip(labeled, results))
+    print(f"Datos etiquetados: {len(labeled)} preguntas ({intent_total} de intención, {rag_total} rag)")
+    print(f"Palabras clave: {keyword_right} correctas; {keyword_misses} irían a OpenAI\n")
+    print(f"{'umbral':>7} {'aciertos':>12} {'erróneas':>9} {'falsas':>9} {'LLM evitadas':>13}")
+    for threshold in thresholds:
+        right = wrong = false = avoided = 0
+        for item, result in zip(labeled, results):
+            label, step = decide(result, threshold, margin)
+            avoided += step == "clasificador"
+            if item["label"] == "rag":
+                false += label != "rag"
+            elif label == item["label"]:
+                right += 1
+            elif step == "clasificador":
+                wrong += 1
+        mark = " <" if abs(threshold - chosen) < 1e-9 else ""
+        print(f"{threshold:>7.2f} {right:>5}/{intent_total:<6} {wrong:>9} {false:>5}/{rag_total:<3} "
+              f"{avoided:>5}/{keyword_misses:<3} {100 * avoided / max(keyword_misses, 1):>3.0f}%{mark}")
+
+    print(f"\nErrores con umbral {chosen} y margen {margin}:")
+    for item, result in zip(labeled, results):
+        label, step = decide(result, chosen, margin)
+        if label != item["label"]:
+            _, best, score, gap = result
+            detail = f" (más parecida: {label_of(best)}, {score:.2f}, margen {gap:.2f})" if best is not None else ""
+            print(f"  [{step}] {item['question']!r}: {label} en vez de {item['label']}{detail}")
+
+
+def historical_questions(log_dir, source):
+    """Preguntas que el log registra como respondidas por OpenAI."""
+    entries = []
+    if log_dir and os.path.isdir(log_dir):
+        entries.extend(iter_log_entries(log_dir))
+    if source and os.path.exists(source) and os.path.getsize(source) > 0:
+        with open(source, encoding="utf-8") as f:
+            entries.extend(json.load(f))
+    return [entry["question"] for entry in entries
+            if str(entry.get("category", "")).startswith("OpenAI -") and entry.get("question")]
+
+
+def evaluate_history(router, classifier, model, questions, threshold, margin):
+    print(f"\nHistorial: {len(questions)} preguntas respondidas por OpenAI "
+          f"({len({normalize_question(q) for q in questions})} distintas)")
+    if not questions:
+        print("  No hay preguntas de OpenAI en el log.")
+        return
+    results = score_questions(router, classifier, model, questions)
+    steps, labels = Counter(), Counter()
+    for result in results:
+        label, step = decide(result, threshold, margin)
+        steps[step] += 1
+        if step != "rag":
+            labels[label] += 1
+    saved = steps["palabras"] + steps["clasificador"]
+    print(f"  Ahora por palabras clave: {steps['palabras']}; por el clasificador: {steps['clasificador']}; "
+          f"siguen a OpenAI: {steps['rag']}")
+    print(f"  Reducción de llamadas a OpenAI: {100 * saved / len(questions):.1f}%")
+    for label, count in labels.most_common(10):
+        print(f"    {label}: {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--intents", default=os.path.join(BACKEND_DIR, "intents.json"))
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", 0.7)))
+    parser.add_argument("--margin", type=float, default=float(os.getenv("INTENT_CLASSIFIER_MARGIN", 0.05)))
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9])
+    parser.add_argument("--log-dir", default=os.getenv("REQUEST_LOG_DIR", os.path.join(BACKEND_DIR, "request_log")))
+    parser.add_argument("--source", default=os.path.join(BACKEND_DIR, "request_log.json"))
+    args = parser.parse_args(argv)
+
+    model = SentenceTransformer(args.model)
+    router = IntentRouter.from_file(args.intents)
+    classifier = IntentClassifier(router, model.encode, threshold=args.threshold, margin=args.margin)
+    print(f"{classifier.size} prototipos de {len(router.intents)} intenciones\n")
+    thresholds = sorted(set(args.thresholds) | {args.threshold})
+    evaluate_labeled(router, classifier, model, thresholds, args.margin, args.threshold)
+    evaluate_history(router, classifier, model, historical_questions(args.log_dir, args.source),
+                     args.threshold, args.margin)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Servidor HTTP que simula las dependencias externas de la API para pruebas de carga.
+
+- ``POST /v1/chat/completions``: respuesta con el formato de la API de OpenAI
+  tras ``--latency-ms`` milisegundos (usar con ``OPENAI_BASE_URL=http://host:puerto/v1``).
+  Como el límite de OpenAI, responde 429 con ``Retry-After`` si ya hay
+  ``--max-concurrent`` peticiones en curso, y una fracción ``--error-rate`` de
+  las peticiones falla con 429 sin más. Con ``"stream": true`` envía la
+  respuesta palabra a palabra (SSE), una cada ``--token-delay-ms``; sin
+  streaming la respuesta llega al final, como en la API real.
+- ``POST /api/schedule_call``: el endpoint del portal web (lotes ``{"calls": [...]}``), tras ``--call-latency-ms``.
+- ``GET /stats``: llamadas recibidas por endpoint, 429 devueltos y máxima concurrencia vista.
+
+Cada conexión se atiende en su propio hilo, así que el servidor no limita la
+concurrencia de la prueba.
+
+    cd backend
+    python benchmarks/fake_upstreams.py --port 8900 --latency-ms 800
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_ANSWER = ("Según el manual, el uniforme es obligatorio de lunes a viernes. "
+               "Los viernes se permite vestimenta casual siempre que no haya reuniones con clientes. "
+               "Si tienes dudas sobre una prenda en particular, consulta con tu supervisor "
+               "o con el departamento de Recursos Humanos antes de usarla.")
+FAKE_TOKENS = re.findall(r'\S+\s*', FAKE_ANSWER)
+FAKE_USAGE = {"prompt_tokens": 400, "completion_tokens": len(FAKE_TOKENS), "total_tokens": 400 + len(FAKE_TOKENS)}
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency_ms=800, call_latency_ms=20, max_concurrent=0, error_rate=0.0,
+                 token_delay_ms=0):
+        super().__init__(address, FakeUpstreamHandler)
+        self.latency_ms = latency_ms
+        self.token_delay_ms = token_delay_ms
+        self.call_latency_ms = call_latency_ms
+        self.max_concurrent = max_concurrent
+        self.error_rate = error_rate
+        self.counts = {"chat_completions": 0, "schedule_call": 0, "rate_limited": 0, "max_concurrent_seen": 0}
+        self.counts_lock = threading.Lock()
+        self.active = 0
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+
+    def begin_completion(self):
+        """Registra una petición a OpenAI; devuelve False si debe rechazarse con 429."""
+        with self.counts_lock:
+            self.counts["chat_completions"] += 1
+            if (self.max_concurrent and self.active >= self.max_concurrent) or random.random() < self.error_rate:
+                self.counts["rate_limited"] += 1
+                return False
+            self.active += 1
+            self.counts["max_concurrent_seen"] = max(self.counts["max_concurrent_seen"], self.active)
+            return True
+
+    def end_completion(self):
+        with self.counts_lock:
+            self.active -= 1
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data):
+        body = f"data: {data}\n\n".encode('utf-8')
+        self.wfile.write(f"{len(body):x}\r\n".encode('ascii') + body + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_completion(self, request):
+        """Respuesta en streaming con el formato de la API: un fragmento por palabra y [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "gpt-4o-mini")}
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": token} for token in FAKE_TOKENS]
+        for i, delta in enumerate(deltas):
+            if i:
+                time.sleep(self.server.token_delay_ms / 1000)
+            self._send_chunk(json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+        self._send_chunk(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_chunk(json.dumps({**base, "choices": [], "usage": FAKE_USAGE}))
+        self._send_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.counts_lock:
+                self._send_json(200, dict(self.server.counts))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            if not self.server.begin_completion():
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                "code": "rate_limit_exceeded"}}, {"Retry-After": "1"})
+                return
+            try:
+                time.sleep(self.server.latency_ms / 1000)
+                if request.get("stream"):
+                    self._stream_completion(request)
+                    return
+                time.sleep(self.server.token_delay_ms * len(FAKE_TOKENS) / 1000)
+            finally:
+                self.server.end_completion()
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o-mini"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": FAKE_ANSWER},
+                    "finish_reason": "stop",
+                }],
+                "usage": FAKE_USAGE,
+            })
+        elif self.path == "/api/schedule_call":
+            self.server.count("schedule_call")
+            time.sleep(self.server.call_latency_ms / 1000)
+            self._send_json(200, {"results": [{"idempotency_key": call.get("idempotency_key"), "status": "created"}
+                                              for call in request.get("calls", [])]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+def start_fake_upstreams(port=0, latency_ms=800, call_latency_ms=20, max_concurrent=0, error_rate=0.0,
+                         token_delay_ms=0):
+    """Arranca el servidor en un hilo daemon y lo devuelve (``server.server_port`` tiene el puerto)."""
+    server = FakeUpstreamServer(("127.0.0.1", port), latency_ms, call_latency_ms, max_concurrent, error_rate,
+                                token_delay_ms)
+    threading.Thread(target=server.serve_forever, name="fake-upstreams", daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_fake_upstreams_process(port, latency_ms=800, max_concurrent=0, error_rate=0.0, token_delay_ms=0):
+    """
+    Arranca el servidor en otro proceso (para que no compita por el GIL con el
+    código medido) y espera a que responda. Devuelve el ``subprocess.Popen``.
+    """
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--port", str(port),
+                                "--latency-ms", str(latency_ms), "--max-concurrent", str(max_concurrent),
+                                "--error-rate", str(error_rate), "--token-delay-ms", str(token_delay_ms)],
+                               stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            upstream_stats(port)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Las dependencias simuladas no arrancaron.")
+
+
+def upstream_stats(port):
+    """Contadores de un servidor en marcha (``GET /stats``)."""
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--call-latency-ms", type=float, default=20)
+    parser.add_argument("--max-concurrent", type=int, default=0, help="0 = sin límite")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=0, help="tiempo de generación por palabra")
+    args = parser.parse_args(argv)
+    server = FakeUpstreamServer(("127.0.0.1", args.port), args.latency_ms, args.call_latency_ms,
+                                args.max_concurrent, args.error_rate, args.token_delay_ms)
+    print(f"Dependencias simuladas en http://127.0.0.1:{args.port} (OpenAI: {args.latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
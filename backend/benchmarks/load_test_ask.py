@@ -0,0 +1,224 @@
+"""
+Prueba de carga de ``/ask``: modo síncrono (Flask) frente a asíncrono (Quart).
+
+Levanta las dependencias simuladas de ``fake_upstreams.py`` (OpenAI con
+``--openai-latency-ms`` de latencia y el endpoint de agendar llamadas) en un
+proceso aparte y, en este proceso, la API Flask servida por un pool fijo de
+``--sync-threads`` hilos (como un worker de gunicorn con hilos) y la API Quart
+sobre hypercorn. Luego envía, desde un tercer proceso, ``--requests``
+peticiones con cada nivel de ``--concurrency`` y reporta rendimiento,
+latencias y errores. Así solo la API compite por el GIL de su proceso.
+Con menos de tres núcleos los tres procesos compiten por la CPU y los
+resultados a alta concurrencia no son representativos.
+
+Las sesiones usan el backend ``memory`` con remitentes ya verificados y los
+perfiles de RRHH se sirven desde la caché, así que la prueba no necesita MySQL
+ni SQL Server. Las preguntas son distintas entre sí para que las cachés de
+respuestas no eviten las llamadas a OpenAI. Usa el índice de documentos de
+``DOC_INDEX_DIR`` tal como esté (sin sincronizar).
+
+    cd backend
+    python benchmarks/load_test_ask.py --concurrency 10 50 200 --requests 400
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import free_port, start_fake_upstreams_process, upstream_stats  # noqa: E402
+
+N_SENDERS = 500
+
+
+def configure_environment(upstream_port, tmp, llm_concurrency):
+    """Configura la API para usar las dependencias simuladas. Debe llamarse antes de importarla."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "SCHEDULE_CALL_URL": f"http://127.0.0.1:{upstream_port}/api/schedule_call",
+        "LLM_MAX_CONCURRENCY": str(llm_concurrency),
+        "SESSION_BACKEND": "memory",
+        "SQL_POOL_MIN_SIZE": "0",
+        "SEMANTIC_CACHE_ENABLED": "0",
+        "DOC_INDEX_SYNC_ON_START": "0",
+        "REQUEST_LOG_DIR": os.path.join(tmp, "request_log"),
+        "REQUEST_LOG_INDEX_DB": os.path.join(tmp, "request_log.db"),
+        "CALL_OUTBOX_DB": os.path.join(tmp, "call_outbox.db"),
+    })
+
+
+def seed_state(core):
+    """Remitentes verificados y perfiles en caché, en lugar de MySQL y SQL Server."""
+    core.profile_cache.loader = lambda employee_id: {"name": f"Empleado {employee_id}", "hire_date": "2020-01-15"}
+    for n in range(N_SENDERS):
+        core.save_session(sender_for(n), str(1000 + n), True)
+
+
+def sender_for(n):
+    return f"1809555{n % N_SENDERS:04d}@c.us"
+
+
+def payload_for(i):
+    """80 % preguntas a los manuales, 10 % agendar llamada, 10 % respuestas predefinidas."""
+    kind = i % 10
+    if kind == 0:
+        question = "quiero agendar una llamada"
+    elif kind == 1:
+        question = "¿cuál es la fecha de pago?"
+    else:
+        question = f"¿Cuál es la política de uniformes para la sucursal {i}?"
+    return {"sender": sender_for(i), "question": question}
+
+
+def serve_flask(flask_app, threads):
+    """Sirve la app WSGI con un pool fijo de hilos; devuelve el puerto."""
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer("127.0.0.1", 0, flask_app, handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name="flask", daemon=True).start()
+    return server.server_port
+
+
+def serve_quart(quart_app):
+    """Sirve la app ASGI con hypercorn en su propio bucle de eventos; devuelve el puerto."""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    port = free_port()
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.backlog = 1024
+    config.accesslog = None
+    # Con shutdown_trigger hypercorn no instala manejadores de señales, que solo funcionan en el hilo principal
+    never = lambda: asyncio.Event().wait()  # noqa: E731
+    threading.Thread(target=lambda: asyncio.run(serve(quart_app, config, shutdown_trigger=never)),
+                     name="quart", daemon=True).start()
+    return port
+
+
+async def wait_until_ready(client, url):
+    for _ in range(100):
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"El servidor en {url} no respondió.")
+
+
+async def load(base_url, concurrency, total, offset):
+    import httpx
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_ready(client, "/counts")
+        semaphore = asyncio.Semaphore(concurrency)
+        counter = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/ask", json=payload_for(offset + i))
+                        response.raise_for_status()
+                        if "answer" not in response.json():
+                            errors += 1
+                    except Exception:
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "errors": errors,
+    }
+
+
+def run_load(base_url, concurrency, total, offset):
+    return asyncio.run(load(base_url, concurrency, total, offset))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--sync-threads", type=int, default=16)
+    parser.add_argument("--llm-concurrency", type=int, default=256,
+                        help="LLM_MAX_CONCURRENCY de la pasarela (alto para medir el modo de servir, no el límite)")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    args = parser.parse_args(argv)
+
+    upstream_port = free_port()
+    upstreams = start_fake_upstreams_process(upstream_port, args.openai_latency_ms)
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(upstream_port, tmp, args.llm_concurrency)
+        import app_openai_api as core
+        import app_async
+        seed_state(core)
+
+        ports = {}
+        if "sync" in args.modes:
+            ports["sync"] = serve_flask(core.app, args.sync_threads)
+        if "async" in args.modes:
+            ports["async"] = serve_quart(app_async.app)
+
+        print(f"\nOpenAI simulado con {args.openai_latency_ms} ms, Flask con {args.sync_threads} hilos, "
+              f"{args.requests} peticiones por prueba\n")
+        print(f"{'modo':<6} {'concurrencia':>12} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9} {'errores':>8}")
+        load_process = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+        offset = 0
+        for concurrency in args.concurrency:
+            for mode, port in ports.items():
+                # Cada prueba usa preguntas nuevas para no acertar en la caché de respuestas de la anterior
+                result = load_process.submit(run_load, f"http://127.0.0.1:{port}", concurrency,
+                                             args.requests, offset).result()
+                offset += args.requests
+                print(f"{mode:<6} {concurrency:>12} {result['rps']:>8.1f} {result['p50_ms']:>9.0f} "
+                      f"{result['p95_ms']:>9.0f} {result['max_ms']:>9.0f} {result['errors']:>8}")
+        print(f"\nLlamadas recibidas por las dependencias simuladas: {upstream_stats(upstream_port)}")
+        load_process.shutdown()
+        upstreams.terminate()
+        core.log_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Bandeja de salida (outbox) de las solicitudes de llamada al portal web.
+
+``CallOutbox.enqueue`` guarda la solicitud en SQLite con una clave de
+idempotencia, sin esperar a la red, así que la respuesta al usuario ya no
+depende de que el portal responda. Un hilo despachador las entrega a
+``/api/schedule_call`` en lotes de hasta ``batch_size`` (``{"calls": [...]}``) y
+actúa según el estado que el portal devuelve para cada una:
+
+- ``created`` o ``duplicate``: entregada. El portal ignora las claves que ya
+  tiene, así que reenviar un lote cuya respuesta se perdió no duplica llamadas.
+- ``invalid``: el portal la rechaza; queda como fallida y no se reintenta.
+- Error de red, respuesta no 2xx o solicitud ausente en la respuesta: se
+  reintenta con espera exponencial con jitter (``retry_base`` … ``retry_max``).
+
+Varios procesos pueden compartir el archivo: cada despachador reserva sus filas
+durante ``lease_seconds`` antes de enviarlas. Las entregadas se borran pasados
+``retention_seconds``.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+from metrics import Histogram
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    delivered_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON call_outbox (status, next_attempt_at);
+"""
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+_outboxes = weakref.WeakSet()
+
+
+class CallOutbox:
+    """Solicitudes de llamada pendientes de entregar con ``send_batch(llamadas)``."""
+
+    def __init__(self, db_path, send_batch, batch_size=50, retry_base=1.0, retry_max=300.0,
+                 lease_seconds=60.0, poll_interval=5.0, retention_seconds=7 * 24 * 60 * 60):
+        self.db_path = db_path
+        self._send_batch = send_batch
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.delivery_latency = Histogram()
+        self._reset()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        _outboxes.add(self)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._last_prune = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, call_request):
+        """Guarda la solicitud y avisa al despachador. Devuelve su clave de idempotencia."""
+        key = uuid.uuid4().hex
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO call_outbox (idempotency_key, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(call_request, ensure_ascii=False), now, now)
+            )
+        with self._stats_lock:
+            self.enqueued += 1
+        self._wake.set()
+        return key
+
+    def _claim(self, now):
+        """Reserva hasta ``batch_size`` solicitudes vencidas para este despachador."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, idempotency_key, payload, created_at, attempts FROM call_outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (now, self.batch_size)
+            ).fetchall()
+            conn.executemany("UPDATE call_outbox SET next_attempt_at = ? WHERE id = ?",
+                             [(now + self.lease_seconds, row[0]) for row in rows])
+        return rows
+
+    def _retry_at(self, attempts, now):
+        return now + random.uniform(self.retry_base, min(self.retry_max, self.retry_base * 2 ** attempts))
+
+    def dispatch_once(self):
+        """Entrega un lote. Devuelve cuántas solicitudes se reservaron (0 si no había vencidas)."""
+        now = time.time()
+        rows = self._claim(now)
+        if not rows:
+            return 0
+        calls = [{**json.loads(payload), "idempotency_key": key} for _, key, payload, _, _ in rows]
+        try:
+            results = {result.get("idempotency_key"): result for result in self._send_batch(calls)}
+        except Exception as e:
+            print(f"Error al entregar {len(rows)} solicitudes de llamada al portal: {e}")
+            results, error = {}, str(e)
+        else:
+            error = "El portal no devolvió un resultado para la solicitud"
+
+        now = time.time()
+        delivered, failed, retried = [], [], []
+        duplicates = 0
+        for row_id, key, _, created_at, attempts in rows:
+            result = results.get(key, {})
+            status = result.get("status")
+            if status in ("created", "duplicate"):
+                delivered.append((now, row_id))
+                duplicates += status == "duplicate"
+                self.delivery_latency.observe(now - created_at)
+            elif status == "invalid":
+                failed.append((result.get("message", "invalid"), row_id))
+            else:
+                retried.append((self._retry_at(attempts, now), error, row_id))
+        with self._connection() as conn:
+            conn.executemany("UPDATE call_outbox SET status = 'delivered', delivered_at = ?, last_error = NULL "
+                             "WHERE id = ?", delivered)
+            conn.executemany("UPDATE call_outbox SET status = 'failed', last_error = ? WHERE id = ?", failed)
+            conn.executemany("UPDATE call_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+                             "WHERE id = ?", retried)
+        for message, row_id in failed:
+            print(f"El portal rechazó la solicitud de llamada {row_id}: {message}")
+        with self._stats_lock:
+            self.batches += 1
+            self.delivered += len(delivered)
+            self.duplicates += duplicates
+            self.failed += len(failed)
+            self.retries += len(retried)
+        return len(rows)
+
+    def _seconds_until_due(self):
+        (next_due,) = self._connection().execute(
+            "SELECT MIN(next_attempt_at) FROM call_outbox WHERE status = 'pending'").fetchone()
+        if next_due is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, next_due - time.time()))
+
+    def prune(self):
+        """Borra las solicitudes entregadas hace más de ``retention_seconds``."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM call_outbox WHERE status = 'delivered' AND delivered_at < ?",
+                         (time.time() - self.retention_seconds,))
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                if self.dispatch_once() == self.batch_size:
+                    # Lote completo: probablemente quedan más
+                    continue
+                if time.time() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.time()
+                    self.prune()
+                timeout = self._seconds_until_due()
+            except sqlite3.Error as e:
+                print(f"Error en la bandeja de salida de llamadas: {e}")
+                timeout = self.poll_interval
+            self._wake.wait(timeout)
+
+    def start(self):
+        """Arranca el hilo despachador en el proceso actual (tras un fork, lo arranca el proceso que sirve la API)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="call-outbox", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=5):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _after_fork(self):
+        # El hilo no pasa al hijo; solo se reinicia el estado (p. ej. los hijos de la ingesta no despachan)
+        self._reset()
+
+    def as_dict(self):
+        counts = dict(self._connection().execute(
+            "SELECT status, COUNT(*) FROM call_outbox GROUP BY status").fetchall())
+        (oldest,) = self._connection().execute(
+            "SELECT MIN(created_at) FROM call_outbox WHERE status = 'pending'").fetchone()
+        with self._stats_lock:
+            stats = {
+                "pending": counts.get("pending", 0),
+                "failed_total": counts.get("failed", 0),
+                "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+                "enqueued": self.enqueued,
+                "delivered": self.delivered,
+                "duplicates": self.duplicates,
+                "failed": self.failed,
+                "retries": self.retries,
+                "batches": self.batches,
+            }
+        stats["delivery_latency"] = self.delivery_latency.as_dict()
+        return stats
+
+
+def _reset_after_fork():
+    for outbox in list(_outboxes):
+        outbox._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,88 @@
+"""
+Textos de los fragmentos del índice, de solo lectura y mapeados en memoria.
+
+``chunks.json`` se carga entero en un dict de Python, así que con varios workers
+cada proceso guarda su propia copia de todos los textos. ``ChunkStore`` los
+guarda en dos archivos junto al índice:
+
+- ``chunk_texts.<n>.bin``: los textos en UTF-8, uno detrás de otro.
+- ``chunk_offsets.<n>.npy``: por fragmento, (ID, inicio, fin) en ``chunk_texts.<n>.bin``, ordenado por ID.
+
+y abre ambos con mmap: los workers leen las mismas páginas de la caché del
+sistema operativo, una sola copia física. Cada ``DocumentIndex.save`` los
+escribe enteros con una generación ``n`` nueva y el manifiesto pasa a apuntar a
+ella, así que nunca se lee el par a medio reemplazar; un worker que ya los tenía
+abiertos sigue leyendo la versión anterior hasta que vuelve a cargar el índice.
+Los índices anteriores a las generaciones usan ``chunk_texts.bin`` y
+``chunk_offsets.npy`` (generación ``None``).
+"""
+import mmap
+import os
+
+import numpy as np
+
+TEXTS_FILE = "chunk_texts.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+
+
+def chunk_store_paths(index_dir, generation=None):
+    """Rutas (textos, posiciones) de una generación del almacén."""
+    if generation is None:
+        return os.path.join(index_dir, TEXTS_FILE), os.path.join(index_dir, OFFSETS_FILE)
+    return (os.path.join(index_dir, f"chunk_texts.{generation}.bin"),
+            os.path.join(index_dir, f"chunk_offsets.{generation}.npy"))
+
+
+def write_chunk_store(index_dir, chunks, generation=None):
+    """
+    Escribe los textos de ``chunks`` ({ID: {"text": ...}}) como la generación
+    ``generation``; pasa a usarse cuando el manifiesto la registra.
+    """
+    texts_path, offsets_path = chunk_store_paths(index_dir, generation)
+    offsets = np.zeros((len(chunks), 3), dtype='int64')
+    position = 0
+    with open(f"{texts_path}.tmp", 'wb') as f:
+        for row, chunk_id in enumerate(sorted(chunks)):
+            data = chunks[chunk_id]["text"].encode('utf-8')
+            f.write(data)
+            offsets[row] = (chunk_id, position, position + len(data))
+            position += len(data)
+    with open(f"{offsets_path}.tmp", 'wb') as f:
+        np.save(f, offsets)
+    os.replace(f"{texts_path}.tmp", texts_path)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+
+
+def remove_chunk_store(index_dir, generation=None):
+    """Borra una generación que ya no está en el manifiesto (quien la tenga abierta la sigue leyendo)."""
+    for path in chunk_store_paths(index_dir, generation):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def chunk_store_exists(index_dir, generation=None):
+    return all(os.path.exists(path) for path in chunk_store_paths(index_dir, generation))
+
+
+class ChunkStore:
+    """Texto de cada fragmento por ID, leído de los archivos mapeados."""
+
+    def __init__(self, index_dir, generation=None):
+        texts_path, offsets_path = chunk_store_paths(index_dir, generation)
+        self._offsets = np.load(offsets_path, mmap_mode='r')
+        with open(texts_path, 'rb') as f:
+            # mmap no admite archivos vacíos (índice sin fragmentos)
+            self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._ids = self._offsets[:, 0] if len(self._offsets) else np.zeros(0, dtype='int64')
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def get(self, chunk_id, default=None):
+        row = int(np.searchsorted(self._ids, chunk_id))
+        if row >= len(self._ids) or self._ids[row] != chunk_id:
+            return default
+        _, start, end = self._offsets[row]
+        return self._texts[start:end].decode('utf-8')
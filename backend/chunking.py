@@ -0,0 +1,315 @@
+"""
+Fragmentación (chunking) del texto de los manuales PDF antes de indexarlo.
+
+Cada fragmento es un diccionario con el texto y su procedencia:
+
+    {"text": ..., "source": "docs/manual.pdf", "page": 3, "start": 1200, "end": 1730}
+
+``page`` es la página (desde 1) donde empieza el fragmento y ``start``/``end`` son
+posiciones de caracteres en el texto extraído de todo el documento.
+
+Fragmentadores disponibles (``DOC_CHUNKER``):
+
+- ``line``: el comportamiento original, una línea de más de 20 caracteres por fragmento.
+- ``semantic``: agrupa por títulos y párrafos, reconstruye frases partidas entre
+  líneas y bloques, arma ventanas acotadas por tokens con solapamiento y elimina
+  fragmentos casi duplicados por hash.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+
+import fitz  # PyMuPDF
+
+SENTENCE_END = ('.', '!', '?', ':', ';')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[¿¡"(«]?[A-ZÁÉÍÓÚÑÜ0-9])')
+NUMBERED_HEADING_RE = re.compile(r'^(\d+(\.\d+)*\.?|[IVXLC]+\.|cap[ií]tulo\b|art[ií]culo\b|secci[oó]n\b)', re.IGNORECASE)
+TOKEN_RE = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+
+def count_tokens(text):
+    """Aproximación del número de tokens (palabras y signos) sin depender del tokenizador del modelo."""
+    return len(TOKEN_RE.findall(text))
+
+
+def normalize_for_hash(text):
+    """Minúsculas, sin acentos ni signos y con espacios colapsados, para comparar fragmentos."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def simhash(text, bits=64):
+    """SimHash de los trigramas de palabras del texto normalizado."""
+    words = normalize_for_hash(text).split()
+    shingles = [' '.join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * bits
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.md5(shingle.encode('utf-8')).digest()[:8], 'big')
+        for bit in range(bits):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+class NearDuplicateFilter:
+    """
+    Descarta fragmentos repetidos: primero por hash exacto del texto normalizado y
+    luego por distancia de Hamming entre SimHash, usando bandas de 16 bits para no
+    comparar todos contra todos.
+    """
+
+    def __init__(self, max_distance=3, bands=4):
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self._exact = set()
+        self._buckets = {}
+
+    def _band_keys(self, value):
+        mask = (1 << self.band_bits) - 1
+        return [(band, (value >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def is_duplicate(self, text):
+        exact = hashlib.sha1(normalize_for_hash(text).encode('utf-8')).digest()
+        if exact in self._exact:
+            return True
+        value = simhash(text)
+        keys = self._band_keys(value)
+        for key in keys:
+            for other in self._buckets.get(key, ()):
+                if bin(value ^ other).count('1') <= self.max_distance:
+                    return True
+        self._exact.add(exact)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(value)
+        return False
+
+
+def pdf_page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def read_pdf_pages(pdf_path, first_page=0, last_page=None, mode="blocks"):
+    """
+    Extrae el texto de las páginas ``[first_page, last_page)`` del PDF como una lista
+    de (número de página desde 1, [textos]). Con ``mode="text"`` cada página trae su
+    texto completo; con ``mode="blocks"``, sus bloques de texto en orden de lectura.
+    """
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        last_page = len(doc) if last_page is None else min(last_page, len(doc))
+        for number in range(first_page, last_page):
+            page = doc[number]
+            if mode == "text":
+                parts = [page.get_text()]
+            else:
+                parts = [block[4] for block in page.get_text("blocks", sort=True)
+                         if block[6] == 0 and block[4].strip()]
+            pages.append((number + 1, parts))
+    return pages
+
+
+class LineChunker:
+    """Una línea de más de ``min_length`` caracteres por fragmento (comportamiento original)."""
+
+    name = "line"
+    text_mode = "text"
+
+    def __init__(self, min_length=20):
+        self.min_length = min_length
+
+    @property
+    def params(self):
+        return {"min_length": self.min_length}
+
+    def chunk_pdf(self, pdf_path):
+        return self.chunk_pages(read_pdf_pages(pdf_path, mode=self.text_mode), pdf_path)
+
+    def chunk_pages(self, pages, source):
+        """Genera los fragmentos a partir de las páginas de ``read_pdf_pages(mode="text")``."""
+        chunks = []
+        position = 0
+        for page_number, parts in pages:
+            for line in ''.join(parts).split('\n'):
+                stripped_line = line.strip()
+                if len(stripped_line) > self.min_length:
+                    chunks.append({
+                        "text": stripped_line,
+                        "source": source,
+                        "page": page_number,
+                        "start": position,
+                        "end": position + len(line),
+                    })
+                position += len(line) + 1
+        return chunks
+
+
+class SemanticChunker:
+    """
+    Fragmentos por sección y párrafo, de hasta ``max_tokens`` tokens, con
+    ``overlap_tokens`` de solapamiento entre ventanas consecutivas de una sección.
+    El título de la sección se antepone a cada fragmento para darle contexto.
+    """
+
+    name = "semantic"
+    text_mode = "blocks"
+
+    def __init__(self, max_tokens=160, overlap_tokens=32, min_tokens=6, dedupe=True, max_distance=3):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.dedupe = dedupe
+        self.max_distance = max_distance
+
+    @property
+    def params(self):
+        return {
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "min_tokens": self.min_tokens,
+            "dedupe": self.dedupe,
+            "max_distance": self.max_distance,
+        }
+
+    def chunk_pdf(self, pdf_path):
+        return self.chunk_pages(read_pdf_pages(pdf_path, mode=self.text_mode), pdf_path)
+
+    def chunk_pages(self, pages, source):
+        """Genera los fragmentos a partir de las páginas de ``read_pdf_pages(mode="blocks")``."""
+        blocks = []
+        offset = 0
+        for page_number, parts in pages:
+            for text in parts:
+                blocks.append((page_number, text, offset))
+                offset += len(text) + 2
+        return self.chunk_blocks(blocks, source)
+
+    @staticmethod
+    def _join_lines(text):
+        """Une las líneas de un bloque, reparando palabras cortadas con guion al final de línea."""
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        joined = ''
+        for line in lines:
+            if joined.endswith('-') and line[:1].islower():
+                joined = joined[:-1] + line
+            elif joined:
+                joined += ' ' + line
+            else:
+                joined = line
+        return joined
+
+    @staticmethod
+    def _is_heading(text):
+        if len(text) > 90 or text.endswith(SENTENCE_END[:3]) or text.endswith((',', ';')):
+            return False
+        letters = [c for c in text if c.isalpha()]
+        if not letters:
+            return False
+        is_upper = sum(1 for c in letters if c.isupper()) / len(letters) > 0.8
+        return is_upper or bool(NUMBERED_HEADING_RE.match(text)) or (text[0].isupper() and count_tokens(text) <= 8)
+
+    def _paragraphs(self, blocks):
+        """
+        Agrupa los bloques en (título, párrafo) y une los párrafos cuya frase quedó
+        partida entre bloques o páginas. Cada párrafo conserva página y posiciones.
+        """
+        heading = ""
+        paragraphs = []
+        for page, raw_text, offset in blocks:
+            text = self._join_lines(raw_text)
+            if not text:
+                continue
+            if self._is_heading(text):
+                heading = text
+                continue
+            previous = paragraphs[-1] if paragraphs else None
+            continues_sentence = (
+                previous is not None and previous["heading"] == heading
+                and not previous["text"].endswith(SENTENCE_END) and text[:1].islower()
+            )
+            if continues_sentence:
+                previous["text"] += ' ' + text
+                previous["end"] = offset + len(raw_text)
+            else:
+                paragraphs.append({"heading": heading, "text": text, "page": page,
+                                   "start": offset, "end": offset + len(raw_text)})
+        return paragraphs
+
+    def _split_long(self, sentence):
+        words = sentence.split()
+        step = max(1, self.max_tokens - self.overlap_tokens)
+        return [' '.join(words[i:i + self.max_tokens]) for i in range(0, len(words), step)]
+
+    def chunk_blocks(self, blocks, source):
+        """Genera los fragmentos a partir de bloques (página, texto, posición)."""
+        duplicates = NearDuplicateFilter(self.max_distance) if self.dedupe else None
+        chunks = []
+
+        def emit(heading, window):
+            body = ' '.join(sentence for sentence, _ in window)
+            if count_tokens(body) < self.min_tokens:
+                return
+            text = f"{heading}: {body}" if heading else body
+            if duplicates and duplicates.is_duplicate(text):
+                return
+            first, last = window[0][1], window[-1][1]
+            chunks.append({"text": text, "source": source, "page": first["page"],
+                           "start": first["start"], "end": last["end"]})
+
+        # Los párrafos repetidos (encabezados y pies de página, avisos legales) se descartan antes de agruparlos
+        repeated_paragraphs = NearDuplicateFilter(self.max_distance) if self.dedupe else None
+        sections = []
+        for paragraph in self._paragraphs(blocks):
+            if repeated_paragraphs and repeated_paragraphs.is_duplicate(paragraph["text"]):
+                continue
+            if sections and sections[-1][0] == paragraph["heading"]:
+                sections[-1][1].append(paragraph)
+            else:
+                sections.append((paragraph["heading"], [paragraph]))
+
+        for heading, paragraphs in sections:
+            window, window_tokens = [], 0
+            # Indica si la ventana tiene frases que aún no salieron en un fragmento
+            fresh = False
+            for paragraph in paragraphs:
+                for sentence in SENTENCE_SPLIT_RE.split(paragraph["text"]):
+                    pieces = self._split_long(sentence) if count_tokens(sentence) > self.max_tokens else [sentence]
+                    for piece in pieces:
+                        tokens = count_tokens(piece)
+                        if window and window_tokens + tokens > self.max_tokens:
+                            emit(heading, window)
+                            fresh = False
+                            # Solapamiento: se conservan las últimas frases que quepan en overlap_tokens
+                            overlap, overlap_tokens = [], 0
+                            for item in reversed(window):
+                                item_tokens = count_tokens(item[0])
+                                if overlap_tokens + item_tokens > self.overlap_tokens:
+                                    break
+                                overlap.insert(0, item)
+                                overlap_tokens += item_tokens
+                            window, window_tokens = overlap, overlap_tokens
+                        window.append((piece, paragraph))
+                        window_tokens += tokens
+                        fresh = True
+            if window and fresh:
+                emit(heading, window)
+        return chunks
+
+
+CHUNKERS = {
+    LineChunker.name: LineChunker,
+    SemanticChunker.name: SemanticChunker,
+}
+
+
+def get_chunker(name=None, **params):
+    """Crea el fragmentador pedido (por defecto, el de ``DOC_CHUNKER`` o ``semantic``)."""
+    name = name or os.getenv("DOC_CHUNKER", SemanticChunker.name)
+    if name not in CHUNKERS:
+        raise ValueError(f"Fragmentador desconocido: {name}. Opciones: {', '.join(CHUNKERS)}")
+    if name == SemanticChunker.name:
+        for key, default in (("max_tokens", 160), ("overlap_tokens", 32)):
+            params.setdefault(key, int(os.getenv(f"DOC_CHUNK_{key.upper()}", default)))
+    return CHUNKERS[name](**params)
@@ -0,0 +1,280 @@
+"""
+Pool de conexiones para la base de datos de RRHH (SQL Server vía pyodbc).
+
+``ConnectionPool`` recibe una función que abre una conexión DB-API, así que
+también funciona con ``sqlite3`` para pruebas locales (ver
+``benchmarks/bench_db_pool.py``). Las conexiones se entregan envueltas en
+``PooledConnection``: se usan igual que la conexión original y ``close()`` las
+devuelve al pool en lugar de cerrarlas, por lo que el código existente
+(``conn = get_db_connection_sql() ... finally: conn.close()``) no cambia.
+
+- ``min_size``/``max_size``: conexiones que se mantienen abiertas y máximo total.
+- ``timeout``: segundos que se espera una conexión libre antes de lanzar ``PoolTimeout``.
+- ``max_idle_seconds``/``max_lifetime_seconds``: las conexiones inactivas o viejas
+  se cierran y se reemplazan (por encima de ``min_size``, las inactivas solo se cierran).
+- Al entregar una conexión que estuvo inactiva más de ``health_check_interval``
+  segundos se ejecuta ``SELECT 1``; si falla, se descarta y se abre otra.
+- Un proceso creado con fork (workers de gunicorn con ``--preload``) empieza con
+  el pool vacío: las conexiones del padre comparten su socket y no se usan.
+"""
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+_pools = weakref.WeakSet()
+
+
+class PoolTimeout(Exception):
+    """No hubo una conexión libre dentro del tiempo de espera."""
+
+
+class PoolStats:
+    """Contadores del pool."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.recycled = 0
+        self.connect_errors = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+
+class PooledConnection:
+    """Conexión prestada por el pool. ``close()`` la devuelve; el resto se delega en la conexión real."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool de conexiones DB-API seguro entre hilos."""
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, max_idle_seconds=300,
+                 max_lifetime_seconds=1800, health_check_interval=30, health_check_query="SELECT 1"):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Se requiere 0 <= min_size <= max_size y max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        # Conexiones libres; se reutiliza la última devuelta (LIFO) para que las demás envejezcan y se reciclen
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self.stats = PoolStats()
+        _pools.add(self)
+        self._fill()
+
+    def _fill(self):
+        """Abre conexiones hasta ``min_size``. Un error aquí no impide arrancar; se reintenta al pedir una."""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception as e:
+                print(f"Error al abrir conexiones iniciales del pool: {e}")
+                return
+            with self._lock:
+                self._idle.append(conn)
+                self._lock.notify()
+
+    def _open(self):
+        """Abre una conexión real. Se llama con un hueco ya reservado en ``_size``."""
+        try:
+            conn = PooledConnection(self, self._connect())
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self.stats.connect_errors += 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.stats.created += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.stats.closed += 1
+            self._lock.notify()
+
+    def _is_expired(self, conn, now):
+        return (now - conn.created_at > self.max_lifetime_seconds
+                or now - conn.last_used > self.max_idle_seconds)
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn._raw.cursor()
+            try:
+                cursor.execute(self.health_check_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout=None):
+        """Presta una conexión; espera hasta ``timeout`` segundos si todas están en uso."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        while True:
+            conn = None
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("El pool está cerrado.")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats.timeouts += 1
+                        raise PoolTimeout(f"No hay conexiones libres tras {timeout} s ({self.max_size} en uso).")
+                    waited = True
+                    self._lock.wait(remaining)
+
+            if conn is None:
+                conn = self._open()
+            else:
+                now = time.monotonic()
+                if self._is_expired(conn, now):
+                    with self._lock:
+                        self.stats.recycled += 1
+                    self._discard(conn)
+                    continue
+                if now - conn.last_used > self.health_check_interval and not self._is_healthy(conn):
+                    with self._lock:
+                        self.stats.health_check_failures += 1
+                    self._discard(conn)
+                    continue
+
+            # Incluye la espera por una conexión libre y, si hizo falta, la apertura de una nueva
+            checkout_seconds = time.monotonic() - start
+            with self._lock:
+                self.stats.checkouts += 1
+                if waited:
+                    self.stats.waits += 1
+                self.stats.checkout_seconds_total += checkout_seconds
+                self.stats.checkout_seconds_max = max(self.stats.checkout_seconds_max, checkout_seconds)
+            conn._checked_out = True
+            return conn
+
+    def _release(self, conn):
+        try:
+            # Deshace una transacción abierta para no dejar bloqueos ni estado a la siguiente petición
+            conn._raw.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                self._lock.notify()
+                conn = None
+        if conn is not None:
+            self._discard(conn)
+        self.prune()
+
+    def prune(self):
+        """Cierra las conexiones libres que superaron su inactividad o vida máxima y repone ``min_size``."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [conn for conn in self._idle if self._is_expired(conn, now)]
+            for conn in expired:
+                self._idle.remove(conn)
+            self.stats.recycled += len(expired)
+        for conn in expired:
+            self._discard(conn)
+        if expired:
+            self._fill()
+
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _after_fork(self):
+        # Las conexiones heredadas son del padre: se olvidan sin cerrarlas y se abren otras al pedirlas
+        self._idle = deque()
+        self._size = 0
+        self._lock = threading.Condition()
+        self.stats = PoolStats()
+
+    def as_dict(self):
+        with self._lock:
+            stats = self.stats
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "created": stats.created,
+                "closed": stats.closed,
+                "checkouts": stats.checkouts,
+                "waits": stats.waits,
+                "timeouts": stats.timeouts,
+                "health_check_failures": stats.health_check_failures,
+                "recycled": stats.recycled,
+                "connect_errors": stats.connect_errors,
+                "checkout_ms_avg": round(stats.checkout_seconds_total * 1000 / stats.checkouts, 3) if stats.checkouts else 0.0,
+                "checkout_ms_max": round(stats.checkout_seconds_max * 1000, 3),
+            }
+
+
+def _reset_after_fork():
+    for pool in list(_pools):
+        pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,466 @@
+"""
+Índice persistente de los manuales PDF (FAISS + almacén de fragmentos + manifiesto).
+
+El índice vive en un directorio con estos archivos:
+
+- ``faiss.index``: vectores exactos de todos los fragmentos (``IndexIDMap2`` sobre
+  ``IndexFlatL2``). Es la copia canónica a partir de la cual se entrenan los demás.
+- ``search.index``: índice aproximado (IVF-Flat, IVF-PQ o HNSW) usado para buscar
+  cuando ``DOC_INDEX_TYPE`` no es ``flat``. Ver ``index_factory.py``.
+- ``chunks.json``: cada fragmento indexado (texto, archivo, página y posiciones), por ID.
+- ``chunk_texts.<n>.bin`` y ``chunk_offsets.<n>.npy``: solo los textos, para leerlos
+  con mmap al buscar (ver ``chunk_store.py``); el manifiesto indica la generación ``n``.
+- ``manifest.json``: modelo de incrustación, fragmentador, configuración del índice
+  de búsqueda y, por cada PDF, su mtime, hash SHA-256 y los IDs de sus fragmentos.
+- ``.lock``: bloqueo entre procesos. ``load_or_build`` carga, sincroniza y guarda
+  con el bloqueo exclusivo (los demás workers esperan y cargan el resultado) y
+  solo carga con el compartido, así que nadie lee archivos de dos escrituras.
+
+Con ``mmap=True`` los índices se abren mapeados en memoria y de solo lectura, y
+los textos se leen del almacén de fragmentos: varios workers que cargan el mismo
+directorio comparten una sola copia física. ``chunks.json`` y la copia modificable
+de los vectores solo se cargan si hay que modificar el índice.
+
+Al sincronizar solo se vuelven a procesar los PDFs nuevos o modificados, y los
+fragmentos de PDFs eliminados se quitan del índice por ID. Para construirlo
+fuera de línea, antes de arrancar la API:
+
+    python doc_index.py build --docs docs/ --index-dir index/
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from chunk_store import ChunkStore, chunk_store_exists, remove_chunk_store, write_chunk_store
+from chunking import get_chunker
+from index_factory import DEFAULT_PARAMS, build_index, effective_type, params_from_env, set_search_params
+from ingest import IngestionPipeline
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+INDEX_FILE = "faiss.index"
+SEARCH_INDEX_FILE = "search.index"
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Parámetros que solo afectan a la búsqueda y no obligan a reconstruir el índice
+SEARCH_TIME_PARAMS = ("nprobe", "ef_search")
+
+# Lectura con mmap: IO_FLAG_MMAP_IFC (faiss >= 1.8) mapea también los vectores de los índices
+# planos y HNSW; con versiones anteriores IO_FLAG_MMAP solo mapea las listas de los IVF
+if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+    MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+else:
+    MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def index_lock(index_dir, shared=False):
+    """Bloqueo del directorio del índice entre procesos: exclusivo para modificarlo, compartido para leerlo."""
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _write_index_atomic(index, path):
+    faiss.write_index(index, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def _build_params(params):
+    return {k: v for k, v in params.items() if k not in SEARCH_TIME_PARAMS}
+
+
+def _read_chunks(index_dir):
+    with open(os.path.join(index_dir, CHUNKS_FILE), 'r', encoding='utf-8') as f:
+        return {
+            int(chunk_id): chunk if isinstance(chunk, dict) else {"text": chunk}
+            for chunk_id, chunk in json.load(f).items()
+        }
+
+
+class DocumentIndex:
+    """Índice FAISS de fragmentos de PDF con persistencia y actualización incremental."""
+
+    def __init__(self, index_dir, dimension, model_name=DEFAULT_MODEL_NAME,
+                 index_type="flat", index_params=None, chunker=None, mmap=False):
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self.model_name = model_name
+        self.chunker = chunker or get_chunker()
+        self.index_type = index_type
+        self.index_params = {**DEFAULT_PARAMS, **(index_params or {})}
+        self._store = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        self._store_loaded = True
+        self._store_dirty = True
+        self.search_index = self._store
+        self._search_stale = False
+        self._search_dirty = False
+        self.mmap = mmap
+        self._chunks = {}
+        self._chunk_store = None
+        self.manifest = {"model": model_name, "chunker": self._chunker_config(),
+                         "next_id": 0, "files": {}, "search_index": None}
+        self._fingerprint = None
+
+    def _chunker_config(self):
+        return {"name": self.chunker.name, "params": self.chunker.params}
+
+    @property
+    def chunks(self):
+        """Fragmentos por ID; con mmap se leen de ``chunks.json`` la primera vez que hacen falta."""
+        if self._chunks is None:
+            self._chunks = _read_chunks(self.index_dir)
+        return self._chunks
+
+    @classmethod
+    def load(cls, index_dir, dimension, model_name=DEFAULT_MODEL_NAME, index_type="flat", index_params=None,
+             chunker=None, mmap=False):
+        """
+        Carga el índice desde disco; si no existe o se creó con otro modelo u otro
+        fragmentador, devuelve uno vacío para reconstruirlo.
+        """
+        doc_index = cls(index_dir, dimension, model_name, index_type, index_params, chunker, mmap)
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return doc_index
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("model") != model_name:
+                print(f"El índice en '{index_dir}' se creó con otro modelo; se reconstruirá.")
+                return doc_index
+            if manifest.get("chunker", {"name": "line", "params": {"min_length": 20}}) != doc_index._chunker_config():
+                print(f"El índice en '{index_dir}' se creó con otro fragmentador; se reconstruirá.")
+                return doc_index
+            manifest.setdefault("search_index", None)
+            doc_index.manifest = manifest
+            doc_index._chunks = None
+            saved_store = manifest.get("chunk_store")
+            if mmap and saved_store is not None and chunk_store_exists(index_dir, saved_store.get("generation")):
+                doc_index._chunk_store = ChunkStore(index_dir, saved_store.get("generation"))
+                if len(doc_index._chunk_store) != manifest["chunk_store"]["chunks"]:
+                    print(f"El almacén de fragmentos de '{index_dir}' no coincide con el manifiesto; se usa {CHUNKS_FILE}.")
+                    doc_index._chunk_store = None
+            if doc_index._chunk_store is None:
+                doc_index._chunks = _read_chunks(index_dir)
+            doc_index._store = None
+            doc_index._store_loaded = False
+            doc_index._store_dirty = False
+            doc_index._load_search_index()
+        except Exception as e:
+            print(f"Error al cargar el índice desde '{index_dir}': {e}. Se reconstruirá.")
+            return cls(index_dir, dimension, model_name, index_type, index_params, chunker, mmap)
+        return doc_index
+
+    def _search_config(self):
+        return {"requested": self.index_type, "params": _build_params(self.index_params)}
+
+    def _load_search_index(self):
+        """Usa el índice de búsqueda guardado si coincide con la configuración; si no, lo marca para reconstruir."""
+        saved = self.manifest.get("search_index") or {}
+        search_path = os.path.join(self.index_dir, SEARCH_INDEX_FILE)
+        config_matches = (saved.get("requested") == self.index_type
+                          and saved.get("params") == _build_params(self.index_params))
+        if config_matches and saved.get("type") != "flat" and os.path.exists(search_path):
+            self.search_index = self._read_index(search_path)
+            set_search_params(self.search_index, self.index_params)
+            return
+        # Mientras tanto se busca sobre los vectores exactos; refresh_search_index() lo reconstruye
+        if self.mmap:
+            self.search_index = self._read_index(os.path.join(self.index_dir, INDEX_FILE))
+        else:
+            self.search_index = self._ensure_store()
+        if not (config_matches and saved.get("type") == "flat"):
+            self._search_stale = True
+
+    def _read_index(self, path):
+        return faiss.read_index(path, MMAP_IO_FLAGS) if self.mmap else faiss.read_index(path)
+
+    def _ensure_store(self):
+        """Carga bajo demanda la copia canónica de los vectores (solo hace falta al modificar)."""
+        if not self._store_loaded:
+            self._store = faiss.read_index(os.path.join(self.index_dir, INDEX_FILE))
+            self._store_loaded = True
+        return self._store
+
+    def refresh_search_index(self):
+        """Reconstruye (y entrena) el índice de búsqueda a partir de los vectores canónicos."""
+        if not self._search_stale:
+            return
+        store = self._ensure_store()
+        kind = effective_type(self.index_type, store.ntotal, self.index_params)
+        if kind == "flat":
+            self.search_index = store
+        else:
+            vectors = store.index.reconstruct_n(0, store.ntotal)
+            ids = faiss.vector_to_array(store.id_map)
+            self.search_index = build_index(kind, vectors, ids, self.index_params)
+            self._search_dirty = True
+        self.manifest["search_index"] = {"type": kind, **self._search_config()}
+        self._search_stale = False
+        self._fingerprint = None
+        print(f"Índice de búsqueda '{kind}' construido con {self.search_index.ntotal} fragmentos.")
+
+    def save(self):
+        """Guarda índices, fragmentos y manifiesto (el manifiesto al final)."""
+        self.refresh_search_index()
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self._store_loaded and self._store_dirty:
+            _write_index_atomic(self._store, os.path.join(self.index_dir, INDEX_FILE))
+            self._store_dirty = False
+        if self._search_dirty:
+            _write_index_atomic(self.search_index, os.path.join(self.index_dir, SEARCH_INDEX_FILE))
+            self._search_dirty = False
+        # Sin modificar, los fragmentos que ya están en disco siguen valiendo
+        store = self.manifest.get("chunk_store")
+        previous = _read_saved_manifest(self.index_dir).get("chunk_store")
+        if self._chunks is not None or store is None or store.get("generation") is None \
+                or not chunk_store_exists(self.index_dir, store["generation"]):
+            _write_json_atomic(os.path.join(self.index_dir, CHUNKS_FILE), {str(k): v for k, v in self.chunks.items()})
+            # Generación nueva: el manifiesto cambia de un par de archivos completo al otro
+            generation = max((entry.get("generation") or 0) for entry in (store or {}, previous or {})) + 1
+            write_chunk_store(self.index_dir, self.chunks, generation)
+            self.manifest["chunk_store"] = {"chunks": len(self.chunks), "generation": generation}
+        _write_json_atomic(os.path.join(self.index_dir, MANIFEST_FILE), self.manifest)
+        if previous is not None and previous.get("generation") != self.manifest["chunk_store"]["generation"]:
+            remove_chunk_store(self.index_dir, previous.get("generation"))
+        if self.mmap and self._chunks is not None:
+            # Ya guardados, los textos vuelven a leerse con mmap en lugar de ocupar memoria del proceso
+            self._chunk_store = ChunkStore(self.index_dir, self.manifest["chunk_store"]["generation"])
+            self._chunks = None
+
+    @property
+    def size(self):
+        return self.search_index.ntotal
+
+    @property
+    def fingerprint(self):
+        """
+        Huella del contenido indexado (hash de cada PDF, fragmentador e índice de
+        búsqueda). Cambia cuando el índice se reconstruye o se sincroniza con otros
+        PDFs; las cachés de respuestas la usan para invalidarse.
+        """
+        if self._fingerprint is None:
+            content = {
+                "model": self.manifest["model"],
+                "chunker": self.manifest["chunker"],
+                "files": {path: entry["sha256"] for path, entry in self.manifest["files"].items()},
+                "search_index": self.manifest.get("search_index"),
+            }
+            raw = json.dumps(content, sort_keys=True, ensure_ascii=False)
+            self._fingerprint = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+        return self._fingerprint
+
+    def _remove_file(self, path):
+        ids = self.manifest["files"].pop(path, {}).get("ids", [])
+        if ids:
+            self._ensure_store().remove_ids(np.array(ids, dtype='int64'))
+            chunks = self.chunks
+            for chunk_id in ids:
+                chunks.pop(chunk_id, None)
+            self._chunk_store = None
+            self._store_dirty = True
+            self._search_stale = True
+            self._fingerprint = None
+        return len(ids)
+
+    def _add_batch(self, batch, embeddings):
+        """Añade un lote de (ruta, fragmento) ya incrustado, asignando IDs consecutivos."""
+        first_id = self.manifest["next_id"]
+        ids = np.arange(first_id, first_id + len(batch), dtype='int64')
+        self._ensure_store().add_with_ids(embeddings, ids)
+        chunks = self.chunks
+        for chunk_id, (path, chunk) in zip(ids.tolist(), batch):
+            chunks[chunk_id] = chunk
+            self.manifest["files"][path]["ids"].append(chunk_id)
+        self._chunk_store = None
+        self.manifest["next_id"] = first_id + len(batch)
+        self._store_dirty = True
+        self._search_stale = True
+        self._fingerprint = None
+
+    def sync(self, docs_dir, model, pipeline=None):
+        """
+        Sincroniza el índice con los PDFs de ``docs_dir``. Los PDFs nuevos o
+        modificados pasan por el pipeline de ingesta (ver ``ingest.py``). Devuelve
+        un diccionario con los archivos añadidos, actualizados y eliminados y las
+        métricas de la ingesta.
+        """
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "touched": 0}
+        pdf_files = sorted(
+            os.path.join(docs_dir, f) for f in os.listdir(docs_dir) if f.endswith(".pdf")
+        ) if os.path.isdir(docs_dir) else []
+        known = self.manifest["files"]
+
+        for path in list(known):
+            if path not in pdf_files:
+                self._remove_file(path)
+                stats["removed"] += 1
+
+        to_ingest = {}
+        for path in pdf_files:
+            mtime = os.path.getmtime(path)
+            entry = known.get(path)
+            if entry and entry["mtime"] == mtime:
+                stats["unchanged"] += 1
+                continue
+            sha256 = file_sha256(path)
+            if entry and entry["sha256"] == sha256:
+                # Mismo contenido con otro mtime: solo se actualiza el manifiesto
+                entry["mtime"] = mtime
+                stats["touched"] += 1
+                continue
+            to_ingest[path] = (mtime, sha256)
+
+        def on_document(path):
+            # El PDF ya se extrajo bien: se reemplazan sus fragmentos anteriores
+            if path in known:
+                self._remove_file(path)
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            mtime, sha256 = to_ingest[path]
+            known[path] = {"mtime": mtime, "sha256": sha256, "ids": []}
+
+        def on_error(path, error):
+            # No se registra en el manifiesto para reintentarlo en la próxima sincronización
+            print(f"Error al procesar el PDF {path}: {error}")
+
+        if to_ingest:
+            if pipeline is None:
+                pipeline = IngestionPipeline.from_env(self.chunker, model)
+            stats["ingestion"] = pipeline.run(list(to_ingest), self._add_batch, on_document, on_error)
+
+        self.refresh_search_index()
+        if stats["added"] or stats["updated"] or stats["removed"]:
+            print(f"Índice sincronizado: {stats['added']} añadidos, {stats['updated']} actualizados, "
+                  f"{stats['removed']} eliminados; {self.size} fragmentos en total.")
+        return stats
+
+    def search(self, query_embeddings, k=4):
+        """Devuelve los textos de los ``k`` fragmentos más cercanos a la primera consulta."""
+        if self.size == 0:
+            return []
+        D, I = self.search_index.search(np.asarray(query_embeddings, dtype='float32'), min(k, self.size))
+        if self._chunk_store is not None:
+            texts = (self._chunk_store.get(int(i)) for i in I[0])
+            return [text for text in texts if text is not None]
+        return [self.chunks[i]["text"] for i in I[0] if i in self.chunks]
+
+
+def load_or_build(index_dir, docs_dir, model, model_name=DEFAULT_MODEL_NAME, sync=True,
+                  index_type=None, index_params=None, chunker=None, pipeline=None, mmap=False):
+    """
+    Carga el índice persistido y, si ``sync`` es True, lo actualiza con los cambios
+    en ``docs_dir``. Sin ``index_type`` se usa la configuración DOC_INDEX_* del entorno.
+    Con ``mmap`` lo abre mapeado en memoria (ver ``DocumentIndex``).
+
+    Con ``sync`` todo ocurre con el bloqueo exclusivo de ``index_dir``: si otro
+    proceso lo estaba actualizando, se espera y se carga lo que guardó.
+    """
+    if index_type is None:
+        index_type, env_params = params_from_env()
+        index_params = {**env_params, **(index_params or {})}
+    with index_lock(index_dir, shared=not sync):
+        doc_index = DocumentIndex.load(index_dir, model.get_sentence_embedding_dimension(), model_name,
+                                       index_type, index_params, chunker, mmap)
+        if sync:
+            stats = doc_index.sync(docs_dir, model, pipeline)
+            changed = stats["added"] or stats["updated"] or stats["removed"] or stats["touched"]
+            # Un índice de antes del almacén de fragmentos (o de sus generaciones) también se guarda para crearlo
+            saved = _read_saved_manifest(index_dir)
+            if changed or doc_index.manifest.get("search_index") != saved.get("search_index") \
+                    or (saved.get("chunk_store") or {}).get("generation") is None:
+                doc_index.save()
+        else:
+            doc_index.refresh_search_index()
+    return doc_index
+
+
+def _read_saved_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construye o actualiza el índice de los manuales PDF.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Sincroniza el índice con el directorio de PDFs.")
+    build.add_argument("--docs", default="docs/")
+    build.add_argument("--index-dir", default="index/")
+    build.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    build.add_argument("--index-type", default=None,
+                       help="flat, ivf_flat, ivf_pq o hnsw (por defecto DOC_INDEX_TYPE o flat).")
+    build.add_argument("--chunker", default=None, help="line o semantic (por defecto DOC_CHUNKER o semantic).")
+    build.add_argument("--workers", type=int, default=None, help="Procesos de extracción (por defecto INGEST_WORKERS).")
+    build.add_argument("--batch-size", type=int, default=None, help="Fragmentos por lote de incrustación.")
+    build.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(), default=None,
+                       help="Cómo se crean los procesos de extracción (por defecto INGEST_START_METHOD o forkserver).")
+    build.add_argument("--rebuild", action="store_true", help="Descarta el índice existente y lo crea de cero.")
+    args = parser.parse_args(argv)
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    index_type, index_params = params_from_env()
+    if args.index_type:
+        index_type = args.index_type
+    chunker = get_chunker(args.chunker)
+    pipeline = IngestionPipeline.from_env(chunker, model)
+    if args.workers is not None:
+        pipeline.workers = args.workers
+        pipeline.max_pending_tasks = max(2, args.workers * 2)
+    if args.batch_size:
+        pipeline.batch_size = args.batch_size
+    if args.start_method:
+        pipeline.start_method = args.start_method
+    if args.rebuild:
+        with index_lock(args.index_dir):
+            doc_index = DocumentIndex(args.index_dir, model.get_sentence_embedding_dimension(), args.model,
+                                      index_type, index_params, chunker)
+            doc_index.sync(args.docs, model, pipeline)
+            doc_index.save()
+    else:
+        doc_index = load_or_build(args.index_dir, args.docs, model, args.model,
+                                  index_type=index_type, index_params=index_params, chunker=chunker,
+                                  pipeline=pipeline)
+    print(f"Índice listo en '{args.index_dir}' con {doc_index.size} fragmentos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Micro-lotes de incrustaciones de preguntas.
+
+``model.encode([pregunta])`` con una pregunta cada vez desaprovecha la CPU: con
+varias peticiones a la vez cada hilo hace su propia pasada del modelo y compiten
+entre sí. ``EmbeddingBatcher`` recibe las preguntas en una cola y un hilo las
+agrupa: toma las que ya esperan y, si el lote no está lleno, espera hasta
+``max_wait_ms`` a que lleguen más (como mucho ``max_batch_size``). Luego hace una
+sola pasada del modelo y entrega a cada pregunta su fila en un ``Future``.
+
+Mientras el modelo calcula un lote, las preguntas nuevas se acumulan para el
+siguiente, así que con carga el lote crece solo y con una sola petición la
+espera añadida es como mucho ``max_wait_ms``.
+
+Es un hilo del mismo proceso y no un proceso aparte: la pasada del modelo
+(PyTorch) libera el GIL, y así los pesos no se cargan otra vez (ver
+``model_services.py``). Tras un fork, el hijo crea su propio hilo con la primera
+pregunta.
+"""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram, SizeHistogram
+
+_batchers = weakref.WeakSet()
+
+
+class EmbeddingBatcher:
+    """Agrupa las llamadas a ``encode(textos)`` de varios hilos en lotes."""
+
+    def __init__(self, encode, max_batch_size=32, max_wait_ms=1.0):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.batch_size = SizeHistogram()
+        self.queue_wait = Histogram()
+        self.encode_time = Histogram()
+        self.latency = Histogram()
+        self._reset()
+        _batchers.add(self)
+
+    def _reset(self):
+        self._queue = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, text):
+        """``Future`` con la incrustación de ``text`` (forma (1, dimensión), como ``encode([text])``)."""
+        if self._thread is None:
+            self._start()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text):
+        return self.submit(text).result()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Pasado el plazo solo se añaden las que ya están en la cola
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Las esperas canceladas (p. ej. una petición async abortada) no se calculan
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                vectors = np.asarray(self._encode([text for text, _, _ in batch]), dtype='float32')
+            except Exception as e:
+                print(f"Error al calcular un lote de {len(batch)} incrustaciones: {e}")
+                with self._stats_lock:
+                    self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            for row, (_, future, submitted) in enumerate(batch):
+                future.set_result(vectors[row:row + 1].copy())
+                self.queue_wait.observe(started - submitted)
+                self.latency.observe(finished - submitted)
+            self.encode_time.observe(finished - started)
+            self.batch_size.observe(len(batch))
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+
+    def _after_fork(self):
+        self._reset()
+
+    def as_dict(self):
+        with self._stats_lock:
+            stats = {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+            }
+        stats["batch_size"] = self.batch_size.as_dict()
+        stats["queue_wait"] = self.queue_wait.as_dict()
+        stats["encode"] = self.encode_time.as_dict()
+        stats["latency"] = self.latency.as_dict()
+        return stats
+
+
+def _reset_after_fork():
+    for batcher in list(_batchers):
+        batcher._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,17 @@
+"""
+Configuración de gunicorn para la API (se carga sola al ejecutar gunicorn desde ``backend/``).
+
+Con ``--preload`` el proceso maestro importa ``app_openai_api`` y los workers
+se crean con fork: los hilos de fondo no pasan al hijo. Por eso el maestro no
+los arranca (``BACKGROUND_SERVICES_ON_IMPORT=0``) y cada worker arranca los
+suyos en ``post_fork``. Las conexiones y colas heredadas del maestro las
+reinicia cada módulo en su hook ``os.register_at_fork``.
+"""
+import os
+
+os.environ.setdefault("BACKGROUND_SERVICES_ON_IMPORT", "0")
+
+
+def post_fork(server, worker):
+    import app_openai_api
+    app_openai_api.start_background_services()
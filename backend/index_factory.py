@@ -0,0 +1,96 @@
+"""
+Fábrica de índices FAISS para la búsqueda de fragmentos.
+
+Tipos soportados:
+
+- ``flat``: búsqueda exacta (``IndexFlatL2``).
+- ``ivf_flat``: listas invertidas con vectores completos; se ajusta con ``nprobe``.
+- ``ivf_pq``: listas invertidas con cuantización de producto; se ajusta con ``nprobe``.
+- ``hnsw``: grafo HNSW; se ajusta con ``ef_search``.
+
+Todos se envuelven en ``IndexIDMap2`` para conservar los IDs de los fragmentos.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_PARAMS = {
+    "nlist": 1024,
+    "pq_m": 16,
+    "pq_bits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 80,
+    "nprobe": 16,
+    "ef_search": 64,
+}
+
+# FAISS recomienda al menos ~39 puntos de entrenamiento por centroide
+MIN_POINTS_PER_CENTROID = 39
+
+
+def params_from_env():
+    """Lee el tipo de índice y sus parámetros de las variables de entorno DOC_INDEX_*."""
+    index_type = os.getenv("DOC_INDEX_TYPE", "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"DOC_INDEX_TYPE desconocido: {index_type}. Opciones: {', '.join(INDEX_TYPES)}")
+    params = {name: int(os.getenv(f"DOC_INDEX_{name.upper()}", value)) for name, value in DEFAULT_PARAMS.items()}
+    return index_type, params
+
+
+def effective_type(index_type, n_vectors, params):
+    """Degrada a ``flat`` cuando no hay suficientes vectores para entrenar el índice pedido."""
+    if index_type == "ivf_pq" and n_vectors < (1 << params["pq_bits"]) * MIN_POINTS_PER_CENTROID // 4:
+        return "flat"
+    if index_type in ("ivf_flat", "ivf_pq") and n_vectors < MIN_POINTS_PER_CENTROID:
+        return "flat"
+    return index_type
+
+
+def make_index(index_type, dimension, n_vectors, params=None):
+    """Crea un índice vacío (sin entrenar) del tipo pedido, envuelto en ``IndexIDMap2``."""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    if index_type == "flat":
+        base = faiss.IndexFlatL2(dimension)
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = max(1, min(params["nlist"], n_vectors // MIN_POINTS_PER_CENTROID, int(4 * math.sqrt(n_vectors))))
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat":
+            base = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            pq_m = params["pq_m"]
+            if dimension % pq_m:
+                raise ValueError(f"La dimensión {dimension} no es divisible por pq_m={pq_m}.")
+            base = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, params["pq_bits"])
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        base.hnsw.efConstruction = params["ef_construction"]
+    else:
+        raise ValueError(f"Tipo de índice desconocido: {index_type}")
+    return faiss.IndexIDMap2(base)
+
+
+def set_search_params(index, params=None):
+    """Aplica ``nprobe`` (IVF) o ``ef_search`` (HNSW) a un índice ya construido o cargado."""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    base = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(params["nprobe"], base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = params["ef_search"]
+
+
+def build_index(index_type, vectors, ids, params=None):
+    """Crea, entrena y llena un índice con ``vectors`` (float32) y sus ``ids``."""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    index = make_index(index_type, vectors.shape[1], len(vectors), params)
+    if not index.is_trained:
+        index.train(vectors)
+    if len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+    set_search_params(index, params)
+    return index
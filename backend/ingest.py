@@ -0,0 +1,205 @@
+"""
+Pipeline de ingesta de PDFs: extracción en paralelo, fragmentación y
+incrustación por lotes.
+
+1. La extracción de páginas se reparte en tareas de ``pages_per_task`` páginas
+   entre un pool de procesos. Solo hay ``max_pending_tasks`` tareas en vuelo, así
+   que el texto extraído no se acumula si la incrustación va más lenta.
+2. Cuando un PDF tiene todas sus páginas, se fragmenta y sus fragmentos pasan a
+   una cola de incrustación que se procesa en lotes de ``batch_size``.
+3. Cada lote se entrega a ``on_batch`` para añadirlo al índice de inmediato; ni el
+   texto ni los vectores de todo el directorio están en memoria a la vez.
+
+Con ``workers`` igual a 0 la extracción se hace en el mismo proceso. El pool usa
+``forkserver`` por defecto (``spawn`` donde no existe): la API lo crea con hilos en
+marcha (carga en segundo plano, vaciado del log, bandeja de llamadas…) y un
+``fork`` desde ese estado puede quedar bloqueado en un lock que tenía otro hilo.
+Los hijos importan el script principal, que por eso no debe arrancar nada al
+importarse (``python app_openai_api.py`` extrae en el mismo proceso). ``fork``
+arranca más rápido y solo conviene en el comando de construcción sin conexión
+(``python doc_index.py build --start-method fork``).
+"""
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from chunking import pdf_page_count, read_pdf_pages
+
+DEFAULT_WORKERS = max(0, min(4, (os.cpu_count() or 1) - 1))
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_PAGES_PER_TASK = 8
+DEFAULT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+def _extract_task(pdf_path, first_page, last_page, mode):
+    """Tarea del pool: extrae un rango de páginas. Debe ser de nivel de módulo para poder serializarse."""
+    return read_pdf_pages(pdf_path, first_page, last_page, mode)
+
+
+class IngestionStats:
+    """Contadores y ritmo de la ingesta (páginas/s, fragmentos/s)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.documents = 0
+        self.pages = 0
+        self.chunks = 0
+        self.batches = 0
+        self.errors = 0
+        self.embed_seconds = 0.0
+        self._last_report = self.started
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "documents": self.documents,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "embed_seconds": round(self.embed_seconds, 3),
+            "pages_per_second": round(self.pages / elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 2),
+        }
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        stats = self.as_dict()
+        print(f"Ingesta: {stats['documents']} PDFs, {stats['pages']} páginas ({stats['pages_per_second']}/s), "
+              f"{stats['chunks']} fragmentos ({stats['chunks_per_second']}/s), {stats['errors']} errores.")
+
+
+class IngestionPipeline:
+    """Extrae, fragmenta e incrusta PDFs en streaming."""
+
+    def __init__(self, chunker, model, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 pages_per_task=DEFAULT_PAGES_PER_TASK, max_pending_tasks=None,
+                 start_method=DEFAULT_START_METHOD):
+        self.chunker = chunker
+        self.start_method = start_method
+        self.model = model
+        self.workers = workers
+        self.batch_size = batch_size
+        self.pages_per_task = pages_per_task
+        self.max_pending_tasks = max_pending_tasks or max(2, workers * 2)
+
+    @classmethod
+    def from_env(cls, chunker, model):
+        return cls(
+            chunker, model,
+            workers=int(os.getenv("INGEST_WORKERS", DEFAULT_WORKERS)),
+            batch_size=int(os.getenv("INGEST_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+            pages_per_task=int(os.getenv("INGEST_PAGES_PER_TASK", DEFAULT_PAGES_PER_TASK)),
+            start_method=os.getenv("INGEST_START_METHOD", DEFAULT_START_METHOD),
+        )
+
+    def _tasks(self, pdf_paths, stats, on_error):
+        for path in pdf_paths:
+            try:
+                n_pages = pdf_page_count(path)
+            except Exception as e:
+                stats.errors += 1
+                on_error(path, e)
+                continue
+            ranges = [(first, min(first + self.pages_per_task, n_pages))
+                      for first in range(0, n_pages, self.pages_per_task)] or [(0, 0)]
+            for i, (first, last) in enumerate(ranges):
+                yield path, first, last, i == len(ranges) - 1
+
+    def _iter_documents(self, pdf_paths, stats, on_error):
+        """Devuelve (ruta, páginas) por PDF, en orden, con un número acotado de tareas en vuelo."""
+        mode = self.chunker.text_mode
+        executor = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(self.start_method))
+        try:
+            pending = deque()
+            tasks = self._tasks(pdf_paths, stats, on_error)
+            current_path, current_pages, failed = None, [], False
+            while True:
+                while len(pending) < self.max_pending_tasks:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    path, first, last, is_last = task
+                    if executor:
+                        result = executor.submit(_extract_task, path, first, last, mode)
+                    else:
+                        result = (path, first, last, mode)
+                    pending.append((path, is_last, result))
+                if not pending:
+                    break
+                path, is_last, result = pending.popleft()
+                if path != current_path:
+                    current_path, current_pages, failed = path, [], False
+                try:
+                    pages = result.result() if executor else _extract_task(*result)
+                    current_pages.extend(pages)
+                    stats.pages += len(pages)
+                except Exception as e:
+                    if not failed:
+                        stats.errors += 1
+                        on_error(path, e)
+                    failed = True
+                if is_last and not failed:
+                    stats.documents += 1
+                    yield path, current_pages
+                    current_pages = []
+                stats.report()
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def _embed(self, batch, stats, on_batch):
+        start = time.perf_counter()
+        embeddings = np.asarray(
+            self.model.encode([chunk["text"] for _, chunk in batch], batch_size=self.batch_size),
+            dtype='float32'
+        )
+        stats.embed_seconds += time.perf_counter() - start
+        stats.batches += 1
+        stats.chunks += len(batch)
+        on_batch(batch, embeddings)
+
+    def run(self, pdf_paths, on_batch, on_document=None, on_error=None):
+        """
+        Procesa ``pdf_paths``. Llama a ``on_document(ruta)`` cuando un PDF se extrajo
+        completo (antes de entregar sus fragmentos), a ``on_batch(lote, vectores)``
+        con lotes de pares (ruta, fragmento) y a ``on_error(ruta, excepción)`` si un
+        PDF no se pudo procesar. Devuelve las métricas de la ingesta.
+        """
+        stats = IngestionStats()
+        on_document = on_document or (lambda path: None)
+        on_error = on_error or (lambda path, e: print(f"Error al procesar el PDF {path}: {e}"))
+        batch = []
+        for path, pages in self._iter_documents(pdf_paths, stats, on_error):
+            try:
+                chunks = self.chunker.chunk_pages(pages, path)
+            except Exception as e:
+                stats.errors += 1
+                on_error(path, e)
+                continue
+            on_document(path)
+            for chunk in chunks:
+                batch.append((path, chunk))
+                if len(batch) >= self.batch_size:
+                    self._embed(batch, stats, on_batch)
+                    batch = []
+        if batch:
+            self._embed(batch, stats, on_batch)
+        if pdf_paths:
+            stats.report(force=True)
+        return stats.as_dict()
@@ -0,0 +1,116 @@
+"""
+Clasificador de intenciones por incrustaciones: el paso entre las palabras clave
+de ``intent_router`` y el LLM.
+
+Cada intención de ``intents.json`` y cada variante con ``examples`` tiene un
+vector prototipo: la media normalizada de las incrustaciones de sus ejemplos
+(preguntas reales, faltas de ortografía incluidas) y, en las intenciones, de sus
+frases. Una pregunta sin frases clave se compara por similitud coseno con todos
+los prototipos; si el más parecido llega a ``threshold`` y supera en al menos
+``margin`` al mejor de otra intención, se responde con la respuesta predefinida.
+Si no, la pregunta sigue al camino RAG (FAISS + OpenAI).
+
+Las intenciones con ``action`` (agendar una llamada tiene efectos) y las que
+tienen ``"classify": false`` solo se reconocen por palabras clave: el clasificador
+únicamente elige entre respuestas predefinidas.
+Los prototipos se calculan la primera vez que hacen falta (o con ``prepare``),
+para no cargar el modelo al arrancar.
+"""
+import threading
+from collections import Counter
+
+import faiss
+import numpy as np
+
+
+def normalized_rows(embeddings):
+    vectors = np.asarray(embeddings, dtype='float32')
+    vectors = vectors.reshape(-1, vectors.shape[-1]).copy()
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class IntentClassifier:
+    """Prototipos de las intenciones de un ``IntentRouter`` calculados con ``encode``."""
+
+    def __init__(self, router, encode, threshold=0.7, margin=0.05):
+        self.router = router
+        self._encode = encode
+        self.threshold = threshold
+        self.margin = margin
+        self._targets = []  # (índice de intención, índice de variante o None) de cada prototipo
+        self._texts, self._owners = [], []
+        for index, intent in enumerate(router.intents):
+            if intent.get("action") or intent.get("classify", True) is False:
+                continue
+            # Las frases de una variante solo matizan la intención ("pago"), así que no bastan como prototipo
+            options = [(None, intent, intent.get("phrases", []))] + [
+                (v, variant, []) for v, variant in enumerate(intent.get("variants", []))]
+            for variant, option, phrases in options:
+                examples = list(phrases) + list(option.get("examples", []))
+                if not examples:
+                    continue
+                self._owners.extend([len(self._targets)] * len(examples))
+                self._texts.extend(examples)
+                self._targets.append((index, variant))
+        self._intent_of = np.array([index for index, _ in self._targets])
+        self._prototypes = None
+
+        self._lock = threading.Lock()
+        self.classified = 0
+        self.escalated = 0
+        self.by_intent = Counter()
+
+    @property
+    def size(self):
+        return len(self._targets)
+
+    def prepare(self):
+        """Calcula los prototipos si aún no se han calculado."""
+        if self._prototypes is not None or not self._targets:
+            return
+        with self._lock:
+            if self._prototypes is None:
+                vectors = normalized_rows(self._encode(self._texts))
+                owners = np.array(self._owners)
+                self._prototypes = normalized_rows(
+                    np.stack([vectors[owners == target].mean(axis=0) for target in range(len(self._targets))]))
+
+    def rank(self, embedding):
+        """
+        Devuelve (IntentMatch del prototipo más parecido, similitud, similitud del
+        mejor prototipo de otra intención), sin aplicar el umbral. Sin prototipos
+        devuelve (None, 0.0, 0.0).
+        """
+        if not self._targets:
+            return None, 0.0, 0.0
+        self.prepare()
+        scores = self._prototypes @ normalized_rows(embedding)[0]
+        best = int(np.argmax(scores))
+        others = scores[self._intent_of != self._intent_of[best]]
+        runner_up = float(others.max()) if others.size else -1.0
+        return self.router.match_for(*self._targets[best]), float(scores[best]), runner_up
+
+    def classify(self, embedding):
+        """IntentMatch si la pregunta se parece lo bastante a una intención, o None."""
+        match, score, runner_up = self.rank(embedding)
+        accepted = match is not None and score >= self.threshold and score - runner_up >= self.margin
+        with self._lock:
+            if accepted:
+                self.classified += 1
+                self.by_intent[match.category or match.action] += 1
+            else:
+                self.escalated += 1
+        return match if accepted else None
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "margin": self.margin,
+                "prototypes": self.size,
+                "prepared": self._prototypes is not None,
+                "classified": self.classified,
+                "escalated": self.escalated,
+                "by_intent": dict(self.by_intent),
+            }
@@ -0,0 +1,119 @@
+"""
+Enrutador de intenciones para los usuarios verificados.
+
+Las intenciones (frases, categoría y respuesta) se declaran en ``intents.json``
+y se compilan en una sola expresión regular: las frases, normalizadas igual que
+las preguntas (minúsculas, sin acentos ni puntuación, espacios colapsados), se
+agrupan en un trie y el mensaje se recorre una vez. De las intenciones con
+alguna frase presente gana la de mayor ``priority`` (a igual prioridad, la que
+se declaró antes); dentro de ella, la primera de sus ``variants`` con alguna
+frase presente sustituye la categoría y la respuesta.
+
+Las frases se buscan como subcadenas, como en la cadena de ``if/elif`` a la que
+sustituye ("hola" también aparece en "holanda"). Una intención con ``action``
+no tiene respuesta: la acción la resuelve quien llama. Los ``fields`` son
+marcadores ``{nombre}`` de la respuesta que se rellenan al responder.
+"""
+import json
+import re
+from collections import namedtuple
+
+from rag_cache import normalize_question
+
+IntentMatch = namedtuple("IntentMatch", "intent category response action fields")
+
+
+def trie_pattern(phrases):
+    """
+    Expresión regular equivalente a la alternancia de ``phrases`` con los
+    prefijos comunes factorizados. En cada posición prueba antes las frases más
+    largas, así que encuentra la más larga que empieza ahí.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
+class IntentRouter:
+    """Intenciones compiladas; ``route`` devuelve un ``IntentMatch`` o None."""
+
+    def __init__(self, intents):
+        self.intents = []
+        labels = {}  # frase normalizada -> {(índice de intención, índice de variante o None)}
+        names = set()
+        for index, intent in enumerate(intents):
+            name = intent.get("name")
+            if not name or name in names:
+                raise ValueError(f"Intención sin nombre o repetida: {name!r}")
+            names.add(name)
+            if not intent.get("action") and not (intent.get("category") and intent.get("response")):
+                raise ValueError(f"La intención {name!r} necesita 'action' o 'category' y 'response'")
+            variants = intent.get("variants", [])
+            for label, phrases in [((index, None), intent.get("phrases"))] + [
+                    ((index, v), variant.get("phrases")) for v, variant in enumerate(variants)]:
+                if not phrases:
+                    raise ValueError(f"La intención {name!r} tiene un grupo sin frases")
+                for phrase in phrases:
+                    normalized = normalize_question(phrase)
+                    if not normalized:
+                        raise ValueError(f"Frase vacía tras normalizar en {name!r}: {phrase!r}")
+                    labels.setdefault(normalized, set()).add(label)
+            self.intents.append(intent)
+
+        # En cada posición la expresión solo devuelve la frase más larga; las
+        # frases que son prefijo suyo también están presentes
+        self._labels = {
+            phrase: frozenset().union(*(own for other, own in labels.items() if phrase.startswith(other)))
+            for phrase in labels
+        }
+        self._pattern = re.compile("(?=(" + trie_pattern(labels) + "))")
+        ranked = sorted(range(len(self.intents)), key=lambda i: (-self.intents[i].get("priority", 0), i))
+        self._rank = {index: rank for rank, index in enumerate(ranked)}
+        self._by_rank = ranked
+        # Resultado ya construido de cada intención y de cada una de sus variantes
+        self._matches = {}
+        for index, intent in enumerate(self.intents):
+            for v, option in [(None, intent)] + list(enumerate(intent.get("variants", []))):
+                self._matches[index, v] = IntentMatch(intent["name"], option.get("category"), option.get("response"),
+                                                      intent.get("action"), tuple(option.get("fields", ())))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["intents"])
+
+    def match_for(self, index, variant=None):
+        """``IntentMatch`` de la intención ``index`` o de una de sus variantes."""
+        return self._matches[index, variant]
+
+    def matched_labels(self, question):
+        """Pares (intención, variante) con alguna frase presente en ``question``."""
+        found = set()
+        for phrase in self._pattern.findall(normalize_question(question)):
+            found |= self._labels[phrase]
+        return found
+
+    def route(self, question):
+        found = self.matched_labels(question)
+        ranks = [self._rank[index] for index, variant in found if variant is None]
+        if not ranks:
+            return None
+        index = self._by_rank[min(ranks)]
+        for v in range(len(self.intents[index].get("variants", ()))):
+            if (index, v) in found:
+                return self._matches[index, v]
+        return self._matches[index, None]
@@ -0,0 +1,399 @@
+"""
+Pasarela hacia la API de OpenAI para el camino RAG.
+
+Todas las llamadas a ``chat.completions.create`` pasan por aquí:
+
+- **Agrupación**: las peticiones con la misma clave que llegan mientras otra
+  igual está en curso esperan su resultado en lugar de llamar a OpenAI (la API
+  usa la clave de la caché de respuestas: pregunta normalizada + contexto).
+- **Concurrencia acotada**: como mucho ``max_concurrency`` llamadas a la vez.
+- **Presupuesto de tokens por minuto** (``tokens_per_minute``, 0 = sin límite):
+  cada llamada reserva una estimación de sus tokens y se ajusta con el uso real.
+- **Cola con plazo**: si no se obtiene turno en ``queue_timeout`` segundos se
+  lanza ``QueueTimeout`` en lugar de seguir acumulando peticiones.
+- **Reintentos** de errores transitorios (429, 5xx, timeouts, conexión) con
+  espera exponencial con jitter, respetando ``Retry-After`` si viene.
+
+``stream`` aplica los mismos límites a las respuestas en streaming, sin agrupación.
+
+Los límites son por proceso. ``LLMGateway`` es para la API Flask (hilos) y
+``AsyncLLMGateway`` para el modo asíncrono; comparten configuración y métricas.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+import openai
+
+from metrics import Histogram
+
+# Tokens de respuesta que se reservan si la petición no fija max_tokens
+DEFAULT_COMPLETION_TOKENS = 300
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+class QueueTimeout(Exception):
+    """La petición no obtuvo turno (concurrencia o tokens) dentro del plazo."""
+
+
+def request_key(params):
+    """Clave de agrupación por defecto: los parámetros completos de la petición."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def estimate_tokens(params):
+    """Estimación aproximada (4 caracteres por token) del prompt más la respuesta."""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in params.get("messages", []))
+    return prompt_chars // 4 + params.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+
+def is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):  # incluye APITimeoutError
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_after_seconds(error):
+    """Segundos indicados por la cabecera Retry-After del error, o None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBudget:
+    """
+    Cubeta de tokens con capacidad ``tokens_per_minute`` que se rellena de forma continua.
+
+    ``reserve`` descuenta los tokens aunque no haya suficientes (el saldo queda
+    negativo) y devuelve cuánto debe esperar el llamador: las reservas se
+    atienden en orden de llegada.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens):
+        """Reserva ``tokens`` y devuelve los segundos de espera hasta poder usarlos."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._available -= tokens
+            return max(0.0, -self._available / self.rate)
+
+    def refund(self, tokens):
+        """Devuelve tokens reservados (negativo para cobrar tokens adicionales)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._available = min(self.capacity, self._available + tokens)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._available
+
+
+class _Flight:
+    """Llamada en curso de una clave; las peticiones iguales esperan su resultado."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _GatewayBase:
+    """Configuración, presupuesto de tokens, política de reintentos y métricas comunes."""
+
+    def __init__(self, call, max_concurrency=8, tokens_per_minute=0, queue_timeout=15.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.call = call
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._flights = {}
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.queue_timeouts = 0
+        self.failures = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.queue_wait = Histogram()
+        self.upstream_latency = Histogram()
+
+    def _begin(self, key, new_flight):
+        """Registra la petición; devuelve (vuelo, es_líder). ``new_flight`` crea el vuelo si no hay otro en curso."""
+        with self._stats_lock:
+            self.requests += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = new_flight()
+            return flight, True
+
+    def _end(self, key):
+        with self._stats_lock:
+            self._flights.pop(key, None)
+
+    def _enter_queue(self):
+        with self._stats_lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def _leave_queue(self, waited_seconds):
+        with self._stats_lock:
+            self.queue_depth -= 1
+        self.queue_wait.observe(waited_seconds)
+
+    def _reserve_tokens(self, tokens, deadline):
+        """Reserva tokens del presupuesto; devuelve la espera o lanza QueueTimeout si supera el plazo."""
+        if self.budget is None:
+            return 0.0
+        wait = self.budget.reserve(tokens)
+        if time.monotonic() + wait > deadline:
+            self.budget.refund(tokens)
+            self._queue_timeout()
+        return wait
+
+    def _queue_timeout(self):
+        with self._stats_lock:
+            self.queue_timeouts += 1
+        raise QueueTimeout(f"Sin turno para OpenAI tras {self.queue_timeout} s en cola.")
+
+    def _start_call(self):
+        with self._stats_lock:
+            self.upstream_calls += 1
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _finish_call(self, started):
+        self.upstream_latency.observe(time.perf_counter() - started)
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    def _retry_delay(self, attempt, error):
+        """Espera antes del reintento ``attempt``, o None si el error no se reintenta."""
+        with self._stats_lock:
+            if isinstance(error, openai.RateLimitError):
+                self.rate_limited += 1
+            if attempt >= self.max_retries or not is_retryable(error):
+                self.failures += 1
+                return None
+            self.retries += 1
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _settle_tokens(self, reserved, response):
+        """Ajusta la reserva con los tokens que informa la respuesta."""
+        usage = getattr(response, "usage", None)
+        if self.budget is not None and usage is not None and usage.total_tokens is not None:
+            self.budget.refund(reserved - usage.total_tokens)
+
+    def as_dict(self):
+        with self._stats_lock:
+            stats = {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "upstream_calls": self.upstream_calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "queue_timeouts": self.queue_timeouts,
+                "failures": self.failures,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+            }
+        if self.budget is not None:
+            stats["tokens_per_minute"] = self.budget.capacity
+            stats["tokens_available"] = round(self.budget.available)
+        stats["queue_wait"] = self.queue_wait.as_dict()
+        stats["upstream_latency"] = self.upstream_latency.as_dict()
+        return stats
+
+
+class LLMGateway(_GatewayBase):
+    """Pasarela para código con hilos: ``complete`` bloquea hasta tener la respuesta."""
+
+    def __init__(self, call, max_concurrency=8, **kwargs):
+        super().__init__(call, max_concurrency, **kwargs)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def complete(self, params, key=None):
+        """Llama a ``call(**params)`` y devuelve su respuesta (compartida entre peticiones con la misma clave)."""
+        key = key or request_key(params)
+        flight, leader = self._begin(key, _Flight)
+        if leader:
+            try:
+                flight.result = self._run(params)
+            except Exception as e:
+                flight.error = e
+            self._end(key)
+            flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, params):
+        """
+        Generador con los fragmentos de una respuesta en streaming. Respeta la
+        concurrencia, el presupuesto de tokens y los reintentos (al abrir el
+        stream), pero no agrupa: cada petición recibe su propio stream.
+        """
+        params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+        with self._stats_lock:
+            self.requests += 1
+        tokens = estimate_tokens(params)
+        self._acquire(tokens)
+        try:
+            response = self._call(params)
+            try:
+                for chunk in response:
+                    self._settle_tokens(tokens, chunk)  # solo el último fragmento trae el uso
+                    yield chunk
+            finally:
+                response.close()
+        finally:
+            self._slots.release()
+
+    def _run(self, params):
+        tokens = estimate_tokens(params)
+        self._acquire(tokens)
+        try:
+            response = self._call(params)
+            self._settle_tokens(tokens, response)
+            return response
+        finally:
+            self._slots.release()
+
+    def _acquire(self, tokens):
+        """Espera turno (tokens y plaza de concurrencia) o lanza QueueTimeout."""
+        deadline = time.monotonic() + self.queue_timeout
+        start = time.perf_counter()
+        self._enter_queue()
+        try:
+            time.sleep(self._reserve_tokens(tokens, deadline))
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                if self.budget is not None:
+                    self.budget.refund(tokens)
+                self._queue_timeout()
+        finally:
+            self._leave_queue(time.perf_counter() - start)
+
+    def _call(self, params):
+        for attempt in range(self.max_retries + 1):
+            started = self._start_call()
+            try:
+                response = self.call(**params)
+            except Exception as e:
+                self._finish_call(started)
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._finish_call(started)
+            return response
+
+
+class AsyncLLMGateway(_GatewayBase):
+    """Pasarela para el modo asíncrono: ``call`` es una corrutina y ``complete`` se espera con ``await``."""
+
+    def __init__(self, call, max_concurrency=8, **kwargs):
+        super().__init__(call, max_concurrency, **kwargs)
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def complete(self, params, key=None):
+        key = key or request_key(params)
+        # La llamada corre en su propia tarea: si se cancela una de las peticiones
+        # agrupadas (p. ej. el cliente se desconecta) las demás siguen esperándola
+        task, leader = self._begin(key, lambda: asyncio.ensure_future(self._run(params)))
+        if leader:
+            task.add_done_callback(lambda _: self._end(key))
+        return await asyncio.shield(task)
+
+    async def stream(self, params):
+        """Como ``LLMGateway.stream``, como generador asíncrono."""
+        params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+        with self._stats_lock:
+            self.requests += 1
+        tokens = estimate_tokens(params)
+        await self._acquire(tokens)
+        try:
+            response = await self._call(params)
+            try:
+                async for chunk in response:
+                    self._settle_tokens(tokens, chunk)
+                    yield chunk
+            finally:
+                await response.close()
+        finally:
+            self._slots.release()
+
+    async def _run(self, params):
+        tokens = estimate_tokens(params)
+        await self._acquire(tokens)
+        try:
+            response = await self._call(params)
+            self._settle_tokens(tokens, response)
+            return response
+        finally:
+            self._slots.release()
+
+    async def _acquire(self, tokens):
+        deadline = time.monotonic() + self.queue_timeout
+        start = time.perf_counter()
+        self._enter_queue()
+        try:
+            await asyncio.sleep(self._reserve_tokens(tokens, deadline))
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                if self.budget is not None:
+                    self.budget.refund(tokens)
+                self._queue_timeout()
+        finally:
+            self._leave_queue(time.perf_counter() - start)
+
+    async def _call(self, params):
+        for attempt in range(self.max_retries + 1):
+            started = self._start_call()
+            try:
+                response = await self.call(**params)
+            except Exception as e:
+                self._finish_call(started)
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._finish_call(started)
+            return response
@@ -0,0 +1,201 @@
+"""
+Índice persistente (SQLite + FTS5) del log de solicitudes.
+
+Los segmentos JSONL de ``request_log`` siguen siendo la fuente de verdad; este
+índice es una vista secundaria que se alimenta en cada vaciado del escritor y se
+puede reconstruir desde los segmentos en cualquier momento:
+
+    python log_index.py rebuild --log-dir request_log --db request_log.db
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import weakref
+
+from request_log import iter_log_entries, log_lock
+
+_indexes = weakref.WeakSet()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    day TEXT,
+    sender_id TEXT,
+    employee_id TEXT,
+    category TEXT,
+    question TEXT,
+    answer TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_log_sender ON log_entries (sender_id, id);
+CREATE INDEX IF NOT EXISTS idx_log_employee ON log_entries (employee_id, id);
+CREATE INDEX IF NOT EXISTS idx_log_category ON log_entries (category, id);
+CREATE INDEX IF NOT EXISTS idx_log_day ON log_entries (day, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5(
+    question, answer, category,
+    content='log_entries', content_rowid='id'
+);
+"""
+
+ENTRY_COLUMNS = "id, timestamp, sender_id, employee_id, question, answer, category"
+
+
+def _row_to_entry(row):
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "sender_id": row[2],
+        "employee_id": row[3],
+        "question": row[4],
+        "answer": row[5],
+        "category": row[6],
+    }
+
+
+def fts_query(text):
+    """Convierte el texto libre del usuario en una consulta FTS5 segura (prefijos con AND)."""
+    terms = [term.replace('"', '') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+class LogIndex:
+    """Índice SQLite del log, con una conexión por hilo."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        _indexes.add(self)
+
+    def _after_fork(self):
+        # Las conexiones SQLite no se comparten entre procesos: cada worker abre las suyas
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_entries(self, entries):
+        """Indexa un lote de entradas en una sola transacción."""
+        conn = self._connection()
+        with conn:
+            self._insert(conn, entries)
+
+    @staticmethod
+    def _insert(conn, entries):
+        for entry in entries:
+            timestamp = entry.get("timestamp") or ""
+            cursor = conn.execute(
+                "INSERT INTO log_entries (timestamp, day, sender_id, employee_id, category, question, answer) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    timestamp,
+                    timestamp[:10],
+                    entry.get("sender_id"),
+                    None if entry.get("employee_id") is None else str(entry.get("employee_id")),
+                    entry.get("category"),
+                    entry.get("question"),
+                    entry.get("answer"),
+                )
+            )
+            conn.execute(
+                "INSERT INTO log_fts (rowid, question, answer, category) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid, entry.get("question") or "", entry.get("answer") or "", entry.get("category") or "")
+            )
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM log_entries LIMIT 1").fetchone() is None
+
+    def history(self, sender_id, limit=None):
+        """Historial de un remitente en orden cronológico (búsqueda por índice)."""
+        sql = f"SELECT {ENTRY_COLUMNS} FROM log_entries WHERE sender_id = ? ORDER BY id"
+        params = [sender_id]
+        if limit:
+            sql = f"SELECT * FROM ({sql} DESC LIMIT ?) ORDER BY id"
+            params.append(limit)
+        return [_row_to_entry(row) for row in self._connection().execute(sql, params)]
+
+    def by_employee(self, employee_id, limit=100):
+        rows = self._connection().execute(
+            f"SELECT {ENTRY_COLUMNS} FROM log_entries WHERE employee_id = ? ORDER BY id DESC LIMIT ?",
+            (str(employee_id), limit)
+        )
+        return [_row_to_entry(row) for row in rows]
+
+    def by_day(self, day, category=None, limit=100):
+        sql = f"SELECT {ENTRY_COLUMNS} FROM log_entries WHERE day = ?"
+        params = [day]
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [_row_to_entry(row) for row in self._connection().execute(sql, params)]
+
+    def rebuild(self, log_dir, batch_size=5000, only_if_empty=False):
+        """
+        Reconstruye el índice completo a partir de los segmentos del log, en una sola
+        transacción y con el bloqueo del log tomado, así que ningún escritor indexa
+        entradas mientras tanto. Con ``only_if_empty=True`` no hace nada si el índice
+        ya tiene entradas (p. ej. otro worker lo reconstruyó mientras este esperaba).
+        """
+        conn = self._connection()
+        with log_lock(log_dir):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if only_if_empty and not self.is_empty():
+                    conn.rollback()
+                    return 0
+                conn.execute("DELETE FROM log_entries")
+                conn.execute("INSERT INTO log_fts (log_fts) VALUES ('delete-all')")
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = 'log_entries'")
+                batch = []
+                total = 0
+                for entry in iter_log_entries(log_dir):
+                    batch.append(entry)
+                    if len(batch) >= batch_size:
+                        self._insert(conn, batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    self._insert(conn, batch)
+                    total += len(batch)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        print(f"Índice del log reconstruido con {total} entradas.")
+        return total
+
+
+def _reset_after_fork():
+    for instance in list(_indexes):
+        instance._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento del índice del log de solicitudes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Reconstruye el índice desde los segmentos JSONL.")
+    rebuild.add_argument("--log-dir", default="request_log")
+    rebuild.add_argument("--db", default="request_log.db")
+    args = parser.parse_args(argv)
+    if args.command == "rebuild":
+        if not os.path.isdir(args.log_dir):
+            parser.error(f"No existe el directorio de log '{args.log_dir}'.")
+        LogIndex(args.db).rebuild(args.log_dir)
+
+
+if __name__ == "__main__":
+    main()
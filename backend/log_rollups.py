@@ -0,0 +1,182 @@
+"""
+Contadores agregados del log de solicitudes por categoría, hora y día.
+
+Se actualizan de forma incremental en cada vaciado del escritor del log y se
+guardan en la misma base SQLite que el índice del log. Los cubos de hora y día
+están en UTC. Se pueden reconstruir desde los segmentos JSONL:
+
+    python log_rollups.py rebuild --log-dir request_log --db request_log.db
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import weakref
+from collections import Counter
+from datetime import datetime, timezone
+
+from request_log import iter_log_entries, log_lock
+
+_rollups = weakref.WeakSet()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    hour TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, category)
+);
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, category)
+);
+CREATE TABLE IF NOT EXISTS rollup_totals (
+    category TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+HOUR_FORMAT = "%Y-%m-%dT%H"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def entry_buckets(entry):
+    """Devuelve (hora, día) en UTC para una entrada, o (None, None) si el timestamp no es válido."""
+    try:
+        ts = datetime.fromisoformat(entry["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    ts = ts.astimezone(timezone.utc)
+    return ts.strftime(HOUR_FORMAT), ts.strftime(DAY_FORMAT)
+
+
+class LogRollups:
+    """Contadores por categoría/hora/día mantenidos en SQLite."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        _rollups.add(self)
+
+    def _after_fork(self):
+        # Las conexiones SQLite no se comparten entre procesos: cada worker abre las suyas
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _aggregate(entries):
+        hourly, daily, totals = Counter(), Counter(), Counter()
+        for entry in entries:
+            category = entry.get("category") or "Uncategorized"
+            totals[category] += 1
+            hour, day = entry_buckets(entry)
+            if hour is None:
+                continue
+            hourly[(hour, category)] += 1
+            daily[(day, category)] += 1
+        return hourly, daily, totals
+
+    @staticmethod
+    def _apply(conn, hourly, daily, totals):
+        conn.executemany(
+            "INSERT INTO rollup_hourly (hour, category, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (hour, category) DO UPDATE SET count = count + excluded.count",
+            [(hour, category, n) for (hour, category), n in hourly.items()]
+        )
+        conn.executemany(
+            "INSERT INTO rollup_daily (day, category, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (day, category) DO UPDATE SET count = count + excluded.count",
+            [(day, category, n) for (day, category), n in daily.items()]
+        )
+        conn.executemany(
+            "INSERT INTO rollup_totals (category, count) VALUES (?, ?) "
+            "ON CONFLICT (category) DO UPDATE SET count = count + excluded.count",
+            list(totals.items())
+        )
+
+    def add_entries(self, entries):
+        """Suma un lote de entradas a los contadores en una sola transacción."""
+        conn = self._connection()
+        with conn:
+            self._apply(conn, *self._aggregate(entries))
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM rollup_totals LIMIT 1").fetchone() is None
+
+    def category_totals(self):
+        """Total histórico de solicitudes por categoría."""
+        return dict(self._connection().execute("SELECT category, count FROM rollup_totals"))
+
+    def rebuild(self, log_dir, batch_size=5000, only_if_empty=False):
+        """
+        Recalcula todos los contadores desde los segmentos del log en una transacción,
+        con el bloqueo del log tomado: ningún vaciado del escritor suma entradas
+        mientras tanto ni se cuenta dos veces. Con ``only_if_empty=True`` no hace nada
+        si los contadores ya tienen datos (p. ej. otro worker los reconstruyó).
+        """
+        conn = self._connection()
+        total = 0
+        with log_lock(log_dir):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if only_if_empty and not self.is_empty():
+                    conn.rollback()
+                    return 0
+                conn.execute("DELETE FROM rollup_hourly")
+                conn.execute("DELETE FROM rollup_daily")
+                conn.execute("DELETE FROM rollup_totals")
+                batch = []
+                for entry in iter_log_entries(log_dir):
+                    batch.append(entry)
+                    if len(batch) >= batch_size:
+                        self._apply(conn, *self._aggregate(batch))
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    self._apply(conn, *self._aggregate(batch))
+                    total += len(batch)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        print(f"Contadores del log reconstruidos con {total} entradas.")
+        return total
+
+
+def _reset_after_fork():
+    for instance in list(_rollups):
+        instance._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de los contadores del log de solicitudes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Recalcula los contadores desde los segmentos JSONL.")
+    rebuild.add_argument("--log-dir", default="request_log")
+    rebuild.add_argument("--db", default="request_log.db")
+    args = parser.parse_args(argv)
+    if args.command == "rebuild":
+        if not os.path.isdir(args.log_dir):
+            parser.error(f"No existe el directorio de log '{args.log_dir}'.")
+        LogRollups(args.db).rebuild(args.log_dir)
+
+
+if __name__ == "__main__":
+    main()
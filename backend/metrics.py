@@ -0,0 +1,182 @@
+"""
+Métricas en memoria para las rutas internas de la API.
+
+``Histogram`` cuenta observaciones (en segundos) en cubetas acumulativas con
+límites en milisegundos, al estilo de Prometheus, y estima percentiles a partir
+de ellas. ``SizeHistogram`` hace lo mismo con tamaños (p. ej. preguntas por lote).
+``PrometheusText`` escribe métricas en el formato de texto de Prometheus (``/metrics``).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+DEFAULT_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Histogram:
+    """Histograma de latencias seguro entre hilos."""
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        # Límites en segundos: observe no convierte cada valor a ms
+        self._bounds_seconds = tuple(bound / 1000 for bound in self.buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self._bounds_seconds, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+    @contextmanager
+    def time(self):
+        """Mide la duración del bloque ``with``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _percentile_ms(self, counts, total, max_seconds, fraction):
+        """Límite superior de la cubeta que contiene el percentil (el máximo si cae en la última)."""
+        target = fraction * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else round(max_seconds * 1000, 3)
+        return 0.0
+
+    def snapshot(self):
+        """(cuentas por cubeta, total, suma en segundos, máximo en segundos) en un mismo instante."""
+        with self._lock:
+            return list(self._counts), self.count, self.sum_seconds, self.max_seconds
+
+    def as_dict(self):
+        counts, total, sum_seconds, max_seconds = self.snapshot()
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets_ms, counts):
+            cumulative += count
+            buckets[f"le_{bound}ms"] = cumulative
+        buckets["le_inf"] = total
+        return {
+            "count": total,
+            "avg_ms": round(sum_seconds * 1000 / total, 3) if total else 0.0,
+            "max_ms": round(max_seconds * 1000, 3),
+            "p50_ms": self._percentile_ms(counts, total, max_seconds, 0.5) if total else 0.0,
+            "p95_ms": self._percentile_ms(counts, total, max_seconds, 0.95) if total else 0.0,
+            "p99_ms": self._percentile_ms(counts, total, max_seconds, 0.99) if total else 0.0,
+            "buckets": buckets,
+        }
+
+
+class SizeHistogram:
+    """Histograma de tamaños enteros seguro entre hilos."""
+
+    def __init__(self, buckets=DEFAULT_SIZE_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def _percentile(self, counts, total, maximum, fraction):
+        target = fraction * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets[i] if i < len(self.buckets) else maximum
+        return 0
+
+    def as_dict(self):
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self.count, self.total, self.max
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[f"le_{bound}"] = cumulative
+        buckets["le_inf"] = count
+        return {
+            "count": count,
+            "avg": round(total / count, 3) if count else 0.0,
+            "max": maximum,
+            "p50": self._percentile(counts, count, maximum, 0.5) if count else 0,
+            "p95": self._percentile(counts, count, maximum, 0.95) if count else 0,
+            "buckets": buckets,
+        }
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        value = int(value)
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusText:
+    """Escribe familias de métricas (contadores, gauges e histogramas) en el formato de texto de Prometheus."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        # Líneas de cada familia, en el orden en que aparecen (sus muestras deben ir juntas)
+        self._families = {}
+
+    def _family(self, name, kind, help_text):
+        name = self.prefix + name
+        if name not in self._families:
+            self._families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        return name, self._families[name]
+
+    def counter(self, name, help_text, value, **labels):
+        name, lines = self._family(name, "counter", help_text)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def gauge(self, name, help_text, value, **labels):
+        name, lines = self._family(name, "gauge", help_text)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name, help_text, histogram, **labels):
+        """Un ``Histogram`` (límites en milisegundos) como histograma de Prometheus en segundos."""
+        name, lines = self._family(name, "histogram", help_text)
+        counts, total, sum_seconds, _ = histogram.snapshot()
+        cumulative = 0
+        for bound, count in zip(histogram.buckets_ms, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': f'{bound / 1000:g}'})} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {total}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sum_seconds)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {total}")
+
+    def render(self):
+        return "".join(line + "\n" for lines in self._families.values() for line in lines)
@@ -0,0 +1,84 @@
+"""
+Carga diferida del modelo de incrustaciones y del índice de documentos.
+
+``LazyResource`` envuelve una función de carga: la primera llamada a ``get``
+carga el recurso, una sola vez aunque lleguen varias peticiones a la vez, y las
+siguientes lo reutilizan. Así el proceso arranca sin esperar al modelo y
+``/ready`` responde 503 hasta que todo está cargado.
+
+Con varios workers (gunicorn, ``hypercorn --workers``), para no tener una copia
+por proceso:
+
+- El índice FAISS y los textos de los fragmentos se abren con mmap
+  (``DOC_INDEX_MMAP``, ver ``doc_index.py`` y ``chunk_store.py``): las páginas
+  viven en la caché del sistema operativo y todos los workers comparten una.
+- Los pesos del modelo se cargan antes del fork con ``MODEL_PRELOAD=eager`` y
+  ``gunicorn --preload``; los workers los heredan por copy-on-write.
+
+Si un proceso hace fork mientras otro hilo está cargando, el hijo empieza de
+cero con un lock nuevo en lugar de esperar a un hilo que no existe en él.
+"""
+import os
+import threading
+import time
+import weakref
+
+_resources = weakref.WeakSet()
+
+
+class LazyResource:
+    """Recurso que se carga con ``loader`` la primera vez que se pide."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = "pending"
+        self.error = None
+        self.load_seconds = None
+        _resources.add(self)
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    # La siguiente petición vuelve a intentarlo
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self.state = "ready"
+        return self._value
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if self.state != "ready":
+            self.state = "pending"
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+def _reset_after_fork():
+    for resource in list(_resources):
+        resource._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,132 @@
+"""
+Caché de perfiles de empleados (nombre, fecha de ingreso, ...) por employee_id.
+
+Los datos de RRHH casi no cambian durante una conversación, así que el perfil se
+carga con una sola consulta y se guarda ``ttl_seconds``. Si varias peticiones
+piden a la vez el mismo empleado que no está en caché, solo una va a la base de
+datos y las demás esperan su resultado (single-flight).
+
+Un perfil ``None`` (empleado inexistente o error de la base de datos) no se
+guarda, para reintentar en la próxima petición. ``invalidate`` también descarta
+la carga en curso: lo que leyó antes de la invalidación no se guarda.
+
+La caché es de cada proceso: con varios workers, ``invalidate`` solo afecta al
+que recibe la petición y los demás siguen usando su copia hasta que caduca.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Histogram
+
+
+class _Flight:
+    """Carga en curso de un empleado; los demás hilos esperan a que termine."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.profile = None
+        self.error = None
+        # Invalidada mientras cargaba: su resultado se entrega a quienes esperan, pero no se guarda
+        self.invalidated = False
+
+
+class ProfileCache:
+    """Perfiles por employee_id con TTL, desalojo LRU, invalidación y single-flight."""
+
+    def __init__(self, loader, ttl_seconds=300, max_size=10000):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._profiles = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.invalidations = 0
+        self.lookup_latency = Histogram()
+        self.load_latency = Histogram()
+
+    def get(self, employee_id):
+        """Devuelve el perfil del empleado (dict) o None si no se pudo cargar."""
+        start = time.perf_counter()
+        key = str(employee_id)
+        with self._lock:
+            item = self._profiles.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._profiles.move_to_end(key)
+                self.hits += 1
+                self.lookup_latency.observe(time.perf_counter() - start)
+                return item[0]
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._load(key, employee_id, flight)
+        else:
+            flight.done.wait()
+        self.lookup_latency.observe(time.perf_counter() - start)
+        if flight.error is not None:
+            raise flight.error
+        return flight.profile
+
+    def _load(self, key, employee_id, flight):
+        try:
+            with self.load_latency.time():
+                flight.profile = self.loader(employee_id)
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if flight.error is not None:
+                self.errors += 1
+            elif flight.profile is not None and not flight.invalidated:
+                self._profiles[key] = (flight.profile, time.monotonic() + self.ttl_seconds)
+                self._profiles.move_to_end(key)
+                while len(self._profiles) > self.max_size:
+                    self._profiles.popitem(last=False)
+        flight.done.set()
+
+    def invalidate(self, employee_id):
+        """Descarta el perfil guardado del empleado (la próxima petición lo vuelve a cargar)."""
+        key = str(employee_id)
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if flight is not None:
+                flight.invalidated = True
+            if self._profiles.pop(key, None) is not None or flight is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for flight in self._flights.values():
+                flight.invalidated = True
+            self.invalidations += len(self._profiles) + len(self._flights)
+            self._flights.clear()
+            self._profiles.clear()
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "invalidations": self.invalidations,
+                "size": len(self._profiles),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+            }
+        stats["lookup_latency"] = self.lookup_latency.as_dict()
+        stats["load_latency"] = self.load_latency.as_dict()
+        return stats
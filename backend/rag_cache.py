@@ -0,0 +1,288 @@
+"""
+Cachés del camino RAG (preguntas que llegan a FAISS + OpenAI).
+
+- ``EmbeddingCache``: LRU acotado de incrustaciones por pregunta normalizada, para
+  no volver a ejecutar ``model.encode`` con preguntas repetidas.
+- ``ResponseCache``: respuestas de OpenAI por pregunta normalizada + hash del
+  contexto recuperado + versión del prompt, con TTL y desalojo por tamaño. Se
+  vacía cuando cambia la huella del índice de documentos (``DocumentIndex.fingerprint``),
+  es decir, cuando el índice FAISS se reconstruye o se sincroniza con otros PDFs.
+- ``SemanticAnswerCache``: respuestas por similitud de la pregunta, para
+  reutilizar la respuesta de una pregunta ya contestada con otras palabras.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+
+class _CombiningMarks(dict):
+    """Tabla para ``str.translate`` que borra las marcas combinantes (acentos tras NFKD)."""
+
+    def __missing__(self, code):
+        value = None if unicodedata.combining(chr(code)) else code
+        self[code] = value
+        return value
+
+
+_COMBINING_MARKS = _CombiningMarks()
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_question(question):
+    """Minúsculas, sin acentos, sin signos de puntuación y con espacios colapsados."""
+    text = question.lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).translate(_COMBINING_MARKS)
+    text = _PUNCTUATION.sub(' ', text)
+    return ' '.join(text.split())
+
+
+class CacheStats:
+    """Contadores de aciertos y fallos."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self, size, max_size):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": size,
+            "max_size": max_size,
+        }
+
+
+class EmbeddingCache:
+    """LRU de incrustaciones de preguntas, seguro entre hilos."""
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, question):
+        """Incrustación guardada de ``question``, o None."""
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.stats.hits += 1
+                return self._items[key]
+            self.stats.misses += 1
+        return None
+
+    def put(self, question, value):
+        key = normalize_question(question)
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_compute(self, question, compute):
+        """Devuelve la incrustación de ``question``; si no está, la calcula con ``compute(question)``."""
+        value = self.get(question)
+        if value is None:
+            value = compute(question)
+            self.put(question, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def as_dict(self):
+        with self._lock:
+            return self.stats.as_dict(len(self._items), self.max_size)
+
+
+class ResponseCache:
+    """Respuestas por clave con TTL y desalojo LRU, seguro entre hilos."""
+
+    def __init__(self, max_size=1024, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        self.generation = None
+
+    @staticmethod
+    def make_key(question, context, prompt_version):
+        context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        raw = "\x1f".join([normalize_question(question), context_hash, str(prompt_version)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def set_generation(self, generation):
+        """Vacía la caché si ``generation`` (la huella del índice) cambió desde la última llamada."""
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self.generation is not None and self._items:
+                self._items.clear()
+                self.stats.invalidations += 1
+            self.generation = generation
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            value, expires_at = item
+            if expires_at <= now:
+                del self._items[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def as_dict(self):
+        with self._lock:
+            stats = self.stats.as_dict(len(self._items), self.max_size)
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+class SemanticAnswerCache:
+    """
+    Respuestas por similitud de la pregunta: un índice FAISS pequeño (producto
+    interno sobre incrustaciones normalizadas, es decir, similitud coseno) con las
+    preguntas ya respondidas. Si una pregunta nueva tiene similitud mayor o igual a
+    ``threshold`` con alguna guardada, se devuelve su respuesta sin llamar al LLM.
+
+    Con ``dimension=None`` el índice se crea al guardar la primera respuesta, con
+    la dimensión de su incrustación (así no hace falta cargar el modelo al arrancar).
+
+    Las respuestas de ``excluded_categories`` (p. ej. las personalizadas) no se
+    guardan. Desaloja por LRU al superar ``max_size`` y por TTL, y se vacía con
+    ``set_generation`` igual que ``ResponseCache``.
+    """
+
+    def __init__(self, dimension, threshold=0.92, max_size=2000, ttl_seconds=24 * 60 * 60,
+                 excluded_categories=()):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.excluded_categories = set(excluded_categories)
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension)) if dimension else None
+        # ID -> (respuesta, categoría, expira); el orden es el de uso reciente
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+        self.generation = None
+        self.llm_calls_saved = 0
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype='float32').reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, entry_ids):
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.array(entry_ids, dtype='int64'))
+
+    def _nearest(self, vector):
+        if self._index is None or self._index.ntotal == 0:
+            return None, 0.0
+        scores, ids = self._index.search(vector, 1)
+        return int(ids[0][0]), float(scores[0][0])
+
+    def set_generation(self, generation):
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self.generation is not None and self._entries:
+                self._remove(list(self._entries))
+                self.stats.invalidations += 1
+            self.generation = generation
+
+    def get(self, embedding):
+        """Devuelve (respuesta, categoría) de la pregunta más parecida, o None."""
+        vector = self._normalize(embedding)
+        with self._lock:
+            entry_id, score = self._nearest(vector)
+            if entry_id is None or entry_id < 0 or score < self.threshold:
+                self.stats.misses += 1
+                return None
+            answer, category, expires_at = self._entries[entry_id]
+            if expires_at <= time.monotonic():
+                self._remove([entry_id])
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.stats.hits += 1
+            self.llm_calls_saved += 1
+            return answer, category
+
+    def put(self, embedding, answer, category):
+        """Guarda la respuesta salvo que su categoría esté excluida."""
+        if category in self.excluded_categories:
+            return
+        vector = self._normalize(embedding)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            entry_id, score = self._nearest(vector)
+            if entry_id is not None and entry_id >= 0 and score >= self.threshold:
+                # Ya hay una pregunta equivalente: se renueva su respuesta
+                self._entries[entry_id] = (answer, category, expires_at)
+                self._entries.move_to_end(entry_id)
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            if self._index is None:
+                self.dimension = vector.shape[1]
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+            self._index.add_with_ids(vector, np.array([entry_id], dtype='int64'))
+            self._entries[entry_id] = (answer, category, expires_at)
+            if len(self._entries) > self.max_size:
+                evicted = list(self._entries)[:len(self._entries) - self.max_size]
+                self._remove(evicted)
+                self.stats.evictions += len(evicted)
+
+    def as_dict(self):
+        with self._lock:
+            stats = self.stats.as_dict(len(self._entries), self.max_size)
+            stats["llm_calls_saved"] = self.llm_calls_saved
+        stats.update({
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "excluded_categories": sorted(self.excluded_categories),
+        })
+        return stats
@@ -0,0 +1,296 @@
+"""
+Registro de solicitudes append-only en formato JSON Lines.
+
+Cada entrada se escribe como una línea JSON en el segmento activo del directorio
+de log. Los segmentos rotan por tamaño o por antigüedad y quedan listados, en
+orden, en ``manifest.json``. Las escrituras se acumulan en memoria y las vacía a
+disco un hilo en segundo plano, de modo que el hilo de la petición nunca espera
+por el disco.
+
+Uso desde la línea de comandos para migrar el antiguo ``request_log.json``:
+
+    python request_log.py migrate --source request_log.json --log-dir request_log
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+_writers = weakref.WeakSet()
+
+DEFAULT_MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_SEGMENT_AGE_SECONDS = 24 * 60 * 60
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+
+
+def _utc_now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def load_manifest(log_dir):
+    """Lee el manifiesto de segmentos. Devuelve un manifiesto vacío si no existe."""
+    path = os.path.join(log_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"segments": []}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Advertencia: no se pudo leer el manifiesto '{path}': {e}")
+        return {"segments": []}
+    manifest.setdefault("segments", [])
+    return manifest
+
+
+def _save_manifest(log_dir, manifest):
+    """Escribe el manifiesto de forma atómica (archivo temporal + rename)."""
+    path = os.path.join(log_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def log_lock(log_dir):
+    """
+    Bloqueo exclusivo del directorio de log entre procesos. Lo toman las escrituras
+    (con sus listeners) y las reconstrucciones de índices desde los segmentos.
+    """
+    lock_path = os.path.join(log_dir, LOCK_FILE)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _iter_segment_lines(path, reverse=False):
+    """Itera las líneas completas de un segmento; ignora una última línea a medio escribir."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if not reverse:
+                for line in f:
+                    if line.endswith('\n'):
+                        yield line
+                return
+            lines = f.readlines()
+    except FileNotFoundError:
+        return
+    for line in reversed(lines):
+        if line.endswith('\n'):
+            yield line
+
+
+def iter_log_entries(log_dir, reverse=False):
+    """
+    Recorre las entradas del log segmento a segmento sin cargar todo el historial.
+    Con ``reverse=True`` devuelve primero las entradas más recientes.
+    """
+    segments = load_manifest(log_dir)["segments"]
+    if reverse:
+        segments = list(reversed(segments))
+    for segment in segments:
+        path = os.path.join(log_dir, segment["file"])
+        for line in _iter_segment_lines(path, reverse=reverse):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Advertencia: línea corrupta ignorada en '{path}'.")
+
+
+class RequestLogWriter:
+    """
+    Escritor append-only con búfer y vaciado en segundo plano.
+
+    ``append`` solo encola la entrada; un hilo daemon la escribe en el segmento
+    activo cada ``flush_interval`` segundos. El hilo se arranca con la primera
+    entrada de cada proceso, así que un worker creado con fork (gunicorn
+    ``--preload``) tiene el suyo. Un archivo de bloqueo serializa las
+    escrituras y rotaciones entre varios procesos (p. ej. workers de gunicorn).
+    Tras cada escritura se llama a los ``listeners`` con el lote escrito, lo que
+    permite mantener índices secundarios sin tocar el hilo de la petición.
+    """
+
+    def __init__(self, log_dir,
+                 max_segment_bytes=DEFAULT_MAX_SEGMENT_BYTES,
+                 max_segment_age_seconds=DEFAULT_MAX_SEGMENT_AGE_SECONDS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 start_flusher=True,
+                 listeners=None):
+        self.log_dir = log_dir
+        self.listeners = list(listeners or [])
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_seconds = max_segment_age_seconds
+        self.flush_interval = flush_interval
+        self.start_flusher = start_flusher
+        self._reset()
+        os.makedirs(log_dir, exist_ok=True)
+        _writers.add(self)
+        if start_flusher:
+            atexit.register(self.close)
+
+    def _reset(self):
+        self._queue = queue.SimpleQueue()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def append(self, entry):
+        """Encola una entrada para escribirla. No toca el disco."""
+        if self.start_flusher and self._thread is None:
+            self._start()
+        self._queue.put(entry)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-log-flusher", daemon=True)
+                self._thread.start()
+
+    def _drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                return entries
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Escribe en disco todas las entradas pendientes."""
+        with self._flush_lock:
+            entries = self._drain()
+            if not entries:
+                return 0
+            try:
+                # Los listeners corren con el bloqueo tomado: una reconstrucción desde los
+                # segmentos nunca ve una entrada ya escrita pero aún sin indexar
+                with log_lock(self.log_dir):
+                    self._write_entries(entries)
+                    for listener in self.listeners:
+                        try:
+                            listener(entries)
+                        except Exception as e:
+                            print(f"Error en un listener del log de solicitudes: {e}")
+            except Exception as e:
+                print(f"Error al escribir el log de solicitudes: {e}")
+                return 0
+            return len(entries)
+
+    def close(self):
+        """Detiene el hilo de vaciado y escribe lo que quede pendiente."""
+        self._stop.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _after_fork(self):
+        # Lo que había en la cola lo escribe el proceso padre
+        self._reset()
+
+    def _write_entries(self, entries):
+        payload = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+        data = payload.encode('utf-8')
+        manifest = load_manifest(self.log_dir)
+        segment = self._active_segment(manifest, len(data))
+        path = os.path.join(self.log_dir, segment["file"])
+        with open(path, 'ab') as f:
+            f.write(data)
+
+    def _active_segment(self, manifest, incoming_bytes):
+        """Devuelve el segmento abierto, rotándolo si supera el tamaño o la antigüedad."""
+        segments = manifest["segments"]
+        current = segments[-1] if segments and not segments[-1].get("closed_at") else None
+        if current:
+            path = os.path.join(self.log_dir, current["file"])
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            age = time.time() - current.get("created_ts", time.time())
+            if (size > 0 and size + incoming_bytes > self.max_segment_bytes) or age > self.max_segment_age_seconds:
+                current["closed_at"] = _utc_now_iso()
+                current["bytes"] = size
+                current = None
+        if current is None:
+            number = len(segments) + 1
+            current = {
+                "file": f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}",
+                "created_at": _utc_now_iso(),
+                "created_ts": time.time(),
+                "closed_at": None,
+            }
+            segments.append(current)
+            _save_manifest(self.log_dir, manifest)
+        return current
+
+
+def _reset_after_fork():
+    for writer in list(_writers):
+        writer._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def migrate_json_log(source_path, log_dir, batch_size=10000):
+    """
+    Convierte el antiguo archivo JSON (un arreglo con todas las entradas) en
+    segmentos JSONL. Devuelve el número de entradas migradas.
+    """
+    if not os.path.exists(source_path) or os.path.getsize(source_path) == 0:
+        print(f"No hay nada que migrar en '{source_path}'.")
+        return 0
+    if load_manifest(log_dir)["segments"]:
+        raise RuntimeError(f"El directorio '{log_dir}' ya contiene segmentos; no se migrará de nuevo.")
+    with open(source_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"'{source_path}' no contiene un arreglo JSON de entradas.")
+    writer = RequestLogWriter(log_dir, start_flusher=False)
+    for start in range(0, len(data), batch_size):
+        for entry in data[start:start + batch_size]:
+            writer.append(entry)
+        writer.flush()
+    print(f"Migradas {len(data)} entradas de '{source_path}' a '{log_dir}'.")
+    return len(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilidades del log de solicitudes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Convierte request_log.json a segmentos JSONL.")
+    migrate.add_argument("--source", default="request_log.json")
+    migrate.add_argument("--log-dir", default="request_log")
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        migrate_json_log(args.source, args.log_dir)
+
+
+if __name__ == "__main__":
+    main()
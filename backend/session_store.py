@@ -0,0 +1,433 @@
+"""
+Almacén de sesiones de usuario con backends intercambiables (``SESSION_BACKEND``).
+
+- ``mysql``: tabla ``user_sessions`` (``SQLSessionBackend``; también funciona con
+  SQLite, lo que permite probarlo sin servidor).
+- ``memory``: diccionario en el proceso; las sesiones se pierden al reiniciar y
+  no se comparten entre workers. Útil en desarrollo y pruebas.
+- ``redis``: un hash por sesión con expiración nativa (``RedisSessionBackend``);
+  admite cualquier cliente compatible, p. ej. ``fakeredis`` en pruebas.
+
+``SessionStore`` reduce cada mensaje a como mucho una lectura y una escritura:
+
+- ``get`` puede leer de una caché en memoria (write-through, ``cache_ttl_seconds``);
+  sin caché, o si la sesión no está o caducó, va al backend.
+- ``save`` hace una única escritura (upsert) y actualiza la caché.
+- La actividad de las sesiones leídas se registra en segundo plano, por lotes,
+  cada ``touch_interval`` segundos. Los hilos de fondo se arrancan con el primer
+  uso en cada proceso (también en un worker creado con fork).
+
+Cada sesión caduca tras ``idle_ttl_seconds`` sin actividad, o tras
+``pending_ttl_seconds`` si quedó a medio verificar (``awaiting_code``). En Redis
+la expiración es la del propio servidor; en los demás backends un barrido cada
+``sweep_interval`` segundos borra las sesiones caducadas.
+
+La caché es por proceso y está desactivada por defecto (``cache_ttl_seconds=0``):
+con varios workers, el paso de la cédula al código de verificación puede llegar a
+otro worker, que serviría una sesión de hasta ``cache_ttl_seconds`` de antigüedad.
+Solo conviene activarla con un único proceso.
+"""
+import atexit
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Boolean, Column, DateTime, String, and_, delete, or_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+_stores = weakref.WeakSet()
+
+# Definición del modelo de la tabla para las sesiones
+class UserSession(Base):
+    __tablename__ = 'user_sessions'
+    sender_id = Column(String(255), primary_key=True)
+    employee_id = Column(String(255), nullable=True)
+    is_verified = Column(Boolean, default=False)
+    last_active = Column(DateTime, default=datetime.utcnow)
+    awaiting_code = Column(Boolean, default=False)
+    provided_cedula = Column(String(255), nullable=True)
+
+
+def empty_session():
+    return {'employee_id': None, 'verified': False, 'awaiting_code': False, 'provided_cedula': None}
+
+
+def is_pending(data):
+    """Sesión a medio verificar: se dio la cédula y falta el código de empleado."""
+    return bool(data.get('awaiting_code')) and not data.get('verified')
+
+
+class SQLSessionBackend:
+    """Sesiones en la tabla ``user_sessions`` (MySQL en producción)."""
+
+    name = "mysql"
+    TOUCH_BATCH_SIZE = 500
+
+    def __init__(self, engine):
+        self.engine = engine
+        Base.metadata.create_all(engine)
+        dialects = {"mysql": mysql, "sqlite": sqlite, "postgresql": postgresql}
+        if engine.dialect.name not in dialects:
+            raise ValueError(f"Dialecto no soportado para las sesiones: {engine.dialect.name}")
+        self._insert = dialects[engine.dialect.name].insert
+
+    def _upsert(self, values):
+        statement = self._insert(UserSession.__table__).values(**values)
+        changes = {k: v for k, v in values.items() if k != 'sender_id'}
+        if self.engine.dialect.name == "mysql":
+            # INSERT ... ON DUPLICATE KEY UPDATE
+            return statement.on_duplicate_key_update(**changes)
+        return statement.on_conflict_do_update(index_elements=['sender_id'], set_=changes)
+
+    def load(self, sender_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                UserSession.__table__.select().where(UserSession.sender_id == sender_id)
+            ).mappings().first()
+        if not row:
+            return None
+        return {
+            'employee_id': row['employee_id'],
+            'verified': bool(row['is_verified']),
+            'awaiting_code': bool(row['awaiting_code']),
+            'provided_cedula': row['provided_cedula']
+        }
+
+    def save(self, sender_id, data, ttl_seconds):
+        # La caducidad se calcula a partir de last_active en el barrido
+        with self.engine.begin() as conn:
+            conn.execute(self._upsert({
+                'sender_id': sender_id,
+                'employee_id': data['employee_id'],
+                'is_verified': data['verified'],
+                'last_active': datetime.utcnow(),
+                'awaiting_code': data['awaiting_code'],
+                'provided_cedula': data['provided_cedula']
+            }))
+
+    def touch(self, ttls):
+        sender_ids = list(ttls)
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            for i in range(0, len(sender_ids), self.TOUCH_BATCH_SIZE):
+                conn.execute(
+                    update(UserSession.__table__)
+                    .where(UserSession.sender_id.in_(sender_ids[i:i + self.TOUCH_BATCH_SIZE]))
+                    .values(last_active=now)
+                )
+
+    def expire(self, idle_ttl_seconds, pending_ttl_seconds):
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            result = conn.execute(delete(UserSession.__table__).where(or_(
+                UserSession.last_active < now - timedelta(seconds=idle_ttl_seconds),
+                and_(UserSession.awaiting_code.is_(True), UserSession.is_verified.is_(False),
+                     UserSession.last_active < now - timedelta(seconds=pending_ttl_seconds))
+            )))
+        return result.rowcount
+
+    def close(self):
+        pass
+
+
+class MemorySessionBackend:
+    """Sesiones en un diccionario del proceso."""
+
+    name = "memory"
+
+    def __init__(self):
+        # sender_id -> (datos, instante de expiración)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sender_id):
+        with self._lock:
+            item = self._sessions.get(sender_id)
+        if item is None or item[1] <= time.monotonic():
+            return None
+        return dict(item[0])
+
+    def save(self, sender_id, data, ttl_seconds):
+        with self._lock:
+            self._sessions[sender_id] = (dict(data), time.monotonic() + ttl_seconds)
+
+    def touch(self, ttls):
+        now = time.monotonic()
+        with self._lock:
+            for sender_id, ttl_seconds in ttls.items():
+                item = self._sessions.get(sender_id)
+                if item is not None and item[1] > now:
+                    self._sessions[sender_id] = (item[0], now + ttl_seconds)
+
+    def expire(self, idle_ttl_seconds, pending_ttl_seconds):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sender_id for sender_id, (_, expires_at) in self._sessions.items() if expires_at <= now]
+            for sender_id in expired:
+                del self._sessions[sender_id]
+        return len(expired)
+
+    def close(self):
+        pass
+
+
+class RedisSessionBackend:
+    """
+    Un hash por sesión (``<prefijo><sender_id>``) con EXPIRE igual al TTL de la
+    sesión; Redis borra las sesiones caducadas sin necesidad de barrido.
+    """
+
+    name = "redis"
+    FIELDS = ('employee_id', 'provided_cedula')
+    FLAGS = ('verified', 'awaiting_code')
+
+    def __init__(self, client, prefix="session:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, sender_id):
+        return f"{self.prefix}{sender_id}"
+
+    def load(self, sender_id):
+        raw = self.client.hgetall(self._key(sender_id))
+        if not raw:
+            return None
+        raw = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+               for k, v in raw.items()}
+        data = empty_session()
+        for field in self.FIELDS:
+            data[field] = raw.get(field) or None
+        for flag in self.FLAGS:
+            data[flag] = raw.get(flag) == "1"
+        return data
+
+    def save(self, sender_id, data, ttl_seconds):
+        mapping = {field: "" if data[field] is None else str(data[field]) for field in self.FIELDS}
+        mapping.update({flag: "1" if data[flag] else "0" for flag in self.FLAGS})
+        key = self._key(sender_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, int(ttl_seconds))
+        pipe.execute()
+
+    def touch(self, ttls):
+        # EXPIRE no crea la clave si ya caducó
+        pipe = self.client.pipeline(transaction=False)
+        for sender_id, ttl_seconds in ttls.items():
+            pipe.expire(self._key(sender_id), int(ttl_seconds))
+        pipe.execute()
+
+    def expire(self, idle_ttl_seconds, pending_ttl_seconds):
+        return 0
+
+    def close(self):
+        self.client.close()
+
+
+def create_backend(name, engine=None, redis_url=None, redis_client=None):
+    """Crea el backend de sesiones ``mysql``, ``memory`` o ``redis``."""
+    if name in ("mysql", "sql"):
+        if engine is None:
+            raise ValueError("El backend de sesiones 'mysql' requiere un engine de SQLAlchemy.")
+        return SQLSessionBackend(engine)
+    if name == "memory":
+        return MemorySessionBackend()
+    if name == "redis":
+        if redis_client is None:
+            import redis  # Dependencia opcional, solo para SESSION_BACKEND=redis
+            redis_client = redis.Redis.from_url(redis_url or "redis://localhost:6379/0")
+        return RedisSessionBackend(redis_client)
+    raise ValueError(f"Backend de sesiones desconocido: {name}. Opciones: mysql, memory, redis")
+
+
+class SessionStore:
+    """Sesiones con caché write-through, actividad por lotes y expiración en segundo plano."""
+
+    def __init__(self, backend, cache_ttl_seconds=0, cache_size=10000, touch_interval=5.0,
+                 idle_ttl_seconds=30 * 24 * 60 * 60, pending_ttl_seconds=15 * 60, sweep_interval=300,
+                 start_background=True):
+        self.backend = backend
+        # La caché no debe devolver sesiones que el backend ya expiró
+        self.cache_ttl_seconds = min(cache_ttl_seconds, pending_ttl_seconds, idle_ttl_seconds)
+        self.cache_size = cache_size
+        self.touch_interval = touch_interval
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.pending_ttl_seconds = pending_ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.start_background = start_background
+        self._reset()
+        self.reads = 0
+        self.writes = 0
+        self.cache_hits = 0
+        self.touch_batches = 0
+        self.expired = 0
+        _stores.add(self)
+        if start_background:
+            atexit.register(self.close)
+
+    def _reset(self):
+        self._cache = OrderedDict()
+        # sender_id -> marca de la lectura del backend en curso; save la descarta para que
+        # una lectura que se cruzó con la escritura no devuelva a la caché la sesión anterior
+        self._loading = {}
+        # sender_id -> TTL de las sesiones leídas desde el último lote
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _start_background(self):
+        with self._lock:
+            if self._threads:
+                return
+            for target, name in ((self._run_toucher, "session-toucher"), (self._run_sweeper, "session-sweeper")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def ttl_for(self, data):
+        return self.pending_ttl_seconds if is_pending(data) else self.idle_ttl_seconds
+
+    def _cache_put_locked(self, sender_id, data):
+        self._cache[sender_id] = (dict(data), time.monotonic() + self.cache_ttl_seconds)
+        self._cache.move_to_end(sender_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, sender_id):
+        """Devuelve el estado de la sesión (una copia) y la marca como activa."""
+        if self.start_background and not self._threads:
+            self._start_background()
+        with self._lock:
+            item = self._cache.get(sender_id)
+            if item is not None and item[1] > time.monotonic():
+                self._cache.move_to_end(sender_id)
+                self.cache_hits += 1
+                self._touched[sender_id] = self.ttl_for(item[0])
+                return dict(item[0])
+            self.reads += 1
+            token = object()
+            if self.cache_ttl_seconds > 0:
+                self._loading[sender_id] = token
+        try:
+            data = self.backend.load(sender_id) or empty_session()
+        except Exception as e:
+            print(f"Error al leer la sesión ({self.backend.name}): {e}")
+            with self._lock:
+                if self._loading.get(sender_id) is token:
+                    del self._loading[sender_id]
+            return empty_session()
+        with self._lock:
+            self._touched[sender_id] = self.ttl_for(data)
+            if self._loading.get(sender_id) is token:
+                del self._loading[sender_id]
+                self._cache_put_locked(sender_id, data)
+        return dict(data)
+
+    def save(self, sender_id, employee_id, is_verified, awaiting_code=False, provided_cedula=None):
+        """Guarda o actualiza la sesión con una sola escritura y actualiza la caché."""
+        data = {
+            'employee_id': employee_id,
+            'verified': is_verified,
+            'awaiting_code': awaiting_code,
+            'provided_cedula': provided_cedula
+        }
+        if self.start_background and not self._threads:
+            self._start_background()
+        with self._lock:
+            self.writes += 1
+            # La escritura ya renueva la actividad de la sesión
+            self._touched.pop(sender_id, None)
+        try:
+            self.backend.save(sender_id, data, self.ttl_for(data))
+        except Exception as e:
+            print(f"Error al guardar la sesión ({self.backend.name}): {e}")
+            with self._lock:
+                self._cache.pop(sender_id, None)
+                self._loading.pop(sender_id, None)
+            return
+        with self._lock:
+            # Las lecturas en curso leyeron (quizá) la sesión anterior: no la guardarán en la caché
+            self._loading.pop(sender_id, None)
+            if self.cache_ttl_seconds > 0:
+                self._cache_put_locked(sender_id, data)
+
+    def _run_toucher(self):
+        while not self._stop.wait(self.touch_interval):
+            self.flush_touches()
+
+    def _run_sweeper(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def flush_touches(self):
+        """Renueva la actividad de las sesiones leídas desde el último lote."""
+        with self._lock:
+            ttls, self._touched = self._touched, {}
+        if not ttls:
+            return 0
+        try:
+            self.backend.touch(ttls)
+        except Exception as e:
+            print(f"Error al actualizar la actividad de las sesiones ({self.backend.name}): {e}")
+            return 0
+        with self._lock:
+            self.touch_batches += 1
+        return len(ttls)
+
+    def sweep(self):
+        """Borra las sesiones inactivas y las que quedaron a medio verificar."""
+        # Primero se guarda la actividad pendiente para no expirar sesiones que se acaban de usar
+        self.flush_touches()
+        try:
+            count = self.backend.expire(self.idle_ttl_seconds, self.pending_ttl_seconds)
+        except Exception as e:
+            print(f"Error al expirar sesiones ({self.backend.name}): {e}")
+            return 0
+        with self._lock:
+            self.expired += count
+        return count
+
+    def close(self):
+        """Detiene los hilos de fondo y escribe la actividad pendiente."""
+        self._stop.set()
+        for thread in self._threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=self.touch_interval * 2)
+        self.flush_touches()
+
+    def _after_fork(self):
+        # La actividad pendiente y la caché son del proceso padre
+        self._reset()
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.cache_hits + self.reads
+            return {
+                "backend": self.backend.name,
+                "reads": self.reads,
+                "writes": self.writes,
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+                "cached_sessions": len(self._cache),
+                "pending_touches": len(self._touched),
+                "touch_batches": self.touch_batches,
+                "expired": self.expired,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "pending_ttl_seconds": self.pending_ttl_seconds,
+            }
+
+
+def _reset_after_fork():
+    for store in list(_stores):
+        store._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,168 @@
+"""
+Trazas ligeras por etapa de las rutas de preguntas.
+
+``Tracer`` mide cuánto tarda cada etapa de ``/ask`` (búsqueda de la sesión,
+consultas a RRHH, enrutado por palabras clave, ``model.encode``,
+``index.search``, la llamada a OpenAI, ``log_request``…) en un ``Histogram``
+por etapa, la latencia total de cada pregunta por ruta y categoría, y
+contadores con etiquetas (p. ej. errores de servicios externos).
+
+Se usa como decorador (``@tracer.traced("etapa")``) o como bloque
+(``with tracer.span("etapa"):``). El coste está acotado:
+
+- Una etapa son dos lecturas de ``time.perf_counter`` y una observación en su
+  histograma (búsqueda binaria de la cubeta y un lock por histograma). No se
+  guardan trazas por pregunta: la memoria no crece con el tráfico.
+- Las combinaciones de etiquetas (series) están limitadas a ``max_series`` por
+  tabla; las que no caben se agrupan con la etiqueta ``other``.
+- Con ``enabled=False`` las etapas no miden nada y los decoradores llaman
+  directamente a la función.
+
+``benchmarks/bench_tracing.py`` mide el coste por etapa.
+"""
+import functools
+import threading
+import time
+
+from metrics import DEFAULT_BUCKETS_MS, Histogram
+
+OTHER_LABEL = "other"
+COUNTER_HELP = {
+    "stage_errors": "Etapas que terminaron con una excepción.",
+    "upstream_errors": "Errores de los servicios externos (OpenAI, SQL Server, bandeja de llamadas).",
+}
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_stage", "_histogram", "_start")
+
+    def __init__(self, tracer, stage, histogram):
+        self._tracer = tracer
+        self._stage = stage
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start)
+        if exc_type is not None:
+            self._tracer.count("stage_errors", stage=self._stage)
+        return False
+
+
+class Tracer:
+    """Histogramas de latencia por etapa y por ruta/categoría, y contadores con etiquetas."""
+
+    def __init__(self, enabled=True, max_series=200, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.enabled = enabled
+        self.max_series = max_series
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+        self._counters = {}
+        # Observaciones agrupadas en la serie 'other' por superar max_series
+        self.overflowed = 0
+
+    def _histogram(self, table, key, overflow_key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.get(key)
+                if histogram is None:
+                    if len(table) >= self.max_series:
+                        self.overflowed += 1
+                        key = overflow_key
+                    histogram = table.setdefault(key, Histogram(self.buckets_ms))
+        return histogram
+
+    def span(self, stage):
+        """Bloque ``with`` medido como la etapa ``stage``."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, self._histogram(self._stages, stage, OTHER_LABEL))
+
+    def traced(self, stage):
+        """Decorador: cada llamada a la función se mide como la etapa ``stage``."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                histogram = self._histogram(self._stages, stage, OTHER_LABEL)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.count("stage_errors", stage=stage)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def observe_request(self, route, category, seconds):
+        """Latencia total de una pregunta respondida por ``route`` con la categoría ``category``."""
+        if self.enabled:
+            self._histogram(self._requests, (route, category), (route, OTHER_LABEL)).observe(seconds)
+
+    def count(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._counters and len(self._counters) >= self.max_series:
+                self.overflowed += 1
+                key = (name, tuple((label, OTHER_LABEL) for label, _ in key[1]))
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def stages(self):
+        with self._lock:
+            return dict(self._stages)
+
+    def requests(self):
+        with self._lock:
+            return dict(self._requests)
+
+    def counters(self):
+        """[(nombre, etiquetas, valor)] de los contadores."""
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in self._counters.items()]
+
+    def write_prometheus(self, text):
+        """Añade las etapas, las preguntas y los contadores a un ``PrometheusText``."""
+        for stage, histogram in sorted(self.stages().items()):
+            text.histogram("stage_duration_seconds", "Duración de cada etapa de las preguntas.",
+                           histogram, stage=stage)
+        for (route, category), histogram in sorted(self.requests().items()):
+            text.histogram("request_duration_seconds", "Latencia total de las preguntas por ruta y categoría.",
+                           histogram, route=route, category=category)
+        for name, labels, value in sorted(self.counters(), key=lambda c: (c[0], sorted(c[1].items()))):
+            text.counter(f"{name}_total", COUNTER_HELP.get(name, f"Contador {name}."), value, **labels)
+
+    def as_dict(self):
+        counters = {}
+        for name, labels, value in self.counters():
+            label_text = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+            counters.setdefault(name, {})[label_text or "total"] = value
+        return {
+            "enabled": self.enabled,
+            "stages": {stage: histogram.as_dict() for stage, histogram in sorted(self.stages().items())},
+            "requests": {f"{route} {category}": histogram.as_dict()
+                         for (route, category), histogram in sorted(self.requests().items())},
+            "counters": counters,
+            "overflowed": self.overflowed,
+        }
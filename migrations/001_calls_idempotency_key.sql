@@ -0,0 +1,4 @@
+-- Idempotency key of calls scheduled through the chatbot's call outbox.
+-- Repeated deliveries of the same request are reported as duplicates instead of creating a second call.
+ALTER TABLE calls ADD COLUMN idempotency_key VARCHAR(64) NULL;
+ALTER TABLE calls ADD UNIQUE INDEX uq_calls_idempotency_key (idempotency_key);
@@ -0,0 +1,4 @@
+-- Composite index for the dashboard call statistics (web/call_stats.py).
+-- The date-range filter on created_at, the GROUP BY status and the resolution time
+-- (resolved_at) are all read from the index, without touching the table rows.
+CREATE INDEX idx_calls_created_status ON calls (created_at, status, resolved_at);
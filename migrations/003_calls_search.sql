@@ -0,0 +1,12 @@
+-- Call manager search (web/call_search.py).
+-- phone_digits holds the phone with digits only (models.normalize_phone), so phone searches
+-- are prefix lookups on an index instead of '%...%' scans over the formatted phone.
+ALTER TABLE calls ADD COLUMN phone_digits VARCHAR(50) NULL AFTER phone;
+UPDATE calls SET phone_digits = REGEXP_REPLACE(phone, '[^0-9]', '');
+UPDATE calls SET phone_digits = SUBSTRING(phone_digits, 2) WHERE LENGTH(phone_digits) = 11 AND phone_digits LIKE '1%';
+CREATE INDEX ix_calls_phone_digits ON calls (phone_digits);
+-- Text terms are matched with MATCH ... AGAINST on this index.
+CREATE FULLTEXT INDEX ft_calls_search ON calls (full_name, sender_id, phone, resolution);
+-- Keyset pagination on (created_at, id), with and without a status filter.
+CREATE INDEX idx_calls_created_id ON calls (created_at, id);
+CREATE INDEX idx_calls_status_created_id ON calls (status, created_at, id);
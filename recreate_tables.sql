@@ -13,12 +13,19 @@ CREATE TABLE calls (
     sender_id VARCHAR(200) NOT NULL,
     full_name VARCHAR(200) NOT NULL,
     phone VARCHAR(50) NOT NULL,
+    phone_digits VARCHAR(50),
     preferred_time VARCHAR(100) NOT NULL,
     status VARCHAR(50) DEFAULT 'Pending',
     resolution TEXT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    resolved_at DATETIME
+    resolved_at DATETIME,
+    idempotency_key VARCHAR(64) UNIQUE
 );
+CREATE INDEX idx_calls_created_status ON calls (created_at, status, resolved_at);
+CREATE INDEX idx_calls_created_id ON calls (created_at, id);
+CREATE INDEX idx_calls_status_created_id ON calls (status, created_at, id);
+CREATE INDEX ix_calls_phone_digits ON calls (phone_digits);
+CREATE FULLTEXT INDEX ft_calls_search ON calls (full_name, sender_id, phone, resolution);
 
 -- Table: user_sessions
 CREATE TABLE user_sessions (
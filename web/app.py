@@ -1,12 +1,15 @@
 import os
-import json
 from datetime import datetime, timedelta, timezone
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from database import db
 from models import User, Call
+from log_reader import search_log_index, category_counts_between
+from call_stats import call_stats, TTLCache
+from call_search import search_calls
+from live_events import EventBus, LogTailer, event_stream
 import re
-from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -19,7 +22,17 @@ app.config['DEBUG'] = False
 
 db.init_app(app)
 
-LOG_FILE = "../backend/request_log.json"
+LOG_INDEX_DB = "../backend/request_log.db"
+
+# Dashboard statistics are cached per filter window; the dashboard polls them
+stats_cache = TTLCache(ttl_seconds=int(os.getenv("STATS_CACHE_TTL_SECONDS", 15)))
+# Total matches of each call manager search, shared by all its pages
+call_count_cache = TTLCache(ttl_seconds=int(os.getenv("STATS_CACHE_TTL_SECONDS", 15)))
+
+# Live dashboard: deltas published by the write paths and streamed to the dashboards (server-sent events)
+live_bus = EventBus(replay_size=int(os.getenv("LIVE_REPLAY_SIZE", 1024)))
+log_tailer = LogTailer(live_bus, LOG_INDEX_DB, poll_seconds=float(os.getenv("LIVE_LOG_POLL_SECONDS", 2)))
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", 15))
 
 # Create a simple list of predefined users for demonstration
 PREDEFINED_USERS = {
@@ -43,7 +56,7 @@ def create_predefined_users():
 
 @app.before_request
 def require_login():
-    allowed_routes = ['login', 'static', 'api_schedule_call', 'dashboard_stats', 'get_stats']
+    allowed_routes = ['login', 'static', 'api_schedule_call', 'dashboard_stats', 'get_stats', 'dashboard_stream']
     if request.endpoint not in allowed_routes and 'logged_in' not in session:
         return redirect(url_for('login'))
     
@@ -87,38 +100,31 @@ def call_manager():
         # Filtros adicionales
         status_filter = request.args.get('status', 'all').lower()
 
-        # Obtener todas las llamadas
-        query = Call.query
+        # Paginación por cursor (id de la llamada) sobre (created_at, id)
+        before = request.args.get('before', type=int)
+        after = request.args.get('after', type=int)
+
+        status = status_filter.capitalize() if status_filter != 'all' else None
+        paginated_calls, count_query, has_prev, has_next = search_calls(
+            db.session, search_query, status, before=before, after=after, per_page=per_page
+        )
+        if not has_prev:
+            page = 1
 
-        # Filtrar por estado si no es 'all'
-        if status_filter != 'all':
-            query = query.filter_by(status=status_filter.capitalize())
-        
-        # Filtrar por término de búsqueda
-        if search_query:
-            # Importa 'or_' si no lo has hecho: from sqlalchemy import or_
-            query = query.filter(or_(
-                Call.full_name.ilike(f'%{search_query}%'),
-                Call.sender_id.ilike(f'%{search_query}%'),
-                Call.phone.ilike(f'%{search_query}%'),
-                Call.resolution.ilike(f'%{search_query}%')
-            ))
-
-        # Ordenar por fecha de creación de forma descendente y paginar
-        calls_pagination = query.order_by(Call.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        
         # Datos para el frontend
-        paginated_calls = calls_pagination.items
-        total_pages = calls_pagination.pages
-        total_items = calls_pagination.total
+        total_items = call_count_cache.get_or_compute((search_query, status), count_query.scalar)
+        total_pages = (total_items + per_page - 1) // per_page
 
     except Exception as e:
         print(f"Error al cargar las llamadas: {e}")
         paginated_calls = []
         total_pages = 0
         total_items = 0
+        has_prev = False
+        has_next = False
         search_query = ''
         status_filter = 'all'
+        page = 1
 
     return render_template(
         'call_manager.html',
@@ -126,6 +132,8 @@ def call_manager():
         page=page,
         total_pages=total_pages,
         total_items=total_items,
+        has_prev=has_prev,
+        has_next=has_next,
         search_query=search_query,
         status_filter=status_filter
     )
@@ -136,6 +144,7 @@ def update_call_status(call_id):
     new_status = request.form.get('status')
     resolution = request.form.get('resolution')
 
+    old_status = call.status
     call.status = new_status
     if new_status == 'Resolved' and not call.resolved_at:
         call.resolved_at = datetime.utcnow()
@@ -144,51 +153,49 @@ def update_call_status(call_id):
         call.resolution = resolution
     
     db.session.commit()
+    stats_cache.clear()
+    call_count_cache.clear()
+    if new_status != old_status:
+        resolution_seconds = None
+        if new_status == 'Resolved' and call.resolved_at:
+            resolution_seconds = (call.resolved_at - call.created_at).total_seconds()
+        live_bus.publish('call_status', {
+            'id': call.id,
+            'from': old_status,
+            'to': new_status,
+            'created_at': call.created_at.isoformat(),
+            'resolution_seconds': resolution_seconds
+        })
     return redirect(url_for('call_manager'))
     
 # --- Log Viewer Module ---
 @app.route('/logs')
 def log_viewer():
     try:
-        if not os.path.exists(LOG_FILE) or os.path.getsize(LOG_FILE) == 0:
-            logs = []
-        else:
-            with open(LOG_FILE, 'r') as f:
-                logs = json.load(f)
-
         # Parámetros de paginación y búsqueda
         page = request.args.get('page', 1, type=int)
         per_page = 20 # Número de registros por página
         search_query = request.args.get('q', '').lower()
 
-        # Filtrar los registros si hay una búsqueda
-        if search_query:
-            filtered_logs = [
-                log for log in logs
-                if search_query in log.get('sender_id', '').lower() or
-                    search_query in log.get('question', '').lower() or
-                    search_query in log.get('answer', '').lower() or
-                    search_query in log.get('category', '').lower()
-            ]
-        else:
-            filtered_logs = logs
-
-        # Ordenar los registros por fecha de forma descendente
-        filtered_logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # Paginación por cursor (id del registro) sobre el índice del log
+        before = request.args.get('before', type=int)
+        after = request.args.get('after', type=int)
 
-        # Calcular los índices para la paginación
-        total_items = len(filtered_logs)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_logs = filtered_logs[start:end]
+        paginated_logs, total_items, has_prev, has_next = search_log_index(
+            LOG_INDEX_DB, search_query, before=before, after=after, per_page=per_page
+        )
+        if not has_prev:
+            page = 1
         
         # Datos para el frontend
         total_pages = (total_items + per_page - 1) // per_page
         
-    except (json.JSONDecodeError, FileNotFoundError):
+    except (ValueError, FileNotFoundError):
         paginated_logs = []
         total_items = 0
         total_pages = 0
+        has_prev = False
+        has_next = False
         search_query = ''
         page = 1
 
@@ -198,6 +205,8 @@ def log_viewer():
         page=page,
         total_pages=total_pages,
         total_items=total_items,
+        has_prev=has_prev,
+        has_next=has_next,
         search_query=search_query
     )
 
@@ -211,13 +220,27 @@ def dashboard_stats():
 def whatsapp_link():
     return render_template('whatsapp_link.html')
 
+@app.route('/dashboard/stream')
+def dashboard_stream():
+    """Server-sent events with the deltas to apply to the dashboard statistics."""
+    subscription = live_bus.subscribe(request.headers.get('Last-Event-ID'))
+    return Response(
+        event_stream(subscription, keepalive_seconds=LIVE_KEEPALIVE_SECONDS),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/dashboard/statsdata', methods=['GET'])
 def get_stats():
     # Get filter parameters from the request
     filter_type = request.args.get('filter', 'daily')
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
+    key = (filter_type, start_date_str, end_date_str) if filter_type == 'custom' else (filter_type,)
+    return jsonify(stats_cache.get_or_compute(key, lambda: compute_stats(filter_type, start_date_str, end_date_str)))
 
+def compute_stats(filter_type, start_date_str, end_date_str):
+    """Dashboard statistics for a filter window, computed without the cache."""
     start_date = None
     end_date = None
 
@@ -237,34 +260,12 @@ def get_stats():
     # Print dates to help with debugging
     print(f"Filtering logs from {start_date} to {end_date}")
 
-    # 1. Calls data
-    call_query = db.session.query(Call)
-    if start_date and end_date:
-        call_query = call_query.filter(Call.created_at.between(start_date, end_date))
-    
-    calls = call_query.all()
-    
-    call_status_counts = {
-        'Pending': 0,
-        'In Progress': 0,
-        'Resolved': 0
-    }
-    for call in calls:
-        if call.status in call_status_counts:
-            call_status_counts[call.status] += 1
+    # 1. Calls data: counts per status and average resolution time, aggregated by the database
+    call_status_counts, total_calls, avg_resolution_time = call_stats(db.session, start_date, end_date)
     
     # 2. Logs data
-    try:
-        if not os.path.exists(LOG_FILE) or os.path.getsize(LOG_FILE) == 0:
-            logs = []
-        else:
-            with open(LOG_FILE, 'r') as f:
-                logs = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        logs = []
-    
-    # Filter logs by date range if provided
-    filtered_logs = []
+    # Category counts for the date range come from the backend's hourly/daily rollups
+    log_category_counts = {}
     if start_date and end_date:
         # Check if start_date has timezone info, if not, assume UTC for comparison
         if start_date.tzinfo is None:
@@ -275,37 +276,9 @@ def get_stats():
         else:
             aware_start_date = start_date
             aware_end_date = end_date
-        
-        for log in logs:
-            if 'timestamp' in log:
-                try:
-                    # FIX: Use datetime.fromisoformat() to handle the full timestamp
-                    log_timestamp = datetime.fromisoformat(log['timestamp'])
-                    
-                    # Check if the log's timestamp falls within the specified range
-                    if aware_start_date <= log_timestamp < aware_end_date:
-                        filtered_logs.append(log)
-                except ValueError:
-                    # Skips logs with a bad timestamp format, but prints a message for debugging
-                    print(f"Skipping log with invalid timestamp format: {log.get('timestamp')}")
-                    continue
-    
-    # Aggregate log data
-    log_category_counts = {}
-    for log in filtered_logs:
-        category = log.get('category', 'unknown')
-        if category in log_category_counts:
-            log_category_counts[category] += 1
-        else:
-            log_category_counts[category] = 1
-
-    # Additional metric: average resolution time for calls
-    resolved_calls = [call for call in calls if call.status == 'Resolved' and call.resolved_at]
-    total_resolution_time = sum([
-        (call.resolved_at - call.created_at).total_seconds()
-        for call in resolved_calls
-    ])
-    avg_resolution_time = total_resolution_time / len(resolved_calls) if resolved_calls else 0
+
+        log_category_counts = category_counts_between(LOG_INDEX_DB, aware_start_date, aware_end_date)
+    total_logs = sum(log_category_counts.values())
     
     # Prepare data for charts
     stats = {
@@ -313,35 +286,79 @@ def get_stats():
         'call_status_labels': list(call_status_counts.keys()),
         'log_category_data': list(log_category_counts.values()),
         'log_category_labels': list(log_category_counts.keys()),
-        'total_calls': len(calls),
-        'total_logs': len(filtered_logs),
-        'avg_resolution_time_seconds': avg_resolution_time
+        'total_calls': total_calls,
+        'total_logs': total_logs,
+        'avg_resolution_time_seconds': avg_resolution_time,
+        # Live events are applied only if they fall in this window
+        'window_start': start_date.isoformat() if start_date else None,
+        'window_end': end_date.isoformat() if end_date else None
     }
 
-    return jsonify(stats)
+    return stats
 
 # --- API Endpoint for the Chatbot ---
+CALL_FIELDS = ('full_name', 'phone', 'preferred_time')
+MAX_BULK_CALLS = 500
+
+def schedule_calls(items, retry_conflicts=True):
+    """
+    Creates the calls in one transaction and returns a result per item:
+    'created', 'duplicate' (its idempotency_key was already scheduled) or 'invalid'.
+    """
+    keys = [item.get('idempotency_key') for item in items if item.get('idempotency_key')]
+    existing = set()
+    if keys:
+        existing = {key for (key,) in db.session.query(Call.idempotency_key).filter(Call.idempotency_key.in_(keys))}
+
+    results = []
+    created = 0
+    for item in items:
+        key = item.get('idempotency_key')
+        if not all(item.get(field) for field in CALL_FIELDS):
+            results.append({'idempotency_key': key, 'status': 'invalid', 'message': 'Missing required fields'})
+            continue
+        if key and key in existing:
+            results.append({'idempotency_key': key, 'status': 'duplicate'})
+            continue
+        db.session.add(Call(
+            sender_id=item.get('sender', 'unknown'),
+            full_name=item['full_name'],
+            phone=item['phone'],
+            preferred_time=item['preferred_time'],
+            idempotency_key=key
+        ))
+        if key:
+            existing.add(key)
+        created += 1
+        results.append({'idempotency_key': key, 'status': 'created'})
+    try:
+        db.session.commit()
+        stats_cache.clear()
+        call_count_cache.clear()
+    except IntegrityError:
+        # Another delivery of the same batch committed first: check the keys again
+        db.session.rollback()
+        if not retry_conflicts:
+            raise
+        return schedule_calls(items, retry_conflicts=False)
+    if created:
+        live_bus.publish('calls_created', {'count': created, 'created_at': datetime.utcnow().isoformat()})
+    return results
+
 @app.route('/api/schedule_call', methods=['POST'])
 def api_schedule_call():
-    data = request.json
-    sender_id = data.get('sender', 'unknown')
-    full_name = data.get('full_name')
-    phone = data.get('phone')
-    preferred_time = data.get('preferred_time')
-
-    if not all([full_name, phone, preferred_time]):
-        return jsonify({'message': 'Missing required fields'}), 400
-
-    new_call = Call(
-        sender_id=sender_id,
-        full_name=full_name,
-        phone=phone,
-        preferred_time=preferred_time
-    )
-    db.session.add(new_call)
-    db.session.commit()
-    
-    return jsonify({'message': 'Call scheduled successfully'}), 201
+    """Accepts one call, or a batch as {"calls": [...]} from the chatbot's call outbox."""
+    data = request.get_json(silent=True) or {}
+    if 'calls' not in data:
+        result = schedule_calls([data])[0]
+        if result['status'] == 'invalid':
+            return jsonify({'message': result['message']}), 400
+        return jsonify({'message': 'Call scheduled successfully'}), 201
+
+    calls = data['calls']
+    if not isinstance(calls, list) or len(calls) > MAX_BULK_CALLS:
+        return jsonify({'message': f'calls must be a list of at most {MAX_BULK_CALLS} items'}), 400
+    return jsonify({'results': schedule_calls(calls)}), 200
 
 if __name__ == '__main__':
     with app.app_context():
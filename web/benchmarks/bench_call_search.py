@@ -0,0 +1,179 @@
+"""
+Benchmark of the call manager search and pagination (``/calls``).
+
+Seeds a ``calls`` table with ``--rows`` calls and times one page of results for
+several searches, on the first page and ``--deep-page`` pages in:
+
+- ``ilike``: the previous implementation, ``ILIKE '%q%'`` over four columns,
+  ordered by ``created_at`` and paginated with OFFSET (``paginate``, which also
+  counts the matches).
+- ``search``: ``search_calls`` (full-text index, ``phone_digits``, keyset
+  pagination on ``(created_at, id)``) plus the count of matches.
+- ``search (cached count)``: the page alone, as served while the count of the
+  search is in the cache.
+
+Deep pages of ``search`` start from the cursor (last call) of the previous page,
+like the links of the call manager. By default it uses a SQLite file (with the FTS5 table
+of the full-text search); pass ``--db-uri`` to run it on a MariaDB/MySQL
+database (the ``calls`` table there is dropped and recreated).
+
+    cd web
+    python benchmarks/bench_call_search.py --rows 500000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import or_, text  # noqa: E402
+
+from call_search import search_calls, search_filter  # noqa: E402
+from database import db  # noqa: E402
+from models import Call, normalize_phone  # noqa: E402
+
+FIRST_NAMES = ('Juan', 'María', 'José', 'Ana', 'Luis', 'Carmen', 'Pedro', 'Rosa', 'Miguel', 'Laura',
+               'Carlos', 'Elena', 'Rafael', 'Julia', 'Francisco', 'Isabel', 'Manuel', 'Lucía', 'Ramón', 'Teresa')
+LAST_NAMES = ('Pérez', 'Rodríguez', 'Gómez', 'Martínez', 'Fernández', 'López', 'Díaz', 'Sánchez', 'Ramírez',
+              'Torres', 'Reyes', 'Cruz', 'Morales', 'Ortiz', 'Castillo', 'Jiménez', 'Vargas', 'Rojas', 'Núñez', 'Peña')
+RESOLUTIONS = ('Clave reiniciada', 'Tarjeta bloqueada por robo', 'Se explicó el proceso de vacaciones',
+               'Nómina corregida', 'Acceso al portal restablecido')
+STATUSES = ('Pending', 'In Progress', 'Resolved', 'Resolved', 'Resolved')
+PER_PAGE = 20
+
+
+def legacy_page(session, search_query, status, page):
+    """Frozen copy of the previous call_manager query."""
+    query = session.query(Call)
+    if status:
+        query = query.filter_by(status=status)
+    if search_query:
+        query = query.filter(or_(
+            Call.full_name.ilike(f'%{search_query}%'),
+            Call.sender_id.ilike(f'%{search_query}%'),
+            Call.phone.ilike(f'%{search_query}%'),
+            Call.resolution.ilike(f'%{search_query}%')
+        ))
+    pagination = query.order_by(Call.created_at.desc()).paginate(page=page, per_page=PER_PAGE, error_out=False)
+    return pagination.items, pagination.total
+
+
+def seed(rows, now, batch_size=50000, seed_value=0):
+    rng = random.Random(seed_value)
+    start = now - timedelta(days=365)
+    phones = []
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            phone = f'{rng.choice(("809", "829", "849"))}-{rng.randrange(200, 1000)}-{rng.randrange(10000):04d}'
+            status = rng.choice(STATUSES)
+            batch.append({
+                'sender_id': f'1{normalize_phone(phone)}@c.us',
+                'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}',
+                'phone': phone,
+                'phone_digits': normalize_phone(phone),
+                'preferred_time': 'Lo antes posible',
+                'status': status,
+                'resolution': rng.choice(RESOLUTIONS) if status == 'Resolved' else None,
+                'created_at': start + timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+            })
+            if i % 1000 == 0:
+                phones.append(phone)
+        db.session.execute(Call.__table__.insert(), batch)
+        db.session.commit()
+    return phones
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expire_all()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def search_cursor(search_query, status, page):
+    """Id of the last call of page - 1, as in the call manager's 'next' link on that page."""
+    query = db.session.query(Call.id)
+    condition = search_filter(db.session, search_query)
+    if condition is not None:
+        query = query.filter(condition)
+    if status:
+        query = query.filter(Call.status == status)
+    return query.order_by(Call.created_at.desc(), Call.id.desc()).offset((page - 1) * PER_PAGE - 1).limit(1).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--deep-page", type=int, default=2000)
+    parser.add_argument("--db-uri", default=None, help="Database to use (default: a temporary SQLite file)")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.db_uri is None:
+        tmp = tempfile.mkdtemp(prefix="bench_call_search_")
+        args.db_uri = f"sqlite:///{os.path.join(tmp, 'calls.db')}"
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.db_uri
+    db.init_app(app)
+
+    with app.app_context():
+        Call.__table__.drop(db.engine, checkfirst=True)
+        Call.__table__.create(db.engine)
+        start = time.perf_counter()
+        phones = seed(args.rows, datetime.now().replace(microsecond=0))
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text("ANALYZE"))
+        print(f"{args.rows} calls seeded in {time.perf_counter() - start:.1f} s ({db.engine.dialect.name})\n")
+
+        phone = phones[len(phones) // 2]
+        searches = [
+            ("(none)", '', None),
+            ("(none), pending", '', 'Pending'),
+            ("name", 'rodríguez', None),
+            ("two names", 'ana peña', None),
+            ("resolution", 'bloqueada', None),
+            ("phone digits", normalize_phone(phone), None),
+            ("phone as typed", phone[4:], None),
+        ]
+        print(f"{'search':<16} {'page':>5} {'matches':>8} {'ilike ms':>10} {'search ms':>10} {'cached count ms':>16}")
+        for name, search_query, status in searches:
+            for page in (1, args.deep_page):
+                legacy_ms, (_, legacy_total) = timed(lambda: legacy_page(db.session, search_query, status, page), 1)
+                before = search_cursor(search_query, status, page) if page > 1 else None
+                if page > 1 and before is None:
+                    continue
+
+                def page_and_count():
+                    calls, count_query, _, _ = search_calls(db.session, search_query, status, before=before,
+                                                            per_page=PER_PAGE)
+                    return calls, count_query.scalar()
+
+                search_ms, (_, total) = timed(page_and_count, args.repeat)
+                cached_ms, _ = timed(lambda: search_calls(db.session, search_query, status, before=before,
+                                                          per_page=PER_PAGE), args.repeat)
+                matches = total if total == legacy_total else f"{total}/{legacy_total}"
+                print(f"{name:<16} {page:>5} {matches:>8} {legacy_ms:>10.1f} {search_ms:>10.1f} {cached_ms:>16.1f}")
+        print("\nmatches: 'new/previous' when they differ (full-text terms match whole words by prefix, "
+              "ILIKE matches any substring)")
+        db.session.remove()
+        if tmp is not None:
+            db.engine.dispose()
+    if tmp is not None:
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark of the dashboard call statistics (``/dashboard/statsdata``).
+
+Seeds a ``calls`` table with ``--rows`` calls spread over a year and times, for
+the daily, weekly, monthly and yearly windows:
+
+- ``orm``: the previous implementation, ``Call`` objects loaded with ``.all()``
+  and counted in Python.
+- ``sql``: ``call_stats`` (grouped COUNT/AVG) without ``idx_calls_created_status``.
+- ``sql+idx``: ``call_stats`` with the index.
+
+Both implementations must return the same numbers; the benchmark stops if they
+do not. By default it uses a SQLite file; pass ``--db-uri`` to run it on a
+MariaDB/MySQL database (the ``calls`` table there is dropped and recreated).
+
+    cd web
+    python benchmarks/bench_call_stats.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from call_stats import call_stats  # noqa: E402
+from database import db  # noqa: E402
+from models import Call  # noqa: E402
+
+STATUSES = ('Pending', 'In Progress', 'Resolved', 'Resolved', 'Resolved')
+INDEX_NAME = 'idx_calls_created_status'
+
+
+def legacy_stats(session, start_date, end_date):
+    """Frozen copy of the previous get_stats loop."""
+    call_query = session.query(Call)
+    if start_date and end_date:
+        call_query = call_query.filter(Call.created_at.between(start_date, end_date))
+    calls = call_query.all()
+    call_status_counts = {'Pending': 0, 'In Progress': 0, 'Resolved': 0}
+    for call in calls:
+        if call.status in call_status_counts:
+            call_status_counts[call.status] += 1
+    resolved_calls = [call for call in calls if call.status == 'Resolved' and call.resolved_at]
+    total_resolution_time = sum([(call.resolved_at - call.created_at).total_seconds() for call in resolved_calls])
+    avg_resolution_time = total_resolution_time / len(resolved_calls) if resolved_calls else 0
+    return call_status_counts, len(calls), avg_resolution_time
+
+
+def seed(rows, now, batch_size=50000, seed_value=0):
+    rng = random.Random(seed_value)
+    start = now - timedelta(days=365)
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            created_at = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            status = rng.choice(STATUSES)
+            batch.append({
+                'sender_id': f'1809555{i % 10000:04d}@c.us',
+                'full_name': f'Empleado {i}',
+                'phone': f'809-555-{i % 10000:04d}',
+                'preferred_time': 'Lo antes posible',
+                'status': status,
+                'created_at': created_at,
+                # Whole seconds, so that TIMESTAMPDIFF(SECOND) matches the Python average exactly
+                'resolved_at': created_at + timedelta(seconds=rng.randrange(60, 72 * 3600)) if status == 'Resolved' else None,
+            })
+        db.session.execute(Call.__table__.insert(), batch)
+        db.session.commit()
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expire_all()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def same_stats(a, b):
+    return a[0] == b[0] and a[1] == b[1] and abs(a[2] - b[2]) <= 1e-6 * max(1.0, abs(a[2]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db-uri", default=None, help="Database to use (default: a temporary SQLite file)")
+    parser.add_argument("--skip-orm", action="store_true", help="Skip the previous implementation (slow)")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.db_uri is None:
+        tmp = tempfile.mkdtemp(prefix="bench_call_stats_")
+        args.db_uri = f"sqlite:///{os.path.join(tmp, 'calls.db')}"
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.db_uri
+    db.init_app(app)
+
+    now = datetime.now().replace(microsecond=0)
+    windows = [
+        ("daily", now.replace(hour=0, minute=0, second=0), now.replace(hour=0, minute=0, second=0) + timedelta(days=1)),
+        ("weekly", now - timedelta(days=6), now + timedelta(days=1)),
+        ("monthly", now - timedelta(days=29), now + timedelta(days=1)),
+        ("yearly", now - timedelta(days=365), now + timedelta(days=1)),
+    ]
+    with app.app_context():
+        Call.__table__.drop(db.engine, checkfirst=True)
+        Call.__table__.create(db.engine)
+        start = time.perf_counter()
+        seed(args.rows, now)
+        print(f"{args.rows} calls seeded in {time.perf_counter() - start:.1f} s ({db.engine.dialect.name})\n")
+
+        index = next(index for index in Call.__table__.indexes if index.name == INDEX_NAME)
+        index.drop(db.engine)
+        print(f"{'window':<8} {'calls':>9} {'orm ms':>10} {'sql ms':>10} {'sql+idx ms':>11}")
+        results = {}
+        for name, start_date, end_date in windows:
+            legacy_ms = None
+            if not args.skip_orm:
+                legacy_ms, legacy = timed(lambda: legacy_stats(db.session, start_date, end_date), 1)
+                results[name] = legacy
+            sql_ms, stats = timed(lambda: call_stats(db.session, start_date, end_date), args.repeat)
+            if name in results and not same_stats(results[name], stats):
+                sys.exit(f"Different results for {name}: {results[name]} != {stats}")
+            results[name] = (legacy_ms, sql_ms, stats)
+
+        index.create(db.engine)
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text("ANALYZE"))
+        for name, start_date, end_date in windows:
+            legacy_ms, sql_ms, stats = results[name]
+            indexed_ms, indexed = timed(lambda: call_stats(db.session, start_date, end_date), args.repeat)
+            if not same_stats(stats, indexed):
+                sys.exit(f"Different results for {name} with the index: {stats} != {indexed}")
+            legacy = f"{legacy_ms:.1f}" if legacy_ms is not None else "-"
+            print(f"{name:<8} {stats[1]:>9} {legacy:>10} {sql_ms:>10.1f} {indexed_ms:>11.1f}")
+        db.session.remove()
+        if tmp is not None:
+            db.engine.dispose()
+    if tmp is not None:
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
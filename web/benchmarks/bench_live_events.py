@@ -0,0 +1,113 @@
+"""
+Benchmark of the live dashboard event bus (``/dashboard/stream``).
+
+Connects ``--subscribers`` dashboards to an ``EventBus``, each one read by its
+own thread through ``event_stream`` (as the portal serves them), publishes
+``--events`` call status events at ``--rate`` events per second and reports:
+
+- the time ``publish`` takes in the request that changes a call (it fans the
+  event out to every dashboard without waiting for them),
+- the latency until each dashboard has the formatted SSE message,
+- events dropped by dashboards that fell behind (they get a 'resync').
+
+Compare with ``bench_call_stats.py``: without the stream, keeping a dashboard
+up to date means recomputing the statistics for every refresh of every agent.
+
+    cd web
+    python benchmarks/bench_live_events.py --subscribers 200 --rate 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_events import EventBus, event_stream  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=50, help="Events per second (0: as fast as possible)")
+    parser.add_argument("--replay-size", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    bus = EventBus(replay_size=args.replay_size)
+    published_at = {}
+    latencies = []
+    resyncs = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def dashboard():
+        subscription = bus.subscribe()
+        stream = event_stream(subscription, keepalive_seconds=0.2)
+        next(stream)
+        received = []
+        for chunk in stream:
+            received.append((time.perf_counter(), chunk))
+            if subscription.position >= args.events or done.is_set():
+                break
+        stream.close()
+        with lock:
+            for now, chunk in received:
+                for message in chunk.split("\n\n"):
+                    if not message.startswith("id: "):
+                        continue
+                    if "event: resync" in message:
+                        resyncs[0] += 1
+                        continue
+                    event_id = int(message.split("\n", 1)[0].rsplit("-", 1)[1])
+                    latencies.append(now - published_at[event_id])
+
+    threads = [threading.Thread(target=dashboard, daemon=True) for _ in range(args.subscribers)]
+    for thread in threads:
+        thread.start()
+    while bus.subscriber_count() < args.subscribers:
+        time.sleep(0.01)
+
+    publish_times = []
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    start = time.perf_counter()
+    for i in range(args.events):
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        event_id = bus.publish('call_status', {
+            'id': i, 'from': 'Pending', 'to': 'Resolved',
+            'created_at': '2026-01-01T00:00:00', 'resolution_seconds': 60.0
+        })[0]
+        published_at[event_id] = t0
+        publish_times.append(time.perf_counter() - t0)
+    for thread in threads:
+        thread.join(timeout=max(0.0, start + args.events * interval + 30 - time.perf_counter()))
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    expected = args.events * args.subscribers
+    print(f"{args.subscribers} dashboards, {args.events} events at "
+          f"{'max' if not args.rate else f'{args.rate:g}/s'}\n")
+    print(f"publish:    mean {statistics.mean(publish_times) * 1e6:.1f} us, "
+          f"p99 {percentile(publish_times, 0.99) * 1e6:.1f} us")
+    print(f"delivered:  {len(latencies)}/{expected} "
+          f"(dropped {expected - len(latencies)}, resyncs {resyncs[0]})")
+    if latencies:
+        print(f"latency:    p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+    print(f"bus:        {bus.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
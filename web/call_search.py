@@ -0,0 +1,120 @@
+import os
+import re
+
+from sqlalchemy import and_, func, or_, text
+
+from models import Call, normalize_phone
+
+# Search and keyset pagination for the call manager.
+#
+# - Text terms use the full-text index over full_name, sender_id, phone and resolution:
+#   a FULLTEXT index on MariaDB/MySQL, an FTS5 table kept in sync by triggers on SQLite.
+#   Each term matches words starting with it ("jua" finds "Juan").
+# - On MariaDB/MySQL, InnoDB does not index words shorter than innodb_ft_min_token_size
+#   (FULLTEXT_MIN_TOKEN_SIZE here) nor its default stopwords ("de", "la", ...), so those
+#   terms are not required ("de la Cruz" searches "cruz"). A query made only of such
+#   terms matches names starting with it instead ("Al", "de la").
+# - Queries made only of digits (and phone punctuation) also match the start of the
+#   indexed phone_digits column, so "8095550012" finds "809-555-0012".
+# - Pages are ordered by (created_at, id), newest first, and continue from the
+#   first/last call of the current page instead of using OFFSET.
+
+PHONE_QUERY = re.compile(r'^[\d\s()+.-]+$')
+MIN_PHONE_DIGITS = 3
+_FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+FULLTEXT_MIN_TOKEN_SIZE = int(os.getenv("FULLTEXT_MIN_TOKEN_SIZE", 3))
+# INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD
+INNODB_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in',
+    'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+    'will', 'with', 'und', 'www',
+))
+
+
+def _fts5_query(terms):
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _boolean_mode_query(terms):
+    return " ".join(f'+{term}*' for term in terms)
+
+
+def search_terms(search_query):
+    """Words of the query, without the full-text operator characters."""
+    return _FULLTEXT_OPERATORS.sub(' ', search_query).split()
+
+
+def indexed_terms(terms):
+    """Terms the InnoDB full-text index can find (long enough and not stopwords)."""
+    return [term for term in terms if len(term) >= FULLTEXT_MIN_TOKEN_SIZE and term.lower() not in INNODB_STOPWORDS]
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _fulltext_filter(session, terms):
+    if session.get_bind().dialect.name == 'sqlite':
+        return Call.id.in_(
+            text("SELECT rowid FROM calls_fts WHERE calls_fts MATCH :fts").bindparams(fts=_fts5_query(terms))
+        )
+    indexed = indexed_terms(terms)
+    if not indexed:
+        return Call.full_name.like(f"{_escape_like(' '.join(terms))}%", escape='\\')
+    return text(
+        "MATCH (calls.full_name, calls.sender_id, calls.phone, calls.resolution) AGAINST (:fts IN BOOLEAN MODE)"
+    ).bindparams(fts=_boolean_mode_query(indexed))
+
+
+def search_filter(session, search_query):
+    """SQL condition for the search box, or None when there is nothing to search."""
+    terms = search_terms(search_query)
+    if not terms:
+        return None
+    condition = _fulltext_filter(session, terms)
+    if PHONE_QUERY.match(search_query):
+        digits = normalize_phone(search_query)
+        if len(digits) >= MIN_PHONE_DIGITS:
+            # Whole number from the start, or its groups as typed ("555-0012")
+            # ':' sorts right after '9': a range on the index instead of LIKE (case-insensitive on SQLite)
+            return or_(and_(Call.phone_digits >= digits, Call.phone_digits < f"{digits}:"), condition)
+    return condition
+
+
+def search_calls(session, search_query='', status=None, before=None, after=None, per_page=20):
+    """
+    Keyset-paginated calls matching the search and status, newest first.
+    before/after are the ids of the last/first call of the current page.
+    Returns (calls, query for the total count, has_prev, has_next).
+    """
+    conditions = []
+    condition = search_filter(session, search_query)
+    if condition is not None:
+        conditions.append(condition)
+    if status:
+        conditions.append(Call.status == status)
+    query = session.query(Call).filter(*conditions)
+
+    cursor_id = after if after is not None else before
+    cursor = session.query(Call.created_at).filter(Call.id == cursor_id).scalar() if cursor_id is not None else None
+    if after is not None and cursor is not None:
+        query = query.filter(Call.created_at >= cursor,
+                             or_(Call.created_at > cursor, and_(Call.created_at == cursor, Call.id > after)))
+        query = query.order_by(Call.created_at.asc(), Call.id.asc())
+    else:
+        if before is not None and cursor is not None:
+            # The redundant bound on created_at alone makes it an index range on every database
+            query = query.filter(Call.created_at <= cursor,
+                                 or_(Call.created_at < cursor, and_(Call.created_at == cursor, Call.id < before)))
+        query = query.order_by(Call.created_at.desc(), Call.id.desc())
+
+    calls = query.limit(per_page + 1).all()
+    has_more = len(calls) > per_page
+    calls = calls[:per_page]
+    if after is not None and cursor is not None:
+        calls.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = before is not None and cursor is not None, has_more
+    count_query = session.query(func.count()).select_from(Call).filter(*conditions)
+    return calls, count_query, has_prev, has_next
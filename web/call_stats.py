@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import case, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Float
+
+from models import Call
+
+# Call metrics for the statistics dashboard, aggregated by the database.
+# The query is answered from idx_calls_created_status (created_at, status, resolved_at)
+# without reading the table rows.
+
+CALL_STATUSES = ('Pending', 'In Progress', 'Resolved')
+
+
+class seconds_between(FunctionElement):
+    """Seconds from the first datetime expression to the second."""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(seconds_between)
+def _seconds_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"TIMESTAMPDIFF(SECOND, {compiler.process(start, **kw)}, {compiler.process(end, **kw)})"
+
+
+@compiles(seconds_between, 'sqlite')
+def _seconds_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"((julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)})) * 86400.0)"
+
+
+def call_stats(session, start_date=None, end_date=None):
+    """
+    Counts of calls per status and average resolution time (seconds) of the resolved
+    calls created between start_date and end_date, in one grouped query.
+    """
+    resolution_seconds = case(
+        (Call.resolved_at.isnot(None), seconds_between(Call.created_at, Call.resolved_at)),
+        else_=None
+    )
+    query = session.query(Call.status, func.count(), func.avg(resolution_seconds))
+    if start_date and end_date:
+        query = query.filter(Call.created_at.between(start_date, end_date))
+    rows = query.group_by(Call.status).all()
+
+    call_status_counts = dict.fromkeys(CALL_STATUSES, 0)
+    total_calls = 0
+    avg_resolution_time = 0
+    for status, count, avg_seconds in rows:
+        total_calls += count
+        if status in call_status_counts:
+            call_status_counts[status] = count
+        if status == 'Resolved' and avg_seconds is not None:
+            avg_resolution_time = float(avg_seconds)
+    return call_status_counts, total_calls, avg_resolution_time
+
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds, max_size=256):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item and item[0] > now:
+                return item[1]
+        value = compute()
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._items[key] = (now + self.ttl_seconds, value)
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,209 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from log_reader import _connect_index
+
+# In-process publish/subscribe bus behind the dashboard's server-sent events stream
+# (/dashboard/stream). The write paths publish small deltas (a call changed status,
+# calls were scheduled, new log entries per category) and every connected dashboard
+# applies them to the statistics it already shows, instead of recomputing them.
+#
+# Events are kept in a ring buffer shared by all subscribers; each one reads from its
+# own position. A dashboard that falls more than replay_size events behind, or that
+# reconnects after the events it missed have left the buffer, gets a 'resync' event
+# and reloads /dashboard/statsdata once.
+#
+# The bus lives in one process: with several portal processes, each one only sees
+# the call updates made through it (log entries are read from the log index by every
+# process). Run the portal as a single process with threads for live updates.
+
+
+class Subscription:
+    def __init__(self, bus, position, resync=False):
+        self._bus = bus
+        self.position = position
+        self._resync = resync
+
+    def get(self, timeout):
+        """Next event, None on timeout, or a 'resync' event if the ones it missed are gone."""
+        return self._bus._next(self, timeout)
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Fan-out of (id, type, data, SSE message) events to the subscribed dashboards."""
+
+    def __init__(self, replay_size=1024):
+        self._condition = threading.Condition()
+        self._subscribers = set()
+        # Event ids are '<epoch>-<n>': after a restart, ids from the previous process are not mistaken for new ones
+        self.epoch = uuid.uuid4().hex[:8]
+        self._last_id = 0
+        self._events = deque(maxlen=replay_size)
+        self._on_first_subscriber = []
+        self.published = 0
+        self.resyncs = 0
+
+    def on_first_subscriber(self, callback):
+        """Calls callback() whenever the first dashboard connects (e.g. to start a poller)."""
+        self._on_first_subscriber.append(callback)
+
+    def publish(self, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            # Formatted once here instead of once per dashboard
+            event = (self._last_id, event_type, data, format_sse(self.epoch, self._last_id, event_type, data))
+            self._events.append(event)
+            self.published += 1
+            self._condition.notify_all()
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        New subscription. With the id of the last event a reconnecting dashboard
+        received, the events it missed are sent first, or a 'resync' if they are
+        no longer available.
+        """
+        with self._condition:
+            subscription = Subscription(self, self._last_id)
+            if last_event_id:
+                epoch, _, n = last_event_id.partition('-')
+                if epoch == self.epoch and n.isdigit() and int(n) <= self._last_id:
+                    subscription.position = int(n)
+                else:
+                    subscription._resync = True
+            first = not self._subscribers
+            self._subscribers.add(subscription)
+        if first:
+            for callback in self._on_first_subscriber:
+                callback()
+        return subscription
+
+    def _next(self, subscription, timeout):
+        with self._condition:
+            if not subscription._resync and subscription.position == self._last_id and timeout:
+                self._condition.wait(timeout)
+            if subscription.position == self._last_id and not subscription._resync:
+                return None
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            if subscription._resync or subscription.position + 1 < oldest:
+                # Dropped what it missed: the dashboard reloads everything anyway
+                subscription._resync = False
+                subscription.position = self._last_id
+                self.resyncs += 1
+                return (self._last_id, 'resync', {}, format_sse(self.epoch, self._last_id, 'resync', {}))
+            subscription.position += 1
+            return self._events[subscription.position - oldest]
+
+    def unsubscribe(self, subscription):
+        with self._condition:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._condition:
+            return len(self._subscribers)
+
+    def as_dict(self):
+        with self._condition:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "resyncs": self.resyncs,
+                "last_event_id": self._last_id,
+            }
+
+
+def format_sse(epoch, event_id, event_type, data):
+    return f"id: {epoch}-{event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(subscription, keepalive_seconds=15, max_batch=100):
+    """Server-sent events for one dashboard, with a comment line as keepalive."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = subscription.get(timeout=keepalive_seconds)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            # Everything already published goes out in one write
+            messages = [event[3]]
+            while len(messages) < max_batch:
+                event = subscription.get(timeout=0)
+                if event is None:
+                    break
+                messages.append(event[3])
+            yield "".join(messages)
+    finally:
+        subscription.close()
+
+
+class LogTailer:
+    """
+    Publishes the log entries the backend adds to the log index as 'logs' events
+    ({"counts": {category: n}, "last_timestamp": ...}), polling for new ids every
+    poll_seconds while there are dashboards subscribed.
+    """
+
+    def __init__(self, bus, db_path, poll_seconds=2.0, batch_size=1000):
+        self.bus = bus
+        self.db_path = db_path
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None
+        bus.on_first_subscriber(self.start)
+
+    def _max_id(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM log_entries").fetchone()[0]
+
+    def poll_once(self):
+        """Publishes the entries added since the last poll. Returns how many there were."""
+        conn = _connect_index(self.db_path)
+        if conn is None:
+            return 0
+        try:
+            if self._last_id is None:
+                # Entries logged before the first dashboard connected are in its initial statistics
+                self._last_id = self._max_id(conn)
+                return 0
+            rows = conn.execute(
+                "SELECT id, timestamp, category FROM log_entries WHERE id > ? ORDER BY id LIMIT ?",
+                (self._last_id, self.batch_size)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading new log entries: {e}")
+            return 0
+        finally:
+            conn.close()
+        if not rows:
+            return 0
+        self._last_id = rows[-1][0]
+        counts = {}
+        for _, _, category in rows:
+            counts[category] = counts.get(category, 0) + 1
+        self.bus.publish('logs', {'counts': counts, 'last_timestamp': rows[-1][1]})
+        return len(rows)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self.bus.subscriber_count() == 0:
+                    self._thread = None
+                    self._last_id = None
+                    return
+            if self.poll_once() < self.batch_size:
+                time.sleep(self.poll_seconds)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-tailer", daemon=True)
+                self._thread.start()
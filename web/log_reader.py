@@ -0,0 +1,132 @@
+import os
+import sqlite3
+from datetime import timedelta, timezone
+
+# Reader for the chatbot's request log (see backend/request_log.py), through the
+# SQLite index and rollups the backend maintains next to the JSONL segments.
+
+ENTRY_KEYS = ("id", "timestamp", "sender_id", "employee_id", "question", "answer", "category")
+ENTRY_COLUMNS = ", ".join(ENTRY_KEYS)
+HOUR_FORMAT = "%Y-%m-%dT%H"
+DAY_FORMAT = "%Y-%m-%d"
+
+
+# --- Indexed queries against the backend's SQLite log index (backend/log_index.py) ---
+
+def _connect_index(db_path):
+    if not os.path.exists(db_path):
+        return None
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+
+
+def _fts_query(text):
+    terms = [term.replace('"', '') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+def search_log_index(db_path, search_query='', before=None, after=None, per_page=20):
+    """
+    Keyset-paginated search over the log index, newest first.
+    Returns (logs, total_items, has_prev, has_next).
+    """
+    conn = _connect_index(db_path)
+    if conn is None:
+        return [], 0, False, False
+    try:
+        where = []
+        params = []
+        fts = _fts_query(search_query)
+        if fts:
+            # Full-text match on question/answer/category, or sender_id prefix (phone numbers)
+            where.append("(id IN (SELECT rowid FROM log_fts WHERE log_fts MATCH ?) "
+                         "OR (sender_id >= ? AND sender_id < ?))")
+            params.extend([fts, search_query, search_query + '\uffff'])
+        filter_sql = (" WHERE " + " AND ".join(where)) if where else ""
+        total_items = conn.execute(f"SELECT COUNT(*) FROM log_entries{filter_sql}", params).fetchone()[0]
+
+        page_where = list(where)
+        page_params = list(params)
+        if after is not None:
+            page_where.append("id > ?")
+            page_params.append(after)
+            order = "ASC"
+        else:
+            if before is not None:
+                page_where.append("id < ?")
+                page_params.append(before)
+            order = "DESC"
+        page_sql = (" WHERE " + " AND ".join(page_where)) if page_where else ""
+        rows = conn.execute(
+            f"SELECT {ENTRY_COLUMNS} FROM log_entries{page_sql} ORDER BY id {order} LIMIT ?",
+            page_params + [per_page + 1]
+        ).fetchall()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if after is not None:
+            rows.reverse()
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = before is not None, has_more
+        logs = [dict(zip(ENTRY_KEYS, row)) for row in rows]
+        return logs, total_items, has_prev, has_next
+    except sqlite3.Error as e:
+        print(f"Error querying the log index: {e}")
+        return [], 0, False, False
+    finally:
+        conn.close()
+
+
+# --- Category counters maintained by the backend (backend/log_rollups.py), UTC buckets ---
+
+def _floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt):
+    floored = _floor_hour(dt)
+    return floored if floored == dt else floored + timedelta(hours=1)
+
+
+def _ceil_day(dt):
+    floored = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return floored if floored == dt else floored + timedelta(days=1)
+
+
+def category_counts_between(db_path, start, end):
+    """
+    Count log entries per category with timestamps in [start, end) (aware datetimes).
+    Whole days come from the daily rollup and the edges from the hourly rollup, so
+    the cost depends on the length of the range, not on the size of the log.
+    Edges are rounded out to whole hours.
+    """
+    conn = _connect_index(db_path)
+    if conn is None:
+        return {}
+    start = _floor_hour(start.astimezone(timezone.utc))
+    end = _ceil_hour(end.astimezone(timezone.utc))
+    first_day = _ceil_day(start)
+    last_day = end.replace(hour=0)
+    counts = {}
+
+    def add(rows):
+        for category, n in rows:
+            counts[category] = counts.get(category, 0) + n
+
+    hour_query = ("SELECT category, SUM(count) FROM rollup_hourly "
+                  "WHERE hour >= ? AND hour < ? GROUP BY category")
+    try:
+        if first_day < last_day:
+            add(conn.execute(
+                "SELECT category, SUM(count) FROM rollup_daily "
+                "WHERE day >= ? AND day < ? GROUP BY category",
+                (first_day.strftime(DAY_FORMAT), last_day.strftime(DAY_FORMAT))
+            ))
+            add(conn.execute(hour_query, (start.strftime(HOUR_FORMAT), first_day.strftime(HOUR_FORMAT))))
+            add(conn.execute(hour_query, (last_day.strftime(HOUR_FORMAT), end.strftime(HOUR_FORMAT))))
+        else:
+            add(conn.execute(hour_query, (start.strftime(HOUR_FORMAT), end.strftime(HOUR_FORMAT))))
+    except sqlite3.Error as e:
+        print(f"Error querying the log rollups: {e}")
+    finally:
+        conn.close()
+    return counts
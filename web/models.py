@@ -1,4 +1,7 @@
+import re
 from datetime import datetime
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import validates
 from database import db
 
 class User(db.Model):
@@ -7,14 +10,57 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False) # Store hashed passwords
 
+def normalize_phone(phone):
+    """Digits of a phone number, without the leading country code 1 of 11-digit numbers."""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits
+
 class Call(db.Model):
     __tablename__ = 'calls'
+    __table_args__ = (
+        # Dashboard statistics (counts by status and resolution time per date range) are read from this index alone
+        db.Index('idx_calls_created_status', 'created_at', 'status', 'resolved_at'),
+        # Keyset pagination of the call manager, with and without a status filter
+        db.Index('idx_calls_created_id', 'created_at', 'id'),
+        db.Index('idx_calls_status_created_id', 'status', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.String(200), nullable=False)
     full_name = db.Column(db.String(200), nullable=False)
     phone = db.Column(db.String(50), nullable=False)
+    phone_digits = db.Column(db.String(50), index=True) # normalize_phone(phone), for phone searches
     preferred_time = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(50), default='Pending') # States: 'Pending', 'In Progress', 'Resolved'
     resolution = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    resolved_at = db.Column(db.DateTime)
\ No newline at end of file
+    resolved_at = db.Column(db.DateTime)
+    idempotency_key = db.Column(db.String(64), unique=True) # Set by the chatbot's call outbox
+
+    @validates('phone')
+    def _set_phone_digits(self, key, phone):
+        self.phone_digits = normalize_phone(phone)
+        return phone
+
+# Full-text index of the call manager search (see call_search.py).
+# MariaDB/MySQL: a FULLTEXT index. SQLite (development, benchmarks): an FTS5 table kept in sync by triggers.
+SEARCH_COLUMNS = 'full_name, sender_id, phone, resolution'
+
+event.listen(Call.__table__, 'after_create', DDL(
+    f"CREATE FULLTEXT INDEX ft_calls_search ON calls ({SEARCH_COLUMNS})"
+).execute_if(dialect=('mysql', 'mariadb')))
+
+for statement in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5({SEARCH_COLUMNS}, content='calls', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS calls_fts_insert AFTER INSERT ON calls BEGIN "
+    f"INSERT INTO calls_fts (rowid, {SEARCH_COLUMNS}) VALUES (new.id, new.full_name, new.sender_id, new.phone, new.resolution); END",
+    f"CREATE TRIGGER IF NOT EXISTS calls_fts_delete AFTER DELETE ON calls BEGIN "
+    f"INSERT INTO calls_fts (calls_fts, rowid, {SEARCH_COLUMNS}) VALUES ('delete', old.id, old.full_name, old.sender_id, old.phone, old.resolution); END",
+    f"CREATE TRIGGER IF NOT EXISTS calls_fts_update AFTER UPDATE ON calls BEGIN "
+    f"INSERT INTO calls_fts (calls_fts, rowid, {SEARCH_COLUMNS}) VALUES ('delete', old.id, old.full_name, old.sender_id, old.phone, old.resolution); "
+    f"INSERT INTO calls_fts (rowid, {SEARCH_COLUMNS}) VALUES (new.id, new.full_name, new.sender_id, new.phone, new.resolution); END",
+):
+    event.listen(Call.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Call.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS calls_fts").execute_if(dialect='sqlite'))
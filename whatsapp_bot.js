@@ -11,6 +11,57 @@ const app = express();
 let qrCodeDataURL = null;
 let connectionStatus = 'connecting';
 
+const BACKEND_URL = process.env.BACKEND_URL || "http://127.0.0.1:5000";
+// Con STREAM_ANSWERS=0 se usa /ask y se espera la respuesta completa
+const STREAM_ANSWERS = process.env.STREAM_ANSWERS !== "0";
+
+// Pide la respuesta a /ask/stream (Server-Sent Events). La primera parte se envía
+// en cuanto llega; el resto se agrupa en un segundo mensaje al terminar.
+async function answerStreaming(sock, senderJid, userText) {
+    const start = Date.now();
+    const response = await axios.post(`${BACKEND_URL}/ask/stream`, {
+        question: userText,
+        sender: senderJid
+    }, { responseType: "stream" });
+
+    let buffer = "";
+    let firstSent = false;
+    const rest = [];
+    let done = null;
+    for await (const chunk of response.data) {
+        buffer += chunk.toString("utf8");
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+            const data = rawEvent.match(/^data: (.*)$/m)?.[1];
+            if (!event || !data) continue;
+            const payload = JSON.parse(data);
+            if (event === "part") {
+                if (!firstSent) {
+                    firstSent = true;
+                    await sock.sendMessage(senderJid, { text: payload.text });
+                    console.log(`Primera parte enviada a ${senderJid} en ${Date.now() - start} ms`);
+                } else {
+                    rest.push(payload.text);
+                }
+            } else if (event === "done") {
+                done = payload;
+            }
+        }
+    }
+    if (rest.length) {
+        await sock.sendMessage(senderJid, { text: rest.join("\n") });
+    }
+    if (!firstSent) {
+        throw new Error("El backend cerró el stream sin enviar respuesta");
+    }
+    if (done) {
+        console.log(`Respuesta a ${senderJid}: primer token ${done.ttft_ms ?? "-"} ms, primera parte ${done.first_part_ms} ms, total ${done.total_ms} ms`);
+    }
+}
+
 async function startBot() {
     const authPath = path.resolve(__dirname, 'auth');
     const { state, saveCreds } = await useMultiFileAuthState(authPath);
@@ -63,15 +114,21 @@ async function startBot() {
             console.log(`Mensaje recibido de ${senderJid}: ${userText}`);
 
             try {
-                const response = await axios.post("http://127.0.0.1:5000/ask", {
-                    question: userText,
-                    sender: senderJid
-                });
-                await sock.sendMessage(senderJid, { text: response.data.answer });
+                if (STREAM_ANSWERS) {
+                    await answerStreaming(sock, senderJid, userText);
+                } else {
+                    const response = await axios.post(`${BACKEND_URL}/ask`, {
+                        question: userText,
+                        sender: senderJid
+                    });
+                    await sock.sendMessage(senderJid, { text: response.data.answer });
+                }
             } catch (error) {
                 console.error("Error al comunicarse con el backend:", error.message);
                 if (error.response) {
-                    console.error("Datos de respuesta del backend:", error.response.data);
+                    if (!STREAM_ANSWERS) {
+                        console.error("Datos de respuesta del backend:", error.response.data);
+                    }
                     console.error("Estado de respuesta del backend:", error.response.status);
                 }
                 await sock.sendMessage(senderJid, { text: "Disculpa, estoy teniendo problemas para procesar tu solicitud en este momento. Por favor, inténtalo más tarde o contacta a un administrador." });